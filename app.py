@@ -2,12 +2,28 @@ import streamlit as st
 import pandas as pd
 
 # Import modules
-from utils.graph_queries import query_positions
-from utils.data_processing import prepare_dataframe
+from utils.pipeline_memo import (
+    fetch_stage, prepare_stage, prepare_snapshot_stage, snapshot_stage, sync_stage, with_model_columns, owner_index_stage
+)
 from models.model_management import init_models
 from ui.analysis_tab import render_analysis_tab
 from ui.models_tab import render_models_tab
-from ui.import_export_tab import render_import_export_tab
+from ui.import_export_tab import render_import_export_tab, render_snapshot_upload
+from ui.multi_pool_tab import render_multi_pool_tab
+from ui.history_tab import render_history_tab
+from ui.sweep_tab import render_sweep_tab
+from ui.notices import render_notices
+from ui.progressive import render_progressive_load
+from ui.refresh import render_refresh_status, render_watchlist
+from ui.diagnostics import render_diagnostics
+from ui.owner_picker import render_owner_leaderboard, render_owner_picker
+from utils.notices import collect_notices
+from utils.profiling import PROFILE_LOG, PROFILE_PIPELINE, profile_run
+from utils.data_processing import memory_report
+from utils.graph_queries import OFFLINE_MODE
+from utils.snapshots import list_snapshots
+from utils.progressive import PROGRESSIVE_LOADING, progressive_stage
+from utils.refresh import get_scheduler
 
 # Set Streamlit to wide mode
 st.set_page_config(layout="wide")
@@ -18,51 +34,152 @@ init_models()
 # --- Streamlit App ---
 st.title("🍣 SushiSwap V3 Liquidity Positions Analysis")
 
-# Input pool address
-pool_address = st.text_input("🔍 Enter SushiSwap V3 Pool Address")
+# Multi-pool mode aggregates votes across pools instead of analysing a single one
+mode = st.sidebar.radio("Mode", ["Single pool", "Multi-pool"])
+if mode == "Multi-pool":
+    render_multi_pool_tab()
+    st.stop()
+
+# Positions come from the subgraph or, for offline replay, from a stored snapshot
+data_source = st.sidebar.radio("Data source", ["Snapshot"] if OFFLINE_MODE else ["Subgraph", "Snapshot"])
+snapshot = None
+force_refresh = sync_changes = False
+if data_source == "Snapshot":
+    snapshots = list_snapshots()
+    if not snapshots:
+        st.info("No pool snapshots stored yet. Upload one below, or save one from the Import/Export tab while online.")
+        render_snapshot_upload()
+        st.stop()
+    snapshot_path = st.selectbox("📦 Pool snapshot", [path for _, _, path in snapshots],
+                                 format_func=lambda path: next(f"{pool} at block {block}" for pool, block, p in snapshots if p == path))
+    snapshot = snapshot_stage(snapshot_path)
+    pool_address = snapshot.pool
+else:
+    # Input pool address
+    pool_address = st.text_input("🔍 Enter SushiSwap V3 Pool Address")
+    refresh_col, sync_col = st.columns(2)
+    with refresh_col:
+        force_refresh = st.button("🔄 Force refresh", help="Ignore the local cache and fetch positions from the subgraph")
+    with sync_col:
+        sync_changes = st.button("⚡ Sync changes", help="Fetch only the positions changed since the last loaded block")
+
+# Watched pools are refreshed by a background scheduler and open from their last good dataset
+scheduler = get_scheduler() if snapshot is None else None
+keep_fresh = False
+if scheduler is not None:
+    if pool_address:
+        keep_fresh_key = f"keep_fresh_{pool_address.lower()}"
+
+        # The watch-list is shared by every session, so only this session unticking the box removes the pool
+        def on_keep_fresh_change(pool=pool_address, key=keep_fresh_key):
+            if not st.session_state[key]:
+                scheduler.unwatch(pool)
+
+        keep_fresh = st.sidebar.checkbox(
+            "📌 Keep this pool fresh", value=scheduler.is_watched(pool_address), key=keep_fresh_key, on_change=on_keep_fresh_change,
+            help=f"Refresh the pool in the background every {scheduler.interval:.0f}s and open it without waiting on the subgraph")
+    render_watchlist(scheduler)
+
+# Render a pool that has to be fetched page by page, with a live preview of the first model
+progressive_loading = st.sidebar.checkbox("⏩ Progressive loading", value=PROGRESSIVE_LOADING,
+                                          help="Show metrics, top owners and a chart while positions are still loading")
+
+# Raw-data fingerprint of the last dataset loaded per pool, so a sync can reuse its prepared frame
+if 'pool_fingerprints' not in st.session_state:
+    st.session_state.pool_fingerprints = {}
+
+# Span instrumentation of every stage, shown in a diagnostics panel below the results
+profile_pipeline = st.sidebar.checkbox("🩺 Profile pipeline", value=PROFILE_PIPELINE,
+                                       help="Time each stage of this run" + (f" and append the spans to {PROFILE_LOG}" if PROFILE_LOG else ""))
 
 if pool_address:
-    with st.spinner("Fetching positions from SushiSwap subgraph 🔄"):
+    with profile_run(profile_pipeline) as profile, st.spinner("Fetching positions from SushiSwap subgraph 🔄"):
         try:
-            positions = query_positions(pool_address)
-            df, current_price, other_token_symbol = prepare_dataframe(positions)
+            pool_key = pool_address.lower()
+            previous_fingerprint = st.session_state.pool_fingerprints.get(pool_key)
+            watched = scheduler.latest(pool_address) if keep_fresh and not force_refresh else None
+            if snapshot is not None:
+                # A snapshot is a lazy sequence of positions; the frame is prepared from its columns
+                positions, block, fingerprint = snapshot, snapshot.block, snapshot.fingerprint
+                st.caption(f"Positions of pool {pool_address} at block {block} (offline snapshot)")
+            elif sync_changes and previous_fingerprint is not None and not force_refresh:
+                positions, block, fingerprint, delta = sync_stage(pool_address, previous_fingerprint)
+                st.caption(f"Positions at block {block} (synced {len(delta['changed'])} changed, {len(delta['removed'])} closed)")
+            elif watched is not None:
+                # Stale-while-revalidate: the last good dataset now, newer data once a refresh lands
+                positions, block, fingerprint = watched["positions"], watched["block"], watched["fingerprint"]
+            else:
+                preview_id, preview_model = next(iter(st.session_state.voting_models.items()))
+                load = progressive_stage(pool_address, force_refresh, preview_model['params']['equation'],
+                                         f"PowerVoting_{preview_id}") if progressive_loading else None
+                if load is not None:
+                    positions, block, fingerprint = render_progressive_load(load, preview_model['name'])
+                    st.caption(f"Positions at block {block}")
+                else:
+                    positions, block, fingerprint, from_cache = fetch_stage(pool_address, force_refresh=force_refresh)
+                    st.caption(f"Positions at block {block}" + (" (loaded from local cache)" if from_cache else ""))
+            st.session_state.pool_fingerprints[pool_key] = fingerprint
+            if keep_fresh:
+                scheduler.watch(pool_address, (positions, block, fingerprint))
+                render_refresh_status(scheduler, pool_address, fingerprint)
+
+            # Memoized across sessions by data fingerprint and equation hash
+            if snapshot is not None:
+                df, current_price, other_token_symbol, notices = prepare_snapshot_stage(snapshot)
+            else:
+                df, current_price, other_token_symbol, notices = prepare_stage(positions, fingerprint)
+            render_notices(notices)
+            if not df.empty:
+                with collect_notices() as notices:
+                    df = with_model_columns(df, fingerprint, st.session_state.voting_models)
+                render_notices(notices)
 
             if df.empty:
                 st.warning("No active liquidity positions found for this pool address.")
             else:
                 # Current price metric
                 st.metric("Current REG Price", f"{current_price:.6f} {other_token_symbol}")
-                
-                # Compute owner position counts clearly
-                owner_counts = df["Owner"].value_counts().to_dict()
 
-                # Dropdown clearly showing owner + # positions
-                owner_options = ["All owners"] + [
-                    f"{owner} ({count} positions)" for owner, count in owner_counts.items()
-                ]
+                # Footprint of the compact positions frame, per column and per position
+                with st.expander("🧠 Memory footprint"):
+                    report, total_bytes, bytes_per_position = memory_report(df)
+                    st.caption(f"{total_bytes / 1024:.1f} KiB for {len(df)} positions ({bytes_per_position:.0f} bytes per position)")
+                    st.dataframe(report, hide_index=True)
+                
+                # Owner index: codes, row offsets and vote totals, memoized with the data
+                owner_index = owner_index_stage(df, fingerprint, st.session_state.voting_models)
+                render_owner_leaderboard(owner_index, st.session_state.voting_models)
 
-                selected_owner_option = st.selectbox("Select Owner", owner_options)
+                selected_owner_option = render_owner_picker(owner_index)
                 st.session_state['selected_owner_option'] = selected_owner_option
 
                 # Handle owner selection neatly
                 if selected_owner_option == "All owners":
-                    df_display = df.copy()
+                    df_display = df
                 else:
-                    selected_owner = selected_owner_option.split(" (")[0]  # Get address only
-                    df_display = df[df["Owner"] == selected_owner]
+                    df_display = df.iloc[owner_index.rows(selected_owner_option)]
                 
                 # PowerVoting Models tab setup
-                tab1, tab2, tab3 = st.tabs(["Analysis", "PowerVoting Models", "Import/Export"])
+                tab1, tab2, tab3, tab4, tab5 = st.tabs(["Analysis", "PowerVoting Models", "Parameter Sweep", "Import/Export", "History"])
                 
                 with tab1:
-                    render_analysis_tab(df_display, current_price, other_token_symbol)
+                    render_analysis_tab(df_display, current_price, other_token_symbol, positions, fingerprint)
                 
                 with tab2:
                     render_models_tab()
                 
                 with tab3:
-                    render_import_export_tab()
+                    render_sweep_tab(df, owner_index, fingerprint)
+                
+                with tab4:
+                    render_import_export_tab(pool_address, block, positions, fingerprint)
+                
+                with tab5:
+                    render_history_tab(pool_address, block)
 
         except Exception as e:
             st.error(f"⚠️ Error: {e}")
             st.exception(e)  # This will display the full traceback for debugging
+
+    if profile is not None:
+        render_diagnostics(profile)
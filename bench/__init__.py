@@ -0,0 +1 @@
+# Benchmarks of the pipeline stages on synthetic and recorded subgraph payloads
@@ -0,0 +1,47 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+
+# Recorded subgraph payloads, one gzipped JSON file per pool and block
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "recorded")
+
+def fixture_path(pool_address, block, fixture_dir=FIXTURE_DIR):
+    return os.path.join(fixture_dir, f"{pool_address.lower()}-{int(block)}.json.gz")
+
+def record_fixture(pool_address, block=None, fixture_dir=FIXTURE_DIR):
+    """Fetch a pool's positions from the subgraph and store them as a fixture; returns its path"""
+    from utils.graph_queries import query_indexed_block, query_positions
+
+    block = int(block) if block is not None else query_indexed_block()
+    positions = query_positions(pool_address, block=block)
+    os.makedirs(fixture_dir, exist_ok=True)
+    path = fixture_path(pool_address, block, fixture_dir)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"pool": pool_address.lower(), "block": block, "positions": positions}, f)
+    return path
+
+def load_fixture(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """Every recorded fixture as {name: fixture}, in file name order"""
+    return {
+        os.path.basename(path)[:-len(".json.gz")]: load_fixture(path)
+        for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json.gz")))
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record subgraph positions of pools as benchmark fixtures.")
+    parser.add_argument("pools", nargs="+", help="Pool addresses to record")
+    parser.add_argument("--block", type=int, help="Record the pools as they were at this block (default: latest indexed)")
+    args = parser.parse_args(argv)
+    for pool_address in args.pools:
+        print(record_fixture(pool_address, args.block))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
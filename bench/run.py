@@ -0,0 +1,260 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Heavy modules are imported after argument parsing, like the CLI
+
+# Models evaluated by the per-model benchmarks: the default plus typical custom shapes
+BENCH_MODELS = {
+    "default": {"name": "Default (4x/2x)", "params": {"equation": "reg_amount * 4 + reg_equivalent * 2"}},
+    "distance_decay": {"name": "Distance decay", "params": {"equation": "reg_amount * 4 / (1 + relative_distance * 10) + reg_equivalent * 2"}},
+    "active_only": {"name": "Active only", "params": {"equation": "(reg_amount * 4 + reg_equivalent * 2) * is_active"}},
+    "capped": {"name": "Capped", "params": {"equation": "min(reg_amount, 1000) * 4 + pow(reg_equivalent, 0.5) * 2"}},
+}
+
+# Ratio of current to baseline time above which --compare reports a regression
+REGRESSION_THRESHOLD = 1.10
+
+def measure(func, repeat):
+    """Time func repeat times after one untimed warm-up run, then once more under tracemalloc for its peak allocation"""
+    # The warm-up keeps one-off costs, such as starting the equation worker, out of the first stage timed
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"min_s": min(times), "median_s": statistics.median(times), "peak_bytes": peak_bytes}
+
+def reference_depth(positions, percents):
+    """within() of a depth profile recomputed position by position, as exact integer amount differences.
+
+    The REG and other-token depth of a band are what the positions hold at the
+    current price minus what they hold at the band's edge, summed over positions.
+    """
+    import numpy as np
+    from utils.depth import depth_profile
+    from utils.v3_math import Q96, get_amounts_for_liquidity_batch
+
+    profile = depth_profile(positions)
+    ticks_lower = np.array([int(p["tickLower"]["tickIdx"]) for p in positions], dtype=np.int64)
+    ticks_upper = np.array([int(p["tickUpper"]["tickIdx"]) for p in positions], dtype=np.int64)
+    liquidities = [p["liquidity"] for p in positions]
+    pool = profile.pool
+
+    def held(reg_price):
+        raw_price = reg_price / profile._decimal_shift if profile.reg_is_token0 else 1 / (reg_price * profile._decimal_shift)
+        amount0, amount1 = get_amounts_for_liquidity_batch(int(np.sqrt(raw_price) * Q96), ticks_lower, ticks_upper, liquidities)
+        return sum(amount0), sum(amount1)
+
+    current0, current1 = held(profile.current_price)
+    rows = []
+    for percent in percents:
+        up0, up1 = held(profile.current_price * (1 + percent / 100))
+        down0, down1 = held(profile.current_price * (1 - percent / 100))
+        # A rising REG price drains token0 when REG is token0, token1 otherwise
+        if profile.reg_is_token0:
+            reg_depth, other_depth = (current0 - up0) / 10 ** pool["token0_decimals"], (current1 - down1) / 10 ** pool["token1_decimals"]
+        else:
+            reg_depth, other_depth = (current1 - up1) / 10 ** pool["token1_decimals"], (current0 - down0) / 10 ** pool["token0_decimals"]
+        rows.append({"percent": percent, "reg_depth": reg_depth, "other_depth": other_depth})
+    return rows
+
+def check_depth(sources, percents=(1, 2, 5, 10, 50)):
+    """Yield the largest relative error of LiquidityDepth.within() against reference_depth, per source"""
+    import numpy as np
+    from utils.depth import depth_profile
+
+    for source, positions in sources.items():
+        depth = depth_profile(positions).within(list(percents))
+        errors = [
+            abs(depth[field][i] - row[field]) / row[field]
+            for i, row in enumerate(reference_depth(positions, percents))
+            for field in ("reg_depth", "other_depth") if row[field]
+        ]
+        yield source, max(errors, default=0.0)
+
+def stage_benchmarks(positions, voting_models):
+    """Yield (stage, func) for every pipeline stage over one payload; set-up work is not timed"""
+    import numpy as np
+    from utils.data_processing import prepare_dataframe_columnar
+    from utils.v3_math import get_amounts_for_liquidity_batch
+    from models.power_voting import custom_equation_column
+    from utils.visualisation import calculate_multiplier_curve, plot_owner_positions
+
+    from utils.graph_queries import hydrate_positions
+
+    # Pages as the subgraph now returns them: per-position fields only, hydrated with the pool state locally
+    slim = [
+        {"id": p["id"], "owner": p["owner"], "liquidity": p["liquidity"],
+         "tickLower": {"tickIdx": p["tickLower"]["tickIdx"]}, "tickUpper": {"tickIdx": p["tickUpper"]["tickIdx"]}}
+        for p in positions
+    ]
+    payload = json.dumps({"data": {"positions": slim}}).encode()
+    pool_state = positions[0]["pool"] if positions else None
+    yield "parse", lambda: hydrate_positions(json.loads(payload)["data"]["positions"], pool_state)
+
+    sqrt_prices = np.array([int(p["pool"]["sqrtPrice"]) for p in positions], dtype=object)
+    ticks_lower = np.array([int(p["tickLower"]["tickIdx"]) for p in positions], dtype=np.float64)
+    ticks_upper = np.array([int(p["tickUpper"]["tickIdx"]) for p in positions], dtype=np.float64)
+    liquidities = [p["liquidity"] for p in positions]
+    yield "amounts", lambda: get_amounts_for_liquidity_batch(sqrt_prices, ticks_lower, ticks_upper, liquidities)
+
+    yield "prepare", lambda: prepare_dataframe_columnar(positions, compact=True)
+
+    df, current_price, other_token_symbol = prepare_dataframe_columnar(positions, compact=True)
+    price_range = (current_price * 0.5, current_price * 1.5)
+    for model_id, model_info in voting_models.items():
+        equation = model_info["params"]["equation"]
+        yield f"model:{model_id}", lambda equation=equation: custom_equation_column(df, equation)
+        yield f"multiplier_curve:{model_id}", lambda equation=equation: calculate_multiplier_curve(equation, price_range, current_price)
+
+    from utils.depth import depth_profile
+    yield "depth", lambda: depth_profile(positions)
+    profile = depth_profile(positions)
+    yield "depth_lookup", lambda: profile.within([1, 2, 5, 10])
+
+    model_id, model_info = next(iter(voting_models.items()))
+    equation = model_info["params"]["equation"]
+    df = df.assign(**{f"PowerVoting_{model_id}": custom_equation_column(df, equation)})
+
+    def build_figure():
+        return plot_owner_positions(df, current_price, other_token_symbol, model_info["name"], f"PowerVoting_{model_id}", equation)
+
+    yield "figure", build_figure
+    figure = build_figure()
+    yield "figure_json", figure.to_json
+
+def run_benchmarks(sources, voting_models, repeat=3, stages=None):
+    """Benchmark every stage over every source {name: positions}; yields one result dict per stage"""
+    from utils.notices import collect_notices
+
+    for source, positions in sources.items():
+        # Calculation warnings are part of the workload, not benchmark output
+        with collect_notices():
+            for stage, func in stage_benchmarks(positions, voting_models):
+                if stages and stage.split(":")[0] not in stages:
+                    continue
+                yield {"source": source, "positions": len(positions), "stage": stage, "repeat": repeat, **measure(func, repeat)}
+
+def run_metadata(seed):
+    import numpy as np
+    import pandas as pd
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+    }
+
+def read_results(path):
+    """(meta, results) of a JSON-lines benchmark file written by this module"""
+    meta, results = {}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "meta" in record:
+                meta = record["meta"]
+            else:
+                results.append(record)
+    return meta, results
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Median time and peak memory ratios of current to baseline results, matched by source and stage"""
+    baseline_by_key = {(r["source"], r["stage"]): r for r in baseline}
+    comparison = []
+    for result in current:
+        before = baseline_by_key.get((result["source"], result["stage"]))
+        if before is None:
+            continue
+        time_ratio = result["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        memory_ratio = result["peak_bytes"] / before["peak_bytes"] if before["peak_bytes"] else float("inf")
+        comparison.append({
+            "source": result["source"],
+            "stage": result["stage"],
+            "baseline_s": before["median_s"],
+            "current_s": result["median_s"],
+            "time_ratio": time_ratio,
+            "memory_ratio": memory_ratio,
+            "regression": time_ratio > threshold,
+        })
+    return comparison
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PowerVoting pipeline stages.")
+    parser.add_argument("--sizes", type=int, nargs="*", help="Synthetic position counts (default: 1000 10000 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic generator")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--stages", nargs="*", help="Only run these stages (parse, amounts, prepare, model, multiplier_curve, depth, depth_lookup, figure, figure_json)")
+    parser.add_argument("--check-depth", action="store_true", help="Compare depth lookups with a per-position recomputation instead of timing")
+    parser.add_argument("--models", help="Models JSON exported from the Import/Export tab (default: built-in benchmark models)")
+    parser.add_argument("--no-fixtures", action="store_true", help="Skip the recorded fixtures")
+    parser.add_argument("-o", "--output", default="bench_output.txt", help="JSON-lines results file (default: bench_output.txt)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Time ratio reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a stage regressed")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from bench.synthetic import DEFAULT_SIZES, synthetic_positions
+    from bench.fixtures import FIXTURE_DIR, load_fixtures
+    from core.api import load_models
+
+    voting_models = load_models(args.models) if args.models else BENCH_MODELS
+    sizes = args.sizes if args.sizes is not None else DEFAULT_SIZES
+    sources = {f"synthetic-{size}": synthetic_positions(size, seed=args.seed) for size in sizes}
+    if not args.no_fixtures:
+        fixtures = load_fixtures()
+        if not fixtures:
+            print(f"No recorded fixtures in {FIXTURE_DIR}, timing synthetic pools only; "
+                  "record one with python -m bench.fixtures POOL_ADDRESS", file=sys.stderr)
+        sources.update({f"fixture-{name}": fixture["positions"] for name, fixture in fixtures.items()})
+
+    if args.check_depth:
+        for source, error in check_depth(sources):
+            print(f"{source:<24} depth max relative error {error:.2e}")
+        return 0
+
+    results = []
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"meta": run_metadata(args.seed)}) + "\n")
+        for result in run_benchmarks(sources, voting_models, repeat=args.repeat, stages=args.stages):
+            results.append(result)
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+            print(f"{result['source']:<24} {result['stage']:<32} {result['median_s'] * 1000:>10.2f} ms {result['peak_bytes'] / 2**20:>9.1f} MiB")
+
+    if not args.compare:
+        return 0
+    _, baseline = read_results(args.compare)
+    comparison = compare_results(baseline, results, args.threshold)
+    print()
+    for row in comparison:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['source']:<24} {row['stage']:<32} x{row['time_ratio']:.2f} time x{row['memory_ratio']:.2f} memory{flag}")
+    return 1 if args.fail_on_regression and any(row["regression"] for row in comparison) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import math
+import numpy as np
+from utils.v3_math import MAX_TICK, MIN_TICK, TICK_BASE, get_sqrt_ratio_at_tick
+
+# Position counts benchmarked by default
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+# Tick spacing of the 0.3% fee tier
+TICK_SPACING = 60
+
+REG_TOKEN = {"symbol": "REG", "decimals": "18"}
+USDC_TOKEN = {"symbol": "USDC", "decimals": "6"}
+
+def _pool_state(reg_price):
+    """REG/USDC pool fields at a USDC price of REG, with the tick and sqrt price it implies"""
+    # Ticks price token0 (REG) in raw token1 (USDC) units
+    raw_price = reg_price * 10 ** (int(USDC_TOKEN["decimals"]) - int(REG_TOKEN["decimals"]))
+    tick = math.floor(math.log(raw_price) / math.log(TICK_BASE))
+    return {
+        "tick": str(tick),
+        "sqrtPrice": str(get_sqrt_ratio_at_tick(tick)),
+        "liquidity": "0",
+        "token0Price": repr(1 / reg_price),
+        "token1Price": repr(reg_price),
+        "token0": REG_TOKEN,
+        "token1": USDC_TOKEN,
+    }
+
+def _tick(tick_idx):
+    price0 = TICK_BASE ** tick_idx
+    return {"tickIdx": str(tick_idx), "price0": repr(price0), "price1": repr(1 / price0)}
+
+def synthetic_positions(num_positions, seed=0, reg_price=0.65, full_range_share=0.05):
+    """Subgraph-shaped positions of one REG/USDC pool, reproducible for a seed.
+
+    Range centers are normally spread around the current tick, widths are
+    log-normal in tick spacings with a share of full-range positions, liquidity
+    is log-normal (a few whales, many small LPs) and positions per owner follow
+    a Zipf law, so most owners hold one position and a few hold many.
+    """
+    rng = np.random.default_rng(seed)
+    pool = _pool_state(reg_price)
+    current_tick = int(pool["tick"])
+    token0, token1 = pool["token0"], pool["token1"]
+
+    # Tick ranges aligned to the tick spacing
+    lowest = math.ceil(MIN_TICK / TICK_SPACING) * TICK_SPACING
+    highest = math.floor(MAX_TICK / TICK_SPACING) * TICK_SPACING
+    centers = current_tick + rng.normal(0, 2_000, num_positions)
+    half_widths = np.maximum(1, np.round(rng.lognormal(np.log(10), 0.9, num_positions))) * TICK_SPACING / 2
+    ticks_lower = np.clip(np.floor((centers - half_widths) / TICK_SPACING) * TICK_SPACING, lowest, highest - TICK_SPACING)
+    ticks_upper = np.clip(np.ceil((centers + half_widths) / TICK_SPACING) * TICK_SPACING, ticks_lower + TICK_SPACING, highest)
+    full_range = rng.random(num_positions) < full_range_share
+    ticks_lower = np.where(full_range, lowest, ticks_lower).astype(np.int64)
+    ticks_upper = np.where(full_range, highest, ticks_upper).astype(np.int64)
+
+    # Liquidity is a uint128 on-chain, so it is kept as Python ints past the uint64 range
+    liquidities = [max(1, int(liquidity)) for liquidity in rng.lognormal(np.log(1e16), 2.0, num_positions)]
+
+    positions_per_owner = np.minimum(rng.zipf(2.0, num_positions), max(1, num_positions // 20))
+    num_owners = int(np.searchsorted(np.cumsum(positions_per_owner), num_positions)) + 1
+    owners = rng.permutation(np.repeat(np.arange(num_owners), positions_per_owner[:num_owners])[:num_positions])
+    owner_addresses = [f"0x{rng.bytes(20).hex()}" for _ in range(num_owners)]
+
+    # Token ids grow with gaps; the subgraph returns them in string order
+    ids = sorted((str(i) for i in np.cumsum(rng.integers(1, 40, num_positions)) + 1_000), key=str)
+
+    ticks = {tick: _tick(tick) for tick in np.unique(np.concatenate([ticks_lower, ticks_upper])).tolist()}
+    return [
+        {
+            "id": position_id,
+            "owner": owner_addresses[owner],
+            "liquidity": str(liquidity),
+            "tickLower": ticks[tick_lower],
+            "tickUpper": ticks[tick_upper],
+            "token0": token0,
+            "token1": token1,
+            "pool": pool,
+        }
+        for position_id, owner, liquidity, tick_lower, tick_upper in zip(
+            ids, owners.tolist(), liquidities, ticks_lower.tolist(), ticks_upper.tolist()
+        )
+    ]
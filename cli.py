@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+
+# Heavy modules (pandas, the subgraph client) are imported after argument parsing so
+# --help and argument errors return immediately; streamlit and plotly are never imported.
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tally REG PowerVoting for SushiSwap V3 pools without the Streamlit UI."
+    )
+    parser.add_argument("pools", nargs="*", help="Pool addresses to tally")
+    parser.add_argument("--discover", action="store_true", help="Also tally every pool that contains REG")
+    parser.add_argument("--models", help="Models JSON exported from the Import/Export tab (default: 4x/2x model)")
+    parser.add_argument("--block", type=int, help="Tally the pools as they were at this block")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local positions cache")
+    parser.add_argument("--aggregate", action="store_true", help="One row per owner across all pools")
+    parser.add_argument("--positions", action="store_true", help="Write per-position rows instead of per-owner totals")
+    parser.add_argument("--depth", metavar="PERCENTS", help="Write liquidity depth within these comma-separated ± percents of the current price instead of votes")
+    parser.add_argument("-o", "--output", help="Output file; .parquet writes Parquet, anything else CSV (default: CSV to stdout)")
+    args = parser.parse_args(argv)
+    if not args.pools and not args.discover:
+        parser.error("give at least one pool address or --discover")
+    return args
+
+def write_table(table, output):
+    if output and output.endswith(".parquet"):
+        table.to_parquet(output, index=False)
+    else:
+        table.to_csv(output or sys.stdout, index=False)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    import pandas as pd
+    from core.api import DEFAULT_MODELS, load_models, owner_vote_table, pool_depths, tally_pool
+
+    voting_models = load_models(args.models) if args.models else DEFAULT_MODELS
+    pools = list(args.pools)
+    if args.discover:
+        from utils.graph_queries import query_pools_with_token
+        pools += [pool for pool in query_pools_with_token("REG") if pool not in pools]
+
+    if args.depth:
+        percents = [float(percent) for percent in args.depth.split(",") if percent.strip()]
+        table = pool_depths(pools, percents, block=args.block, use_cache=not args.no_cache)
+        write_table(table, args.output)
+        return 0
+
+    results = [tally_pool(pool, voting_models, block=args.block, use_cache=not args.no_cache) for pool in pools]
+
+    # Notices go to stderr as JSON lines so stdout stays a clean table
+    for result in results:
+        for notice in result["notices"]:
+            print(json.dumps({"pool": result["pool"], **notice}), file=sys.stderr)
+
+    if args.positions:
+        frames = [result["positions"] for result in results if not result["positions"].empty]
+        table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    else:
+        table = owner_vote_table(results, voting_models, aggregate=args.aggregate)
+
+    write_table(table, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Streamlit-free core API shared by the app and the CLI
@@ -0,0 +1,106 @@
+import json
+import pandas as pd
+from utils.notices import collect_notices
+from utils.graph_queries import query_positions
+from utils.position_cache import fetch_positions_cached, load_cached_positions, store_positions
+from utils.data_processing import prepare_dataframe_columnar
+from utils.multi_pool import aggregate_owner_votes, vote_column_names
+from utils.depth import DEPTH_PERCENTS, depth_profile, depth_table
+from models.power_voting import DEFAULT_EQUATION, compile_equation
+from models.model_results import model_results_frame
+
+# Models used when none are given, matching the app's default model
+DEFAULT_MODELS = {
+    'default': {
+        'name': 'Default (4x/2x)',
+        'description': 'REG in liquidity pools gets 4x votes, REG equivalent of other tokens gets 2x votes',
+        'params': {'equation': DEFAULT_EQUATION}
+    }
+}
+
+def load_models(path):
+    """Read models exported from the Import/Export tab, rejecting equations that do not compile"""
+    with open(path, encoding="utf-8") as f:
+        models = json.load(f)
+    for model_id, model in models.items():
+        if 'name' not in model or 'equation' not in model.get('params', {}):
+            raise ValueError(f"Model {model_id} needs a name and params.equation")
+        compile_equation(model['params']['equation'])
+    return models
+
+def fetch_positions(pool_address, block=None, use_cache=True):
+    """Raw positions of a pool and the block they were read at; the latest block unless one is given"""
+    if block is None:
+        positions, block, _ = fetch_positions_cached(pool_address, force_refresh=not use_cache)
+        return positions, block
+
+    cached = load_cached_positions(pool_address, block=block) if use_cache else None
+    if cached is not None:
+        return cached
+    positions = query_positions(pool_address, block=block)
+    store_positions(pool_address, block, positions)
+    return positions, block
+
+def prepare_positions(positions):
+    """Prepared positions frame; returns (df, current_price, other_token_symbol, notices)"""
+    with collect_notices() as notices:
+        df, current_price, other_token_symbol = prepare_dataframe_columnar(positions)
+    return df, current_price, other_token_symbol, notices
+
+def evaluate_models(df, voting_models):
+    """df with a PowerVoting_<model_id> column per model; returns (df, notices)"""
+    if df.empty:
+        return df, []
+    with collect_notices() as notices:
+        df = pd.concat([df, model_results_frame(df, voting_models)], axis=1)
+    return df, notices
+
+def tally_pool(pool_address, voting_models=None, block=None, use_cache=True):
+    """Fetch, prepare and evaluate one pool.
+
+    Returns a dict with the pool, block, current price, other token symbol, the
+    positions frame with vote columns, and every notice raised along the way.
+    """
+    voting_models = voting_models or DEFAULT_MODELS
+    positions, block = fetch_positions(pool_address, block=block, use_cache=use_cache)
+    df, current_price, other_token_symbol, prepare_notices = prepare_positions(positions)
+    df, model_notices = evaluate_models(df, voting_models)
+    if not df.empty:
+        df.insert(0, "Pool", pool_address.lower())
+    return {
+        "pool": pool_address.lower(),
+        "block": block,
+        "current_price": current_price,
+        "other_token_symbol": other_token_symbol,
+        "positions": df,
+        "notices": prepare_notices + model_notices,
+    }
+
+def owner_vote_table(results, voting_models=None, aggregate=False):
+    """Per-owner vote table from tally_pool results: one row per pool and owner, or per owner across pools.
+
+    Vote columns are headed by model name, numbered where names repeat; without models the table is empty.
+    """
+    voting_models = DEFAULT_MODELS if voting_models is None else voting_models
+    pool_frames = {result["pool"]: result["positions"] for result in results}
+    if aggregate:
+        table = aggregate_owner_votes(pool_frames, voting_models)
+    else:
+        tables = []
+        for pool_address, df in pool_frames.items():
+            owner_votes = aggregate_owner_votes({pool_address: df}, voting_models)
+            if not owner_votes.empty:
+                owner_votes.insert(0, "Pool", pool_address)
+                owner_votes.insert(1, "Block", next(r["block"] for r in results if r["pool"] == pool_address))
+                tables.append(owner_votes.drop(columns="Pools"))
+        table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    vote_columns = [f"PowerVoting_{model_id}" for model_id in voting_models]
+    return table.rename(columns=vote_column_names(voting_models, reserved=table.columns.difference(vote_columns)))
+
+def pool_depths(pool_addresses, percents=DEPTH_PERCENTS, block=None, use_cache=True):
+    """Active liquidity and REG depth within ±percent of the current price, one row per pool and percent"""
+    profiles = {}
+    for pool_address in pool_addresses:
+        positions, _ = fetch_positions(pool_address, block=block, use_cache=use_cache)
+        profiles[pool_address] = depth_profile(positions)
+    return depth_table(profiles, percents)
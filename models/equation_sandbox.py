@@ -0,0 +1,155 @@
+import os
+import sys
+import queue
+import threading
+import subprocess
+from multiprocessing.connection import Connection
+
+# Evaluate model columns in a separate worker process with a wall-clock budget.
+# The worker talks over inherited pipe descriptors, which needs a POSIX system.
+EQUATION_SANDBOX = os.getenv("EQUATION_SANDBOX", "1" if os.name == "posix" else "0") == "1"
+EQUATION_TIMEOUT_SECONDS = float(os.getenv("EQUATION_TIMEOUT_SECONDS", "5"))
+# Workers evaluating equations at the same time, shared by every session. At least two, so
+# a fast equation is never queued behind a slow one, even on a single CPU
+EQUATION_WORKERS = int(os.getenv("EQUATION_WORKERS", str(min(4, max(2, os.cpu_count() or 1)))))
+# Time allowed for a new worker to start and import NumPy, not counted in the budget
+WORKER_START_TIMEOUT_SECONDS = 60
+
+class EquationTimeoutError(TimeoutError):
+    """An equation that did not finish within its evaluation budget"""
+
+# Repository root, the working directory the worker imports the models package from
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _serve(requests, responses):
+    # Worker loop: evaluate (equation, variables) requests until the pipe closes
+    from models.power_voting import evaluate_equation
+    responses.send(("ready", None))
+    while True:
+        try:
+            equation, variables = requests.recv()
+        except EOFError:
+            return
+        try:
+            responses.send(("ok", evaluate_equation(equation, **variables)))
+        except Exception as e:
+            responses.send(("error", f"{type(e).__name__}: {e}"))
+
+class EquationWorker:
+    """A worker process evaluating equations one at a time.
+
+    A request that overruns its budget kills the worker, so the equation stops
+    using CPU, and the next request starts a fresh one. The worker is a new
+    interpreter rather than a fork, so it never inherits the server's threads,
+    locks or Streamlit state.
+    """
+
+    def __init__(self, timeout=EQUATION_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self.process = None
+        self.requests = None
+        self.responses = None
+        self.lock = threading.Lock()
+        self.restarts = 0
+
+    def _start(self):
+        request_read, request_write = os.pipe()
+        response_read, response_write = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "models.equation_sandbox", str(request_read), str(response_write)],
+                cwd=_ROOT, pass_fds=(request_read, response_write), stdin=subprocess.DEVNULL,
+            )
+        finally:
+            os.close(request_read)
+            os.close(response_write)
+        self.requests = Connection(request_write, readable=False)
+        self.responses = Connection(response_read, writable=False)
+        if not self.responses.poll(WORKER_START_TIMEOUT_SECONDS):
+            self._stop()
+            raise RuntimeError("Equation worker did not start")
+        self.responses.recv()
+
+    def _stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.requests.close()
+            self.responses.close()
+        self.process = None
+        self.requests = None
+        self.responses = None
+
+    def evaluate(self, equation, variables, timeout=None):
+        """Evaluate an equation over the variables in the worker; raises on errors and timeouts"""
+        timeout = self.timeout if timeout is None else timeout
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._stop()
+                self._start()
+            try:
+                self.requests.send((equation, variables))
+                finished = self.responses.poll(timeout)
+                status, value = self.responses.recv() if finished else (None, None)
+            except (EOFError, OSError) as e:
+                self._stop()
+                raise RuntimeError(f"Equation worker failed: {e}") from e
+            if not finished:
+                self._stop()
+                self.restarts += 1
+                raise EquationTimeoutError(f"Equation did not finish within {timeout:g}s and was stopped")
+        if status == "error":
+            raise ValueError(value)
+        return value
+
+    def close(self):
+        with self.lock:
+            self._stop()
+
+class EquationWorkerPool:
+    """A fixed set of equation workers, each lent to one request at a time.
+
+    An equation that runs up to its budget holds only the worker evaluating it,
+    so other sessions keep evaluating on the rest. The most recently returned
+    worker is lent first, and workers start their process on first use, so a
+    quiet server runs a single worker.
+    """
+
+    def __init__(self, size=EQUATION_WORKERS, timeout=EQUATION_TIMEOUT_SECONDS):
+        self.workers = [EquationWorker(timeout) for _ in range(max(1, size))]
+        self.idle = queue.LifoQueue()
+        for worker in reversed(self.workers):
+            self.idle.put(worker)
+
+    @property
+    def restarts(self):
+        return sum(worker.restarts for worker in self.workers)
+
+    def evaluate(self, equation, variables, timeout=None):
+        """Evaluate on the next idle worker, waiting for one if all are busy"""
+        worker = self.idle.get()
+        try:
+            return worker.evaluate(equation, variables, timeout)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide pool of equation workers, shared by every session"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EquationWorkerPool()
+        return _pool
+
+def evaluate_sandboxed(equation, variables, timeout=None):
+    return get_pool().evaluate(equation, variables, timeout)
+
+if __name__ == "__main__":
+    _serve(Connection(int(sys.argv[1]), writable=False), Connection(int(sys.argv[2]), readable=False))
@@ -2,7 +2,7 @@ import uuid
 import streamlit as st
 import json
 import base64
-from models.power_voting import custom_equation_model
+from models.power_voting import custom_equation_model, equation_error
 
 # Initialize default models
 def init_models():
@@ -27,8 +27,18 @@ def init_models():
     if 'edit_model_id' not in st.session_state:
         st.session_state.edit_model_id = None
 
+    if 'model_error' not in st.session_state:
+        st.session_state.model_error = None
+
+# Reject equations that do not compile or exceed the cost limits before they are stored
+def validate_equation():
+    st.session_state.model_error = equation_error(st.session_state.equation)
+    return st.session_state.model_error is None
+
 # Function to add a new custom model
 def add_custom_equation_model():
+    if not validate_equation():
+        return
     model_id = f"model_{uuid.uuid4()}"
     st.session_state.voting_models[model_id] = {
         'name': st.session_state.model_name,
@@ -45,8 +55,24 @@ def add_custom_equation_model():
     st.session_state.model_description = "Custom PowerVoting model"
     st.session_state.equation = "reg_amount * 4 + reg_equivalent * 2"
 
+# Function to add a model for an equation found elsewhere, such as a parameter sweep
+def add_equation_model(name, description, equation):
+    if equation_error(equation):
+        return
+    st.session_state.voting_models[f"model_{uuid.uuid4()}"] = {
+        'name': name,
+        'description': description,
+        'function': custom_equation_model,
+        'params': {
+            'equation': equation
+        }
+    }
+    st.session_state.model_counter += 1
+
 # Function to update an existing model
 def update_model():
+    if not validate_equation():
+        return
     model_id = st.session_state.edit_model_id
     
     if model_id in st.session_state.voting_models:
@@ -83,6 +109,7 @@ def delete_model(model_id):
 
 # Function to cancel editing
 def cancel_edit():
+    st.session_state.model_error = None
     st.session_state.edit_mode = False
     st.session_state.edit_model_id = None
     
@@ -120,9 +147,14 @@ def import_models(json_file):
         
         # Validate the imported models
         valid_models = {}
+        rejected = []
         for model_id, model in imported_models.items():
             if ('name' in model and 'description' in model and 
                 'params' in model and 'equation' in model['params']):
+                error = equation_error(model['params']['equation'])
+                if error:
+                    rejected.append(f"{model['name']}: {error}")
+                    continue
                 
                 # Generate a new ID to avoid collisions
                 new_id = f"imported_{uuid.uuid4()}"
@@ -136,6 +168,8 @@ def import_models(json_file):
         # Add the validated models to the session state
         st.session_state.voting_models.update(valid_models)
         st.success(f"Successfully imported {len(valid_models)} models!")
+        if rejected:
+            st.warning("Skipped models with invalid equations:\n" + "\n".join(f"- {reason}" for reason in rejected))
         
     except Exception as e:
         st.error(f"Error importing models: {e}")
@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from models.equation_sandbox import EquationTimeoutError
+from models.power_voting import custom_equation_values, equation_hash, equation_inputs
+from utils.profiling import annotate, span
+
+# Memory budget for cached model results across datasets, shared by every session
+MODEL_RESULTS_MAX_BYTES = int(os.getenv("MODEL_RESULTS_MAX_BYTES", str(256 * 1024 * 1024)))
+
+class ModelResults:
+    """Votes of every equation evaluated on one dataset, one row of votes per equation.
+
+    Models with identical equations share one row, and a row is only computed the
+    first time its equation is seen, so editing one model costs one evaluation.
+    Rows are kept in least recently used order, so rows of equations no model uses
+    any more are the first dropped when the results outgrow their budget.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.inputs = equation_inputs(df)
+        self.rows = OrderedDict()
+        # Equation hashes of the latest evaluate() call, never pruned
+        self.in_use = set()
+        self.evaluations = 0
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        # A copy of the rows, as another session may be adding one
+        return sum(values.nbytes for values in list(self.rows.values())) + sum(values.nbytes for values in self.inputs.values())
+
+    def _evaluate_equation(self, equation, voting_models):
+        model_ids = [model_id for model_id, model_info in voting_models.items() if model_info['params']['equation'] == equation]
+        with span("model", models=model_ids, equation=equation, rows=self.size):
+            return custom_equation_values(self.inputs, self.size, equation)
+
+    def evaluate(self, voting_models):
+        """Return {model_id: votes} for the models, evaluating only equations not seen yet"""
+        with self.lock:
+            keys = {model_id: equation_hash(model_info['params']['equation']) for model_id, model_info in voting_models.items()}
+            votes = {}
+            for model_id, key in keys.items():
+                if key in self.rows:
+                    self.rows.move_to_end(key)
+                elif key not in votes:
+                    try:
+                        self.rows[key] = self._evaluate_equation(voting_models[model_id]['params']['equation'], voting_models)
+                        self.evaluations += 1
+                    except EquationTimeoutError:
+                        # Scored as zeros this once, and evaluated again on the next call
+                        votes[key] = np.zeros(self.size)
+                        continue
+                votes[key] = self.rows[key]
+            self.in_use = set(keys.values())
+            return {model_id: votes[key] for model_id, key in keys.items()}
+
+    def prune(self, max_bytes):
+        """Drop least recently used rows outside the latest call until the results fit max_bytes"""
+        with self.lock:
+            total = self.nbytes
+            for key in list(self.rows):
+                if total <= max_bytes:
+                    break
+                if key not in self.in_use:
+                    total -= self.rows.pop(key).nbytes
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+def _results_for(df, fingerprint):
+    with _results_lock:
+        results = _results.get(fingerprint)
+        if results is None:
+            results = _results[fingerprint] = ModelResults(df)
+        _results.move_to_end(fingerprint)
+        return results
+
+def _evict(max_bytes=None):
+    max_bytes = MODEL_RESULTS_MAX_BYTES if max_bytes is None else max_bytes
+    with _results_lock:
+        total = sum(results.nbytes for results in _results.values())
+        while total > max_bytes and len(_results) > 1:
+            _, evicted = _results.popitem(last=False)
+            total -= evicted.nbytes
+        # The current dataset is always kept, but not the rows of equations it no longer uses
+        current = next(reversed(_results.values()), None)
+    if current is not None and total > max_bytes:
+        current.prune(max_bytes)
+
+def model_results_frame(df, voting_models, fingerprint=None):
+    """PowerVoting_<model_id> columns for df as a new DataFrame; df itself is never modified.
+
+    With a data fingerprint, results are kept per dataset and reused across reruns and sessions.
+    """
+    results = _results_for(df, fingerprint) if fingerprint else ModelResults(df)
+    evaluations = results.evaluations
+    with span("models", rows=len(df), models=len(voting_models)):
+        votes = results.evaluate(voting_models)
+        annotate(evaluated=results.evaluations - evaluations, cache_hit=results.evaluations == evaluations)
+    if fingerprint:
+        _evict()
+    return pd.DataFrame({f"PowerVoting_{model_id}": values for model_id, values in votes.items()}, index=df.index)
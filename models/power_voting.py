@@ -1,26 +1,220 @@
-import re
-import streamlit as st
+import ast
+import math
+import hashlib
+from functools import lru_cache, reduce
+import numpy as np
+from utils.notices import notify
+from utils.data_processing import active_mask
+from models.equation_sandbox import EQUATION_SANDBOX, EquationTimeoutError, evaluate_sandboxed
+
+# Default model: 4x votes for REG, 2x for the REG equivalent of the other token
+DEFAULT_EQUATION = "reg_amount * 4 + reg_equivalent * 2"
+
+# Variables an equation may reference
+EQUATION_VARIABLES = ("reg_amount", "reg_equivalent", "relative_distance", "price_distance", "is_active")
+
+# Equation functions lowered to their element-wise NumPy counterparts
+EQUATION_FUNCTIONS = {
+    "abs": np.abs,
+    "min": lambda *args: reduce(np.minimum, args),
+    "max": lambda *args: reduce(np.maximum, args),
+    "pow": lambda base, exponent: np.power(np.asarray(base, dtype=float), exponent),
+    "round": np.round,
+}
+
+# AST nodes allowed in an equation: arithmetic, comparisons, names, numbers and calls
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+# Static cost limits, checked before an equation is compiled
+MAX_EQUATION_LENGTH = 1000
+MAX_EQUATION_NODES = 300
+MAX_EQUATION_DEPTH = 30
+# Largest absolute value of a numeric literal
+MAX_LITERAL = 10 ** 15
+# Largest absolute value of a constant exponent; exponents that depend on variables
+# are float powers, which overflow to inf instead of growing without bound
+MAX_EXPONENT = 100
+# Largest order of magnitude a constant sub-expression may reach, just past the float range
+MAX_CONSTANT_LOG10 = 400
+
+class EquationCostError(ValueError):
+    """An equation whose static cost is over the limits"""
+
+def _depth(node):
+    return 1 + max((_depth(child) for child in ast.iter_child_nodes(node)), default=0)
+
+def _constant_value(node):
+    # Value of a constant-only sub-expression, folded only where it is cheap; None otherwise
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _constant_value(node.operand)
+        return None if value is None else -value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.UAdd):
+        return _constant_value(node.operand)
+    return None
+
+def _constant_log10(node):
+    """Upper bound on log10 of the magnitude of a constant-only sub-expression, None if it uses variables"""
+    if isinstance(node, ast.Constant):
+        return math.log10(max(abs(node.value), 1))
+    if isinstance(node, ast.UnaryOp):
+        return _constant_log10(node.operand)
+    if isinstance(node, ast.BinOp):
+        left, right = _constant_log10(node.left), _constant_log10(node.right)
+        if left is None or right is None:
+            return None
+        if isinstance(node.op, ast.Pow):
+            exponent = _constant_value(node.right)
+            return left * abs(exponent) if exponent is not None else left * 10 ** min(right, 300)
+        if isinstance(node.op, ast.Mult):
+            return left + right
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            return max(left, right) + math.log10(2)
+        # Division and modulo results are floats or no larger than the left operand
+        return left
+    if isinstance(node, ast.Call) and node.func.id == "pow" and len(node.args) == 2:
+        return _constant_log10(ast.BinOp(left=node.args[0], op=ast.Pow(), right=node.args[1]))
+    if isinstance(node, ast.Call):
+        bounds = [_constant_log10(arg) for arg in node.args]
+        return None if any(bound is None for bound in bounds) else max(bounds, default=0)
+    if isinstance(node, ast.Compare):
+        # A comparison of constants is a bool, which later arithmetic treats as the int 0 or 1
+        bounds = [_constant_log10(operand) for operand in (node.left, *node.comparators)]
+        return None if any(bound is None for bound in bounds) else 0.0
+    return None
+
+def check_equation_cost(tree, equation=""):
+    """Reject equations that are too long, too deep or whose constants would take unbounded time.
+
+    Python evaluates constant powers such as 10**10**9 exactly on integers, which
+    can pin a CPU for minutes; exponents and constant magnitudes are bounded here.
+    Sub-expressions using a variable are not: evaluate_equation passes every
+    variable as a float, so they overflow to inf instead of growing.
+    """
+    if len(equation) > MAX_EQUATION_LENGTH:
+        raise EquationCostError(f"Equation is longer than {MAX_EQUATION_LENGTH} characters")
+    nodes = list(ast.walk(tree))
+    if len(nodes) > MAX_EQUATION_NODES:
+        raise EquationCostError(f"Equation has more than {MAX_EQUATION_NODES} terms")
+    if _depth(tree) > MAX_EQUATION_DEPTH:
+        raise EquationCostError(f"Equation is nested more than {MAX_EQUATION_DEPTH} levels deep")
+    for node in nodes:
+        if isinstance(node, ast.Constant) and abs(node.value) > MAX_LITERAL:
+            raise EquationCostError(f"Number {node.value!r} is larger than {MAX_LITERAL:.0e}")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            exponent = node.right
+        elif isinstance(node, ast.Call) and node.func.id == "pow" and len(node.args) == 2:
+            exponent = node.args[1]
+        else:
+            continue
+        exponent_log10 = _constant_log10(exponent)
+        if exponent_log10 is not None and exponent_log10 > math.log10(MAX_EXPONENT):
+            raise EquationCostError(f"Constant exponents must be at most {MAX_EXPONENT} in absolute value")
+    magnitude = _constant_log10(tree.body)
+    if magnitude is not None and magnitude > MAX_CONSTANT_LOG10:
+        raise EquationCostError("Equation is a constant too large to evaluate")
+    for node in nodes:
+        if isinstance(node, (ast.BinOp, ast.Call)):
+            magnitude = _constant_log10(node)
+            if magnitude is not None and magnitude > MAX_CONSTANT_LOG10:
+                raise EquationCostError("Constant part of the equation is too large to evaluate")
+
+def equation_hash(equation):
+    """Stable key for an equation, shared by every cache of model results"""
+    return hashlib.blake2b(equation.strip().encode(), digest_size=16).hexdigest()
+
+@lru_cache(maxsize=256)
+def compile_equation(equation):
+    """Parse, whitelist and compile an equation once; cached by equation text"""
+    if len(equation) > MAX_EQUATION_LENGTH:
+        raise EquationCostError(f"Equation is longer than {MAX_EQUATION_LENGTH} characters")
+    tree = ast.parse(equation.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in equation: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in EQUATION_VARIABLES and node.id not in EQUATION_FUNCTIONS:
+            raise ValueError(f"Unknown name in equation: {node.id}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in EQUATION_FUNCTIONS or node.keywords):
+            raise ValueError("Only abs, min, max, pow and round can be called in an equation")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise ValueError(f"Unsupported constant in equation: {node.value!r}")
+        # a < b < c evaluates as (a < b) and (b < c), which is ambiguous on whole columns
+        if isinstance(node, ast.Compare) and len(node.ops) > 1:
+            raise ValueError("Chained comparisons are not supported in equations; compare two values at a time")
+    check_equation_cost(tree, equation)
+    return compile(tree, "<equation>", "eval")
+
+def equation_error(equation):
+    """Why an equation cannot be used, or None when it compiles within the cost limits"""
+    try:
+        compile_equation(equation)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        return str(e)
+    return None
+
+def evaluate_equation(equation, **variables):
+    """Evaluate an equation over scalars or whole NumPy columns in a single pass"""
+    code = compile_equation(equation)
+    namespace = dict(EQUATION_FUNCTIONS)
+    # Variables are NumPy floats, scalars included: arithmetic on Python ints is exact and
+    # unbounded, so a power of a variable could otherwise run for minutes
+    namespace.update({name: np.asarray(variables.get(name, 0), dtype=float) for name in EQUATION_VARIABLES})
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        result = eval(code, {"__builtins__": {}}, namespace)
+    return np.asarray(result, dtype=float)
+
+def equation_inputs(df):
+    """Build the equation variables as NumPy arrays from the positions DataFrame"""
+    return {
+        "reg_amount": df["Actual REG"].to_numpy(dtype=float),
+        "reg_equivalent": df["REG Equivalent"].to_numpy(dtype=float),
+        "relative_distance": df["Relative Distance"].to_numpy(dtype=float),
+        "price_distance": df["Price Distance"].to_numpy(dtype=float),
+        "is_active": active_mask(df).astype(float),
+    }
+
+# Evaluate an equation over prepared input arrays of size positions.
+# Columns run in the sandboxed worker, under its wall-clock budget, when the sandbox is on.
+# A timeout is raised after its notice rather than scored as zeros: it may pass on a later
+# run, so callers must not keep the result.
+def custom_equation_values(inputs, size, equation):
+    try:
+        compile_equation(equation)
+        if EQUATION_SANDBOX:
+            result = evaluate_sandboxed(equation, inputs)
+        else:
+            result = evaluate_equation(equation, **inputs)
+    except EquationTimeoutError as e:
+        notify("error", f"Error evaluating equation: {e}", equation=equation)
+        raise
+    except Exception as e:
+        notify("error", f"Error evaluating equation: {e}", equation=equation)
+        return np.zeros(size)
+    result = np.broadcast_to(result, (size,))
+    # Rows that divide by zero or overflow fall back to 0, like a failed scalar evaluation
+    return np.where(np.isfinite(result), result, 0.0)
+
+# Evaluate an equation for every position of the DataFrame at once
+def custom_equation_column(df, equation):
+    return custom_equation_values(equation_inputs(df), len(df), equation)
 
 # Function to evaluate a custom equation for PowerVoting with dual-component support
 def custom_equation_model(reg_amount, equation, reg_equivalent=0, **kwargs):
     # Available variables in the equation: reg_amount, reg_equivalent, relative_distance, price_distance, is_active
-    # Replace variable names with their values from kwargs
-    for var_name, var_value in kwargs.items():
-        # For boolean is_active, convert to 1 or 0
-        if var_name == "is_active":
-            var_value = 1 if var_value else 0
-        # Safe replacement using regex to avoid partial name matches
-        equation = re.sub(r'\b' + var_name + r'\b', str(var_value), equation)
-    
-    # Replace 'reg_amount' and 'reg_equivalent' with their values
-    equation = re.sub(r'\breg_amount\b', str(reg_amount), equation)
-    equation = re.sub(r'\breg_equivalent\b', str(reg_equivalent), equation)
-    
+    # For boolean is_active, convert to 1 or 0
+    if "is_active" in kwargs:
+        kwargs["is_active"] = 1 if kwargs["is_active"] else 0
+
     try:
-        # Evaluate the equation safely
-        result = eval(equation, {"__builtins__": {}}, 
-                     {"abs": abs, "min": min, "max": max, "pow": pow, "round": round})
-        return float(result)
+        result = float(evaluate_equation(equation, reg_amount=reg_amount, reg_equivalent=reg_equivalent, **kwargs))
+        if not np.isfinite(result):
+            raise ArithmeticError("equation result is not finite")
+        return result
     except Exception as e:
-        st.error(f"Error evaluating equation: {e}")
+        notify("error", f"Error evaluating equation: {e}", equation=equation)
         return 0
@@ -0,0 +1,233 @@
+import os
+import ast
+import math
+import time
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from models.equation_sandbox import EQUATION_SANDBOX, EQUATION_TIMEOUT_SECONDS, EquationTimeoutError, evaluate_sandboxed
+from models.power_voting import EQUATION_FUNCTIONS, EQUATION_VARIABLES, equation_error, evaluate_equation
+from utils.owner_index import gini
+
+# Worker processes of a parameter sweep, and grid points evaluated per task
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", str(os.cpu_count() or 1)))
+SWEEP_BATCH_SIZE = 64
+# Largest grid a sweep may run
+MAX_SWEEP_POINTS = int(os.getenv("MAX_SWEEP_POINTS", "20000"))
+# Smaller grids are evaluated in-process, where they finish before workers would start
+MIN_PARALLEL_POINTS = 256
+
+# Summary statistics reported for every grid point
+SWEEP_STATS = ("top_owner_share", "gini", "active_share", "inactive_share")
+
+def template_coefficients(template):
+    """Named coefficients of an equation template: every name that is not a variable or function"""
+    tree = ast.parse(template.strip(), mode="eval")
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    return sorted(names - set(EQUATION_VARIABLES) - set(EQUATION_FUNCTIONS))
+
+def _number(value):
+    # Integral values print as integers, so rendered equations read like hand-written ones
+    value = round(float(value), 10)
+    return int(value) if value.is_integer() else value
+
+def parse_range(text):
+    """Values of a coefficient range: "1..8" (step 1), "0..2:0.25" or a list "1, 2, 4" """
+    text = text.strip()
+    if ".." not in text:
+        values = [_number(value) for value in text.split(",") if value.strip()]
+        if not values:
+            raise ValueError("Empty coefficient range")
+        return values
+    bounds, _, step = text.partition(":")
+    start, _, stop = bounds.partition("..")
+    start, stop, step = float(start), float(stop), float(step) if step.strip() else 1.0
+    if step <= 0:
+        raise ValueError(f"Range step must be positive in {text!r}")
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    if count < 1:
+        raise ValueError(f"Empty coefficient range {text!r}")
+    if count > MAX_SWEEP_POINTS:
+        raise ValueError(f"Range {text!r} has more than {MAX_SWEEP_POINTS} values")
+    return [_number(start + step * i) for i in range(count)]
+
+def sweep_size(ranges):
+    return math.prod(len(values) for values in ranges.values())
+
+def sweep_grid(ranges):
+    """Every combination of coefficient values, as {coefficient: value} dicts"""
+    names = list(ranges)
+    size = sweep_size(ranges)
+    if size > MAX_SWEEP_POINTS:
+        raise ValueError(f"Sweep has {size} grid points, more than the limit of {MAX_SWEEP_POINTS}")
+    return [dict(zip(names, values)) for values in itertools.product(*ranges.values())]
+
+class _Substitute(ast.NodeTransformer):
+    def __init__(self, coefficients):
+        self.coefficients = coefficients
+
+    def visit_Name(self, node):
+        if node.id not in self.coefficients:
+            return node
+        value = self.coefficients[node.id]
+        constant = ast.Constant(abs(value))
+        return ast.copy_location(ast.UnaryOp(ast.USub(), constant) if value < 0 else constant, node)
+
+def render_equation(template, coefficients):
+    """Equation of one grid point: the template with its coefficients replaced by numbers.
+
+    The result is an ordinary equation, whitelisted and cost-checked like any
+    other, and can be saved as a model as it is.
+    """
+    tree = _Substitute(coefficients).visit(ast.parse(template.strip(), mode="eval"))
+    return ast.unparse(ast.fix_missing_locations(tree))
+
+def vote_stats(votes, owner_codes, owner_count, active):
+    """Top-owner share, Gini and active/inactive vote shares of one set of position votes"""
+    totals = np.bincount(owner_codes, weights=votes, minlength=owner_count)
+    total = totals.sum()
+    if total <= 0:
+        return {name: 0.0 for name in SWEEP_STATS}
+    active_share = float(votes[active].sum() / total)
+    return {
+        "top_owner_share": float(totals.max() / total),
+        "gini": gini(totals),
+        "active_share": active_share,
+        "inactive_share": 1.0 - active_share,
+    }
+
+def _error_row(template, coefficients, error):
+    return {**coefficients, "equation": render_equation(template, coefficients),
+            **{name: np.nan for name in SWEEP_STATS}, "total_votes": np.nan, "error": error}
+
+def _evaluate_point(template, coefficients, inputs, owner_codes, owner_count, active, sandbox_timeout=None):
+    # With a sandbox timeout the equation runs in the sandboxed worker under that budget
+    equation = render_equation(template, coefficients)
+    row = {**coefficients, "equation": equation}
+    try:
+        if sandbox_timeout is not None:
+            result = evaluate_sandboxed(equation, inputs, sandbox_timeout)
+        else:
+            result = evaluate_equation(equation, **inputs)
+        votes = np.broadcast_to(result, owner_codes.shape)
+        votes = np.where(np.isfinite(votes), votes, 0.0)
+    except EquationTimeoutError:
+        raise
+    except Exception as e:
+        return _error_row(template, coefficients, str(e))
+    return {**row, **vote_stats(votes, owner_codes, owner_count, active), "total_votes": float(votes.sum()), "error": None}
+
+# Positions of the sweep, set once per worker process by its initializer, and when the
+# worker's current point started
+_worker_state = None
+_point_started = None
+
+def _watchdog(timeout, armed):
+    # A point past its budget ends the worker process, which breaks the pool and stops the sweep.
+    # The pool cannot shut down cleanly if a worker ends while it is still starting others, so the
+    # watchdog waits until every batch, and with them every worker, has been submitted
+    armed.wait()
+    while True:
+        time.sleep(timeout / 10)
+        started = _point_started
+        if started is not None and time.monotonic() - started > timeout:
+            os._exit(1)
+
+def _init_worker(inputs, owner_codes, owner_count, timeout, armed):
+    global _worker_state
+    _worker_state = (inputs, owner_codes, owner_count, inputs["is_active"] > 0)
+    threading.Thread(target=_watchdog, args=(timeout, armed), daemon=True).start()
+
+def _evaluate_batch(template, points):
+    global _point_started
+    rows = []
+    for point in points:
+        _point_started = time.monotonic()
+        rows.append(_evaluate_point(template, point, *_worker_state))
+        _point_started = None
+    return rows
+
+def run_sweep(template, ranges, inputs, owner_codes, owner_count=None, workers=None, batch_size=SWEEP_BATCH_SIZE,
+              timeout=EQUATION_TIMEOUT_SECONDS):
+    """Evaluate a template at every grid point; yields one stats row per point as batches finish.
+
+    inputs are the equation variables of the positions (equation_inputs) and
+    owner_codes the owner of each position as integer codes (OwnerIndex.codes).
+    Rows arrive in completion order, not grid order. Large grids run on a pool of
+    spawned worker processes, each receiving the positions once; spawning rather
+    than forking keeps the server's threads and locks out of the workers. Small
+    grids run in the equation sandbox when it is on.
+
+    Every point has the wall-clock budget of one equation evaluation. A point
+    that overruns it stops the sweep, and the points not evaluated by then are
+    yielded as error rows.
+    """
+    points = sweep_grid(ranges)
+    if not points:
+        return
+    error = equation_error(render_equation(template, points[0]))
+    if error:
+        raise ValueError(error)
+    if owner_count is None:
+        owner_count = int(owner_codes.max()) + 1 if len(owner_codes) else 0
+    workers = SWEEP_WORKERS if workers is None else workers
+    batches = [points[start:start + batch_size] for start in range(0, len(points), batch_size)]
+
+    timeout_error = f"Sweep stopped: a variant did not finish within {timeout:g}s"
+    if workers <= 1 or len(points) < MIN_PARALLEL_POINTS:
+        active = inputs["is_active"] > 0
+        for index, point in enumerate(points):
+            try:
+                yield _evaluate_point(template, point, inputs, owner_codes, owner_count, active,
+                                      sandbox_timeout=timeout if EQUATION_SANDBOX else None)
+            except EquationTimeoutError:
+                for remaining in points[index:]:
+                    yield _error_row(template, remaining, timeout_error)
+                return
+        return
+
+    context = multiprocessing.get_context("spawn")
+    armed = context.Event()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(batches)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(inputs, owner_codes, owner_count, timeout, armed),
+    ) as pool:
+        futures = {pool.submit(_evaluate_batch, template, batch): batch for batch in batches}
+        armed.set()
+        yielded = set()
+        try:
+            for future in as_completed(futures):
+                try:
+                    rows = future.result()
+                except BrokenProcessPool:
+                    # A worker ended itself over a point's budget and the pool is gone with it:
+                    # batches that finished are still reported, the others as error rows
+                    for other, batch in futures.items():
+                        if other in yielded:
+                            continue
+                        if other.done() and not other.cancelled() and other.exception() is None:
+                            yield from other.result()
+                        else:
+                            for point in batch:
+                                yield _error_row(template, point, timeout_error)
+                    return
+                yielded.add(future)
+                yield from rows
+        finally:
+            # A sweep abandoned part-way drops its queued batches
+            for future in futures:
+                future.cancel()
+
+def sweep_frame(rows, coefficients=None):
+    """Sweep rows as a DataFrame: coefficients, equation, then the summary statistics"""
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return frame
+    coefficients = coefficients or [column for column in frame.columns if column not in (*SWEEP_STATS, "equation", "total_votes", "error")]
+    return frame[[*coefficients, "equation", *SWEEP_STATS, "total_votes", "error"]].sort_values(coefficients, ignore_index=True)
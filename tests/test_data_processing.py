@@ -0,0 +1,11 @@
+import pytest
+from bench.synthetic import synthetic_positions
+from utils.data_processing import compare_with_reference
+
+@pytest.mark.parametrize("size,seed", [(1, 0), (50, 1), (1_000, 2), (10_000, 3)])
+def test_columnar_matches_reference(size, seed):
+    compare_with_reference(synthetic_positions(size, seed=seed))
+
+@pytest.mark.parametrize("reg_price", [0.001, 0.65, 250.0])
+def test_columnar_matches_reference_across_prices(reg_price):
+    compare_with_reference(synthetic_positions(2_000, seed=4, reg_price=reg_price, full_range_share=0.3))
@@ -0,0 +1,9 @@
+import pytest
+from bench.run import check_depth
+from bench.synthetic import synthetic_positions
+
+@pytest.mark.parametrize("size,seed,reg_price", [(10, 0, 0.65), (1_000, 1, 0.65), (10_000, 2, 0.02), (5_000, 3, 40.0)])
+def test_depth_matches_position_by_position_reference(size, seed, reg_price):
+    sources = {"synthetic": synthetic_positions(size, seed=seed, reg_price=reg_price)}
+    [(_, error)] = check_depth(sources, percents=(0.5, 1, 2, 5, 10, 50, 90))
+    assert error < 1e-6
@@ -0,0 +1,56 @@
+import copy
+import pytest
+import utils.graph_queries as graph_queries
+from bench.synthetic import synthetic_positions
+
+class FakeSubgraph:
+    """Pages positions like TheGraph: ids compared as strings, ordered by id, first N after the cursor"""
+
+    def __init__(self, positions):
+        self.positions = sorted(positions, key=lambda p: p["id"])
+
+    def execute(self, query, variable_values):
+        lower, upper, cursor = variable_values["lower"], variable_values["upper"], variable_values["cursor"]
+        page = [
+            p for p in self.positions
+            if p["id"] > cursor and p["id"] >= lower and p["id"] < upper
+        ][:variable_values["first"]]
+        # Slim positions, completed by hydrate_positions as the real query's are
+        return {"positions": [
+            {key: copy.deepcopy(p[key]) for key in ("id", "owner", "liquidity")}
+            | {"tickLower": {"tickIdx": p["tickLower"]["tickIdx"]}, "tickUpper": {"tickIdx": p["tickUpper"]["tickIdx"]}}
+            for p in page
+        ]}
+
+@pytest.fixture
+def subgraph(monkeypatch):
+    positions = synthetic_positions(1_000, seed=5)
+    # Ids of every length, including ones on range boundaries
+    extra_ids = ["1", "5", "9", "10", "99", "100", "5000000", "99999999999"]
+    positions += [{**positions[0], "id": position_id} for position_id in extra_ids]
+    fake = FakeSubgraph(positions)
+    pool = positions[0]["pool"]
+    monkeypatch.setattr(graph_queries, "get_client", lambda: fake)
+    monkeypatch.setattr(graph_queries, "query_pool_state", lambda *args, **kwargs: pool)
+    return fake
+
+@pytest.mark.parametrize("num_ranges", [1, 2, 3, 8, 9, 10, 20, 100, 1000])
+def test_split_id_ranges_cover_the_id_space_in_order(num_ranges):
+    ranges = graph_queries.split_id_ranges(num_ranges)
+    assert len(ranges) == num_ranges
+    assert ranges[0][0] == "" and ranges[-1][1] == graph_queries.ID_UPPER_SENTINEL
+    assert all(upper == next_lower for (_, upper), (next_lower, _) in zip(ranges, ranges[1:]))
+    assert all(lower < upper for lower, upper in ranges)
+
+@pytest.mark.parametrize("num_ranges", [1, 3, 8, 20, 100])
+@pytest.mark.parametrize("page_size", [1, 7, 1000])
+def test_parallel_pages_return_every_position_once(subgraph, num_ranges, page_size):
+    positions = graph_queries.query_positions_parallel("0xpool", num_ranges=num_ranges, max_workers=4, page_size=page_size)
+    assert [p["id"] for p in positions] == [p["id"] for p in subgraph.positions]
+
+def test_streamed_pages_in_range_order_match_parallel_fetch(subgraph):
+    pages = {}
+    for index, page in graph_queries.iter_positions_parallel("0xpool", num_ranges=8, max_workers=4, page_size=13):
+        pages.setdefault(index, []).extend(page)
+    streamed = [p["id"] for index in sorted(pages) for p in pages[index]]
+    assert streamed == [p["id"] for p in subgraph.positions]
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from models.power_voting import (
+    DEFAULT_EQUATION, MAX_EQUATION_LENGTH, EquationCostError, compile_equation, equation_error, evaluate_equation,
+)
+
+@pytest.mark.parametrize("equation", [
+    DEFAULT_EQUATION,
+    "reg_amount * (1 + is_active) / (1 + relative_distance)",
+    "max(reg_amount, reg_equivalent) - min(price_distance, 1) + abs(-2)",
+    "pow(reg_amount, 0.5) + round(reg_equivalent) + reg_amount ** 2",
+    "(reg_amount > 1) * 3 + (price_distance <= 0.1)",
+    "10 ** 15 + 2 ** 100",
+])
+def test_accepts_supported_equations(equation):
+    assert equation_error(equation) is None
+
+@pytest.mark.parametrize("equation,message", [
+    ("reg_amount.real", "Unsupported syntax"),
+    ("__import__('os')", "Only abs, min, max, pow and round"),
+    ("(lambda: 1)()", "Only abs, min, max, pow and round"),
+    ("lambda: 1", "Unsupported syntax"),
+    ("[reg_amount][0]", "Unsupported syntax"),
+    ("reg_amount if is_active else 0", "Unsupported syntax"),
+    ("reg_amount and 1", "Unsupported syntax"),
+    ("balance * 2", "Unknown name"),
+    ("pow(base=reg_amount, exponent=2)", "Only abs, min, max, pow and round"),
+    ("reg_amount.__class__", "Unsupported syntax"),
+    ("'REG' * 2", "Unsupported constant"),
+    ("True + reg_amount", "Unsupported constant"),
+    ("reg_amount < 1 < 2", "Chained comparisons"),
+    ("reg_amount +", "invalid syntax"),
+])
+def test_rejects_unsupported_syntax(equation, message):
+    error = equation_error(equation)
+    assert error is not None and message in error
+
+@pytest.mark.parametrize("equation,message", [
+    ("reg_amount" + " " * MAX_EQUATION_LENGTH, "longer than"),
+    ("+".join(["1"] * 160), "more than 300 terms"),
+    ("(" * 40 + "reg_amount" + ")" * 40 + " + " + "abs(" * 31 + "1" + ")" * 31, "nested more than"),
+    ("reg_amount * 10000000000000000", "larger than"),
+    ("reg_amount ** 101", "exponents must be at most"),
+    ("pow(reg_amount, -1000)", "exponents must be at most"),
+    ("reg_amount ** (10 ** 3)", "exponents must be at most"),
+    ("99 ** 99 ** 2", "exponents must be at most"),
+    ("(((((1 < 2) + 10) ** 100) ** 100) ** 100) ** 50", "too large"),
+    ("(10 ** 100) ** 5", "too large"),
+])
+def test_rejects_equations_over_the_cost_limits(equation, message):
+    with pytest.raises(EquationCostError) as error:
+        compile_equation(equation)
+    assert message in str(error.value)
+
+def test_powers_of_variables_overflow_instead_of_running_unbounded():
+    # Passes the static check; float variables make it overflow rather than grow as an exact int
+    equation = "((((is_active + 10) ** 100) ** 100) ** 100) ** 50"
+    assert equation_error(equation) is None
+    assert np.isinf(evaluate_equation(equation, is_active=1))
+
+def test_evaluates_whole_columns():
+    reg_amount = np.array([0.0, 1.0, 2.5])
+    result = evaluate_equation(DEFAULT_EQUATION, reg_amount=reg_amount, reg_equivalent=np.ones(3))
+    assert np.array_equal(result, reg_amount * 4 + 2)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from utils.v3_math import (
+    MAX_TICK, MIN_TICK, Q96, get_amounts_for_liquidity, get_amounts_for_liquidity_batch, get_sqrt_ratio_at_tick,
+)
+
+# TickMath.MIN_SQRT_RATIO and MAX_SQRT_RATIO
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+def test_sqrt_ratio_at_tick_bounds():
+    assert get_sqrt_ratio_at_tick(MIN_TICK) == MIN_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(MAX_TICK) == MAX_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(0) == Q96
+
+def test_sqrt_ratio_at_tick_rejects_ticks_out_of_range():
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(MIN_TICK - 1)
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(MAX_TICK + 1)
+
+def test_sqrt_ratio_at_tick_is_monotonic():
+    ticks = np.linspace(MIN_TICK, MAX_TICK, 2001).astype(int)
+    ratios = [get_sqrt_ratio_at_tick(int(tick)) for tick in ticks]
+    assert all(low < high for low, high in zip(ratios, ratios[1:]))
+
+@pytest.mark.parametrize("current_tick", [MIN_TICK, -120_000, -60, 0, 61, 200_000, MAX_TICK])
+def test_batch_amounts_match_scalar(current_tick):
+    rng = np.random.default_rng(current_tick % 1000)
+    ticks_lower = rng.integers(MIN_TICK, MAX_TICK - 1, 300)
+    ticks_upper = np.minimum(ticks_lower + rng.integers(1, 200_000, 300), MAX_TICK)
+    # Liquidity is a uint128, past the int64 range
+    liquidities = [int(value) for value in rng.integers(1, 2**62, 300)]
+    liquidities[:3] = [1, 2**128 - 1, 10**30]
+    sqrt_price = get_sqrt_ratio_at_tick(current_tick)
+
+    amount0, amount1 = get_amounts_for_liquidity_batch(sqrt_price, ticks_lower, ticks_upper, liquidities)
+    expected = [
+        get_amounts_for_liquidity(sqrt_price, int(lower), int(upper), liquidity)
+        for lower, upper, liquidity in zip(ticks_lower, ticks_upper, liquidities)
+    ]
+    assert list(amount0) == [amounts[0] for amounts in expected]
+    assert list(amount1) == [amounts[1] for amounts in expected]
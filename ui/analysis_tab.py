@@ -1,28 +1,85 @@
+import pandas as pd
 import streamlit as st
-from utils.visualisation import plot_owner_positions
-from models.power_voting import custom_equation_model
+from utils.visualisation import plot_liquidity_depth, plot_owner_positions, plot_vote_share_scenarios
+from utils.scenarios import owner_vote_curves, price_grid
+from utils.depth import DEPTH_PERCENTS
+from utils.pipeline_memo import depth_stage
+from models.model_results import model_results_frame
+from models.equation_sandbox import EquationTimeoutError
+from ui.notices import render_notices
+from utils.data_processing import active_mask, display_dataframe
+from utils.notices import collect_notices
+from utils.profiling import span
 
-def render_analysis_tab(df_display, current_price, other_token_symbol):
-    # Apply all voting models to create columns for each
-    for model_id, model_info in st.session_state.voting_models.items():
-        model_name = model_info['name']
-        model_func = model_info['function']
-        params = model_info['params']
-        
-        # Column name for this model
-        voting_col = f"PowerVoting_{model_id}"
-        
-        # Apply the model function to calculate voting power
-        df_display[voting_col] = df_display.apply(
-            lambda row: model_func(
-                row["Actual REG"],
-                reg_equivalent=row["REG Equivalent"],
-                relative_distance=row["Relative Distance"],
-                price_distance=row["Price Distance"],
-                is_active=row["Active"] == "✅ Active",
-                **params
-            ), axis=1
+def render_price_scenarios(positions, current_price, other_token_symbol):
+    with st.expander("📉 Price scenarios: vote share at hypothetical REG prices"):
+        models = st.session_state.voting_models
+        model_id = st.selectbox("Model", list(models), format_func=lambda key: models[key]['name'], key="scenario_model")
+        low, high = st.slider("Price range (× current price)", 0.1, 5.0, (0.5, 2.0), key="scenario_range")
+        points = st.slider("Price points", 10, 200, 60, key="scenario_points")
+
+        if st.button("Run scenarios", key="run_scenarios"):
+            prices = price_grid(current_price, low, high, points)
+            try:
+                curves = owner_vote_curves(positions, prices, {model_id: models[model_id]['params']['equation']})[model_id]
+            except EquationTimeoutError as e:
+                st.error(f"Scenarios stopped: {e}")
+                return
+
+            selected_owner_option = st.session_state.get('selected_owner_option', 'All owners')
+            highlight_owner = None if selected_owner_option == "All owners" else selected_owner_option
+            fig = plot_vote_share_scenarios(curves, current_price, other_token_symbol,
+                                            model_name=models[model_id]['name'], highlight_owner=highlight_owner)
+            st.plotly_chart(fig, use_container_width=True, key="scenario_chart")
+
+def render_liquidity_depth(positions, fingerprint):
+    with st.expander("🌊 Liquidity depth: active liquidity by price"):
+        profile = depth_stage(positions, fingerprint)
+        if profile.empty:
+            st.info("No liquidity in this pool.")
+            return
+        symbol = profile.other_token_symbol
+        percent = st.slider("Depth band (± % of current price)", 0.5, 50.0, 2.0, step=0.5, key="depth_percent")
+        depth = profile.within(percent)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Active liquidity", f"{depth['active_liquidity']:.4g}")
+        col2.metric(f"REG depth (+{percent:g}%)", f"{float(depth['reg_depth']):,.2f} REG")
+        col3.metric(f"{symbol} depth (-{percent:g}%)", f"{float(depth['other_depth']):,.2f} {symbol}",
+                    help=f"{float(depth['reg_equivalent']):,.2f} REG at the current price")
+
+        low, high = st.slider("Chart range (× current price)", 0.05, 20.0, (0.2, 5.0), key="depth_range")
+        st.plotly_chart(plot_liquidity_depth(profile, low, high), use_container_width=True, key="depth_chart")
+
+        table = profile.depth_frame(sorted({*DEPTH_PERCENTS, percent}))
+        st.dataframe(
+            table.drop(columns="active_liquidity"),
+            column_config={
+                "percent": st.column_config.NumberColumn("Band (± %)", format="%g"),
+                "reg_depth": st.column_config.NumberColumn("REG (+%)", format="%.2f"),
+                "other_depth": st.column_config.NumberColumn(f"{symbol} (-%)", format="%.2f"),
+                "reg_equivalent": st.column_config.NumberColumn(f"{symbol} in REG", format="%.2f"),
+            },
+            hide_index=True,
+            use_container_width=True,
         )
+
+def render_analysis_tab(df_display, current_price, other_token_symbol, positions=None, fingerprint=None):
+    # Price scenarios and the depth profile run over the whole pool, so they need the raw positions
+    if positions:
+        render_price_scenarios(positions, current_price, other_token_symbol)
+        if fingerprint:
+            render_liquidity_depth(positions, fingerprint)
+    
+    # Vote columns for models the app has not already added, without writing into the passed frame
+    missing_models = {
+        model_id: model_info for model_id, model_info in st.session_state.voting_models.items()
+        if f"PowerVoting_{model_id}" not in df_display.columns
+    }
+    if missing_models:
+        with collect_notices() as notices:
+            df_display = pd.concat([df_display, model_results_frame(df_display, missing_models)], axis=1)
+        render_notices(notices)
     
     # Display each model sequentially in the analysis tab
     for model_id, model_info in st.session_state.voting_models.items():
@@ -49,27 +106,28 @@ def render_analysis_tab(df_display, current_price, other_token_symbol):
                 voting_key=voting_col,
                 equation=equation
             )
-            st.plotly_chart(fig, use_container_width=True, key=f"chart_{model_id}")
+            with span("plotly_chart", model=model_id):
+                st.plotly_chart(fig, use_container_width=True, key=f"chart_{model_id}")
         
         with col2:
             selected_owner_option = st.session_state.get('selected_owner_option', 'All owners')
             if selected_owner_option != "All owners":
                 # Total PowerVoting
                 total_power_voting = df_display[voting_col].sum()
-                active_power_voting = df_display[df_display["Active"] == "✅ Active"][voting_col].sum()
+                active_power_voting = df_display[active_mask(df_display)][voting_col].sum()
                 
                 col_a, col_b = st.columns(2)
                 with col_a:
                     st.metric("Total PowerVoting", f"{total_power_voting:.2f} votes")
                     # Active positions moved here
-                    active_count = df_display[df_display["Active"] == "✅ Active"].shape[0]
+                    active_count = int(active_mask(df_display).sum())
                     total_count = df_display.shape[0]
                     st.metric("Active Positions", f"{active_count}/{total_count}")
                 with col_b:
                     st.metric("Active PowerVoting", f"{active_power_voting:.2f} votes")
                 
                 # PowerVoting breakdown by position
-                voting_df = df_display[["Liquidity ID", "Actual REG", "REG Equivalent", 
+                voting_df = display_dataframe(df_display)[["Liquidity ID", "Actual REG", "REG Equivalent", 
                                       "PowerVoting REG", "PowerVoting Equivalent", voting_col, 
                                       "Min REG Price", "Max REG Price", "Active", "Position Type"]].copy()
                 voting_df["Position"] = voting_df["Liquidity ID"].apply(lambda x: f"#{x}")
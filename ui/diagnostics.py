@@ -0,0 +1,57 @@
+import pandas as pd
+import streamlit as st
+from utils.pipeline_memo import PIPELINE_CACHE
+from utils.subgraph_client import client_stats
+
+def _span_table(profile):
+    # Spans finish innermost first, so sort by start time for a top-down view
+    records = sorted(profile.spans, key=lambda record: record["start_ms"])
+    return pd.DataFrame({
+        "Stage": ["  " * record["depth"] + record["name"] for record in records],
+        "Time (ms)": [round(record["duration_ms"], 2) for record in records],
+        "Rows": [record.get("rows") for record in records],
+        "Payload bytes": [record.get("payload_bytes") for record in records],
+        "Wire bytes": [record.get("wire_bytes") for record in records],
+        "Cache": [{True: "hit", False: "miss"}.get(record.get("cache_hit"), "") for record in records],
+    })
+
+def _model_costs(profile):
+    records = [record for record in profile.spans if record["name"] == "model"]
+    return pd.DataFrame({
+        "Models": [", ".join(record["models"]) for record in records],
+        "Equation": [record["equation"] for record in records],
+        "Rows": [record["rows"] for record in records],
+        "Time (ms)": [round(record["duration_ms"], 3) for record in records],
+        "µs per 1k rows": [round(record["duration_ms"] * 1e6 / max(record["rows"], 1), 2) for record in records],
+    })
+
+def _hit_rate(hits, total):
+    return f"{hits / total:.0%} of {total}" if total else "n/a"
+
+def render_diagnostics(profile):
+    """Collapsible breakdown of where the last run spent its time"""
+    with st.expander("🩺 Diagnostics"):
+        top_level = [record for record in profile.spans if record["depth"] == 0]
+        requests = [record for record in profile.spans if record["name"] == "subgraph_request"]
+        cache_lookups = [record["cache_hit"] for record in profile.spans if "cache_hit" in record]
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Profiled time", f"{sum(record['duration_ms'] for record in top_level):.0f} ms")
+        col2.metric("Subgraph requests", len(requests))
+        col3.metric("Payload", f"{sum(record.get('payload_bytes', 0) for record in requests) / 1024:.0f} KiB")
+        col4.metric("Cache hits (this run)", _hit_rate(sum(cache_lookups), len(cache_lookups)))
+
+        st.dataframe(_span_table(profile), hide_index=True)
+
+        model_costs = _model_costs(profile)
+        if not model_costs.empty:
+            st.markdown("**Model evaluations** (models whose results were already cached are not re-evaluated)")
+            st.dataframe(model_costs, hide_index=True)
+
+        # Process-wide counters, shared by every session
+        requests_stats = client_stats()
+        st.caption(
+            f"Pipeline cache: {_hit_rate(PIPELINE_CACHE.hits, PIPELINE_CACHE.hits + PIPELINE_CACHE.misses)} lookups hit, "
+            f"{PIPELINE_CACHE.total_bytes / 2**20:.1f} MiB held. "
+            f"Subgraph client: {requests_stats['upstream_requests']} upstream requests, {requests_stats['coalesced_requests']} coalesced."
+        )
@@ -0,0 +1,55 @@
+import datetime
+import streamlit as st
+from utils.history import blocks_between, blocks_for_timestamps, fetch_history, owner_vote_history, stored_blocks
+from utils.visualisation import plot_owner_vote_history
+from utils.notices import collect_notices
+from ui.notices import render_notices
+
+def render_history_tab(pool_address, latest_block):
+    st.header("Vote History")
+    st.markdown("Snapshot the pool at past blocks and follow each owner's votes over time. "
+                "Snapshots already stored locally are never fetched again.")
+
+    range_mode = st.radio("Select snapshots by", ["Block range", "Dates"], horizontal=True, key="history_mode")
+    snapshot_count = st.slider("Number of snapshots", 2, 100, 12, key="history_count")
+
+    if range_mode == "Block range":
+        col1, col2 = st.columns(2)
+        with col1:
+            start_block = st.number_input("Start block", min_value=0, value=max(0, latest_block - 100_000), step=1000, key="history_start")
+        with col2:
+            end_block = st.number_input("End block", min_value=0, value=latest_block, step=1000, key="history_end")
+    else:
+        today = datetime.date.today()
+        date_range = st.date_input("Date range", (today - datetime.timedelta(days=30), today), key="history_dates")
+        # While the user is picking, the range holds only its start date
+        if len(date_range) != 2:
+            st.info("Pick an end date to load the history.")
+
+    models = st.session_state.voting_models
+    model_id = st.selectbox("Model", list(models), format_func=lambda key: models[key]['name'], key="history_model")
+
+    range_ready = range_mode == "Block range" or len(date_range) == 2
+    if st.button("Load history", key="load_history", disabled=not range_ready):
+        with st.spinner("Fetching historical snapshots 🔄"), collect_notices() as notices:
+            if range_mode == "Block range":
+                blocks = blocks_between(start_block, end_block, snapshot_count)
+            else:
+                start, end = date_range
+                start_ts = datetime.datetime.combine(start, datetime.time()).timestamp()
+                end_ts = datetime.datetime.combine(end, datetime.time()).timestamp()
+                step = (end_ts - start_ts) / max(1, snapshot_count - 1)
+                blocks = sorted(set(blocks_for_timestamps([start_ts + i * step for i in range(snapshot_count)])))
+
+            already_stored = len(set(blocks) & set(stored_blocks(pool_address)))
+            history = fetch_history(pool_address, blocks, models)
+        render_notices(notices)
+
+        st.caption(f"{len(blocks)} snapshots ({already_stored} from the local store)")
+        if history.empty:
+            st.warning("No positions found at these blocks.")
+            return
+
+        votes = owner_vote_history(history, f"PowerVoting_{model_id}")
+        fig = plot_owner_vote_history(votes, model_name=models[model_id]['name'])
+        st.plotly_chart(fig, use_container_width=True, key="history_chart")
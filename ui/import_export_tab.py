@@ -1,20 +1,60 @@
 import streamlit as st
 from models.model_management import export_models, import_models
+from utils.pipeline_memo import snapshot_bytes_stage
+from utils.snapshots import SNAPSHOT_DIR, SNAPSHOT_SUFFIX, import_snapshot, save_snapshot
 
-def render_import_export_tab():
+def render_snapshot_upload():
+    st.markdown(f"Upload a pool snapshot to replay it offline. It is stored in `{SNAPSHOT_DIR}/`:")
+    uploaded_snapshot = st.file_uploader("Choose a snapshot file", type=SNAPSHOT_SUFFIX.lstrip("."), key="snapshot_upload")
+    if uploaded_snapshot is not None and st.button("Import Snapshot"):
+        try:
+            snapshot = import_snapshot(uploaded_snapshot.getvalue())
+        except Exception as e:
+            st.error(f"Invalid snapshot file: {e}")
+        else:
+            st.success(f"Imported {len(snapshot)} positions of pool {snapshot.pool} at block {snapshot.block}. Select it under Data source → Snapshot.")
+
+def render_snapshot_export(pool_address, block, positions, fingerprint):
+    st.markdown("Download the loaded positions with the pool state and block, for offline replay:")
+    st.download_button(
+        "Download Snapshot",
+        data=snapshot_bytes_stage(pool_address, block, positions, fingerprint),
+        file_name=f"{pool_address.lower()}-{int(block)}{SNAPSHOT_SUFFIX}",
+        mime="application/vnd.apache.arrow.file",
+    )
+    if st.button("Save Snapshot locally", help=f"Store the snapshot in {SNAPSHOT_DIR}/ so it can be loaded without the subgraph"):
+        st.success(f"Saved {save_snapshot(pool_address, block, positions, fingerprint=fingerprint)}")
+
+def render_import_export_tab(pool_address=None, block=None, positions=None, fingerprint=None):
     # Import/Export interface
     st.header("Import/Export PowerVoting Models")
-    
+
     col1, col2 = st.columns(2)
-    
+
     with col1:
         st.subheader("Export Models")
         st.markdown("Download your current PowerVoting models as a JSON file:")
         st.markdown(export_models(), unsafe_allow_html=True)
-    
+
     with col2:
         st.subheader("Import Models")
         st.markdown("Upload a previously exported JSON file:")
         uploaded_file = st.file_uploader("Choose a models JSON file", type="json")
         if uploaded_file is not None:
             st.button("Import Models", on_click=import_models, args=(uploaded_file,))
+
+    # Pool snapshots: the loaded positions as a compact Arrow file, replayable without the subgraph
+    st.header("Import/Export Pool Snapshots")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Export Snapshot")
+        if positions is not None:
+            render_snapshot_export(pool_address, block, positions, fingerprint)
+        else:
+            st.markdown("Load a pool to export its snapshot.")
+
+    with col2:
+        st.subheader("Import Snapshot")
+        render_snapshot_upload()
@@ -22,6 +22,9 @@ def render_models_tab():
     st.text_area("Equation", 
                 help="Python expression that computes voting power. Available variables: reg_amount, reg_equivalent, relative_distance, price_distance, is_active",
                 key="equation")
+
+    if st.session_state.get("model_error"):
+        st.error(f"Invalid equation: {st.session_state.model_error}")
     
     st.markdown("""
     **Dual-Multiplier Power Voting System:**
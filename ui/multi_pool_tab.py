@@ -0,0 +1,37 @@
+import streamlit as st
+from utils.multi_pool import analyze_pools, vote_column_names
+from utils.visualisation import plot_owner_vote_totals
+from utils.notices import collect_notices
+from ui.notices import render_notices
+
+def render_multi_pool_tab():
+    st.header("Multi-Pool PowerVoting")
+    st.markdown("Aggregate votes per owner across several SushiSwap V3 pools. "
+                "Leave the list empty to analyze every pool containing REG.")
+
+    pool_text = st.text_area("Pool addresses (one per line)", key="multi_pool_addresses")
+    pool_addresses = [line.strip() for line in pool_text.splitlines() if line.strip()]
+
+    if not st.button("Analyze pools"):
+        return
+
+    voting_models = st.session_state.voting_models
+    with st.spinner("Fetching positions for all pools concurrently 🔄"), collect_notices() as notices:
+        pool_frames, owner_votes = analyze_pools(pool_addresses, voting_models)
+    render_notices(notices)
+
+    if owner_votes.empty:
+        st.warning("No active liquidity positions found in these pools.")
+        return
+
+    st.metric("Pools analyzed", len(pool_frames))
+    st.metric("Owners", owner_votes.shape[0])
+
+    # One vote table and chart across pools, with model names as column headers
+    vote_columns = [f"PowerVoting_{model_id}" for model_id in voting_models]
+    column_names = vote_column_names(voting_models, reserved=owner_votes.columns.difference(vote_columns))
+    st.dataframe(owner_votes.rename(columns=column_names), use_container_width=True, hide_index=True)
+
+    for model_id, model_info in voting_models.items():
+        fig = plot_owner_vote_totals(owner_votes, f"PowerVoting_{model_id}", model_name=model_info['name'])
+        st.plotly_chart(fig, use_container_width=True, key=f"multi_pool_chart_{model_id}")
@@ -0,0 +1,9 @@
+import streamlit as st
+
+def render_notices(notices):
+    """Show collected computation notices as Streamlit warnings and errors"""
+    for notice in notices:
+        if notice["level"] == "error":
+            st.error(notice["message"])
+        else:
+            st.warning(notice["message"])
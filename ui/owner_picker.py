@@ -0,0 +1,44 @@
+import streamlit as st
+
+# Owners listed per page of the picker
+OWNER_PAGE_SIZE = 50
+
+def render_owner_picker(owner_index):
+    """Search-as-you-type, paginated owner picker; returns the selected owner or "All owners\""""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("🔎 Search owner address", key="owner_search")
+    _, match_count = owner_index.search(query, 0, OWNER_PAGE_SIZE)
+    page_count = max(1, -(-match_count // OWNER_PAGE_SIZE))
+    with col2:
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key="owner_page") - 1
+
+    owners, _ = owner_index.search(query, page, OWNER_PAGE_SIZE)
+    counts = {owner: owner_index.counts[owner_index.positions[owner]] for owner in owners}
+    selected_owner = st.selectbox(
+        f"Select Owner ({match_count} matching of {len(owner_index)})",
+        ["All owners"] + owners,
+        format_func=lambda owner: owner if owner == "All owners" else f"{owner} ({counts[owner]} positions)"
+    )
+    return selected_owner
+
+def render_owner_leaderboard(owner_index, voting_models, top_n=10):
+    """Top-N vote leaderboard and concentration metrics per model"""
+    with st.expander("🏆 Owner leaderboard and vote concentration"):
+        model_id = st.selectbox("Model", list(voting_models), format_func=lambda key: voting_models[key]['name'], key="leaderboard_model")
+        vote_column = f"PowerVoting_{model_id}"
+
+        metrics = owner_index.concentration(vote_column)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Gini coefficient", f"{metrics['gini']:.3f}")
+        col2.metric("Nakamoto coefficient", metrics['nakamoto'], help="Fewest owners holding a majority of votes")
+        col3.metric("Top-10 share", f"{metrics['top10_share']:.1%}")
+
+        leaderboard = owner_index.leaderboard(vote_column, top_n)
+        leaderboard["Share"] = leaderboard["Share"] * 100
+        st.dataframe(
+            leaderboard,
+            column_config={"Share": st.column_config.NumberColumn("Share (%)", format="%.2f")},
+            use_container_width=True,
+            hide_index=True
+        )
@@ -0,0 +1,48 @@
+import time
+import streamlit as st
+from utils.visualisation import plot_owner_positions
+
+# Seconds between redraws of the preview chart; metrics and owners update on every page
+CHART_REFRESH_SECONDS = 1.0
+
+def render_progressive_load(load, model_name):
+    """Render metrics, top owners and the model chart as pages arrive; returns (positions, block, fingerprint)"""
+    status = st.status(f"Loading positions at block {load.block}…", expanded=True)
+    with status:
+        warning = st.empty()
+        metrics = st.empty()
+        owners = st.empty()
+        chart = st.empty()
+
+    last_chart = None
+    for _ in load:
+        status.update(label=f"Loaded {load.count:,} positions in {load.page_count} pages…")
+        if load.current_price is None:
+            continue
+        if load.score_error:
+            warning.warning(f"The preview stopped scoring positions: {load.score_error}")
+        with metrics.container():
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Current REG Price", f"{load.current_price:.6f} {load.other_token_symbol}")
+            col2.metric("Positions loaded", f"{load.count:,}")
+            col3.metric("Owners so far", f"{len(load.owner_votes):,}")
+        top_owners = load.top_owners()
+        top_owners["Share"] = top_owners["Share"] * 100
+        owners.dataframe(
+            top_owners,
+            column_config={"Share": st.column_config.NumberColumn("Share (%)", format="%.2f")},
+            use_container_width=True,
+            hide_index=True
+        )
+        # The first page is drawn at once; later redraws are throttled, as the figure grows with the pool
+        now = time.perf_counter()
+        if last_chart is None or now - last_chart >= CHART_REFRESH_SECONDS:
+            last_chart = now
+            fig = plot_owner_positions(load.preview(), load.current_price, load.other_token_symbol,
+                                       model_name=model_name, voting_key=load.vote_column, equation=load.equation)
+            chart.plotly_chart(fig, use_container_width=True)
+
+    # The full results render below, so the preview chart is dropped
+    chart.empty()
+    status.update(label=f"Loaded {load.count:,} positions in {load.page_count} pages", state="complete", expanded=False)
+    return load.positions, load.block, load.fingerprint
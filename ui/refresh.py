@@ -0,0 +1,45 @@
+import time
+import pandas as pd
+import streamlit as st
+
+# Seconds between checks for a finished background refresh
+REFRESH_POLL_SECONDS = 5
+
+def format_age(seconds):
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+@st.fragment(run_every=REFRESH_POLL_SECONDS)
+def render_refresh_status(scheduler, pool_address, shown_fingerprint):
+    """Age of the shown dataset, kept current; reruns the app once a newer dataset is ready"""
+    dataset = scheduler.latest(pool_address)
+    if dataset is None:
+        return
+    if dataset["fingerprint"] != shown_fingerprint:
+        st.rerun()
+    if dataset["refreshing"]:
+        status = "refreshing now"
+    elif dataset["next_refresh_in"] is not None:
+        status = f"next refresh in {format_age(dataset['next_refresh_in'])}"
+    else:
+        status = "refresh queued"
+    st.caption(f"🔁 Positions at block {dataset['block']}, refreshed {format_age(time.time() - dataset['refreshed_at'])} ago · {status}")
+    if dataset["error"]:
+        st.warning(f"The last background refresh failed, so the previous data is shown: {dataset['error']}")
+
+def render_watchlist(scheduler):
+    """Sidebar list of the pools kept fresh in the background, shared by every session"""
+    watched = scheduler.watched()
+    if not watched:
+        return
+    with st.sidebar.expander(f"📌 Watched pools ({len(watched)})"):
+        st.dataframe(pd.DataFrame({
+            "Pool": [f"{pool['pool'][:8]}…{pool['pool'][-4:]}" for pool in watched],
+            "Block": [pool["block"] for pool in watched],
+            "Age": [format_age(pool["age_s"]) if pool["age_s"] is not None else "—" for pool in watched],
+            "Status": ["refreshing" if pool["refreshing"] else "failed" if pool["error"] else "ok" for pool in watched],
+        }), hide_index=True)
+        st.caption(f"Refreshed every {scheduler.interval:.0f}s (±{scheduler.jitter:.0%}), {scheduler.max_concurrent} at a time")
@@ -0,0 +1,105 @@
+import time
+import streamlit as st
+from models.model_management import add_equation_model
+from models.power_voting import equation_inputs
+from models.sweeps import (
+    SWEEP_STATS, SWEEP_WORKERS, MIN_PARALLEL_POINTS, parse_range, run_sweep, sweep_frame, sweep_size, template_coefficients,
+)
+from utils.profiling import span
+from utils.visualisation import plot_sweep_heatmap
+
+DEFAULT_TEMPLATE = "reg_amount * a + reg_equivalent * b"
+DEFAULT_RANGES = {"a": "1..8", "b": "0..4"}
+# Seconds between refreshes of the streamed results table
+REFRESH_SECONDS = 0.5
+
+STAT_LABELS = {
+    "top_owner_share": "Top-owner share",
+    "gini": "Gini coefficient",
+    "active_share": "Active vote share",
+    "inactive_share": "Inactive vote share",
+}
+
+def _stat_columns():
+    return {
+        stat: st.column_config.NumberColumn(label, format="%.4f")
+        for stat, label in STAT_LABELS.items()
+    }
+
+def render_sweep_tab(df, owner_index, fingerprint):
+    st.header("Parameter Sweep")
+    st.markdown("Write an equation with named coefficients and give each one a range. Every combination is "
+                "evaluated against the loaded positions, with vote concentration and active share per variant.")
+
+    template = st.text_input("Equation template", value=DEFAULT_TEMPLATE, key="sweep_template",
+                             help="Any name that is not an equation variable or function is a coefficient")
+    try:
+        coefficients = template_coefficients(template)
+    except SyntaxError as e:
+        st.error(f"Invalid template: {e}")
+        return
+    if not coefficients:
+        st.info("Add a named coefficient to the template, such as `a` in `reg_amount * a`.")
+        return
+
+    ranges = {}
+    for column, name in zip(st.columns(len(coefficients)), coefficients):
+        with column:
+            text = st.text_input(f"Range of {name}", value=DEFAULT_RANGES.get(name, "1..4"), key=f"sweep_range_{name}",
+                                 help="start..stop (step 1), start..stop:step, or a comma-separated list")
+        try:
+            ranges[name] = parse_range(text)
+        except ValueError as e:
+            st.error(f"Range of {name}: {e}")
+            return
+
+    points = sweep_size(ranges)
+    workers = SWEEP_WORKERS if points >= MIN_PARALLEL_POINTS else 1
+    st.caption(f"{points} variants on {workers} worker process{'es' if workers > 1 else ''}")
+
+    if st.button("Run sweep", key="run_sweep"):
+        progress = st.progress(0.0)
+        table = st.empty()
+        rows = []
+        started = last_refresh = time.perf_counter()
+        try:
+            with span("sweep", points=points, workers=workers, rows=len(df)):
+                for row in run_sweep(template, ranges, equation_inputs(df), owner_index.codes, len(owner_index)):
+                    rows.append(row)
+                    now = time.perf_counter()
+                    if now - last_refresh >= REFRESH_SECONDS or len(rows) == points:
+                        last_refresh = now
+                        progress.progress(len(rows) / points, text=f"{len(rows)} of {points} variants ({now - started:.1f}s)")
+                        # Most concentrated variants first while results stream in
+                        partial = sweep_frame(rows, coefficients).sort_values("top_owner_share", ascending=False)
+                        table.dataframe(partial.head(20), column_config=_stat_columns(), hide_index=True, use_container_width=True)
+        except ValueError as e:
+            st.error(f"Invalid template: {e}")
+            return
+        table.empty()
+        st.session_state.sweep_results = (fingerprint, template, coefficients, sweep_frame(rows, coefficients))
+
+    results = st.session_state.get("sweep_results")
+    if results is None or results[0] != fingerprint:
+        return
+    _, swept_template, swept, sweep = results
+
+    st.subheader(f"Results ({len(sweep)} variants)")
+    stat = st.selectbox("Statistic", SWEEP_STATS, format_func=STAT_LABELS.get, key="sweep_stat")
+    if len(swept) >= 2:
+        col1, col2 = st.columns(2)
+        with col1:
+            x = st.selectbox("X axis", swept, index=0, key="sweep_x")
+        with col2:
+            y = st.selectbox("Y axis", [name for name in swept if name != x], index=0, key="sweep_y")
+        st.plotly_chart(plot_sweep_heatmap(sweep, x, y, stat, STAT_LABELS[stat]), use_container_width=True, key="sweep_heatmap")
+    st.dataframe(sweep.sort_values(stat), column_config=_stat_columns(), hide_index=True, use_container_width=True)
+
+    failed = sweep["error"].notna().sum()
+    if failed:
+        st.warning(f"{failed} variants could not be evaluated; their error is in the last column.")
+
+    equation = st.selectbox("Variant", sweep.loc[sweep["error"].isna(), "equation"], key="sweep_variant")
+    if equation:
+        st.button("Add variant as model", key="sweep_add_model", on_click=add_equation_model,
+                  args=(f"Sweep: {equation}", f"Parameter sweep variant of {swept_template}", equation))
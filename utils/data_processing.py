@@ -1,6 +1,12 @@
+import numpy as np
 import pandas as pd
-import streamlit as st
-from utils.v3_math import tick_to_sqrt_price_x96, get_token_amounts_from_liquidity
+from utils.notices import notify
+from utils.v3_math import TICK_BASE, tick_to_sqrt_price_x96, get_token_amounts_from_liquidity, get_sqrt_ratio_at_tick, get_amounts_for_liquidity_batch
+
+# Display labels of the Active flag, indexed by the flag
+ACTIVE_LABELS = ("❌ Inactive", "✅ Active")
+# Per-row columns that repeat one pool-level value on every position
+POOL_LEVEL_COLUMNS = ("Current REG Price",)
 
 # Prepare dataframe function with updated logic for actual REG calculation and dual-multiplier system
 def prepare_dataframe(positions):
@@ -79,7 +85,7 @@ def prepare_dataframe(positions):
             power_voting_reg = min(reg_amount, 1e5) * 4  # Cap extreme values
             power_voting_equivalent = min(reg_equivalent, 1e5) * 2  # Cap extreme values
             total_power_voting = power_voting_reg + power_voting_equivalent
-            st.warning(f"Potential calculation error for position {p['id']}. Values capped.")
+            notify("warning", f"Potential calculation error for position {p['id']}. Values capped.", position_ids=[p['id']])
         
         # Calculate position center price for modeling
         position_center_price = (min_reg_price + max_reg_price) / 2
@@ -126,3 +132,299 @@ def prepare_dataframe(positions):
         })
 
     return pd.DataFrame(data), current_reg_price, other_token_symbol
+
+# Pool-level fields shared by every position of a pool, parsed once per pool
+def _pool_metadata(p):
+    token0_symbol = p["token0"]["symbol"]
+    token1_symbol = p["token1"]["symbol"]
+    token0_decimals = int(p["token0"]["decimals"])
+    token1_decimals = int(p["token1"]["decimals"])
+    reg_is_token0 = token0_symbol == "REG"
+
+    if reg_is_token0:
+        current_price = float(p["pool"]["token1Price"])
+    else:
+        current_price = 1 / float(p["pool"]["token0Price"])
+
+    # On-chain sqrt price when the subgraph provides it, else the exact price at the current tick
+    current_tick = int(p["pool"]["tick"])
+    if p["pool"].get("sqrtPrice"):
+        sqrt_price_x96 = int(p["pool"]["sqrtPrice"])
+    else:
+        sqrt_price_x96 = get_sqrt_ratio_at_tick(current_tick)
+
+    return {
+        "reg_is_token0": reg_is_token0,
+        "other_symbol": token1_symbol if reg_is_token0 else token0_symbol,
+        "token0_decimals": token0_decimals,
+        "token1_decimals": token1_decimals,
+        "current_tick": current_tick,
+        "sqrt_price_x96": sqrt_price_x96,
+        "current_price": current_price,
+    }
+
+def _pool_key(p):
+    pool = p["pool"]
+    return (p["token0"]["symbol"], p["token1"]["symbol"], p["token0"]["decimals"], p["token1"]["decimals"],
+            pool["tick"], pool.get("sqrtPrice"), pool["token0Price"], pool["token1Price"])
+
+# Float token amounts, following the branches of get_token_amounts_from_liquidity
+def _float_token_amounts(liquidity, tick_lower, tick_upper, current_tick, reg_is_token0, token0_decimals, token1_decimals):
+    sqrt_lower = np.sqrt(TICK_BASE ** tick_lower)
+    sqrt_upper = np.sqrt(TICK_BASE ** tick_upper)
+    sqrt_current = np.sqrt(TICK_BASE ** current_tick)
+    below = sqrt_current <= sqrt_lower
+    above = ~below & (sqrt_current >= sqrt_upper)
+    in_range = ~below & ~above
+
+    range_amount0 = liquidity * (1 / sqrt_lower - 1 / sqrt_upper)
+    range_amount1 = liquidity * (sqrt_upper - sqrt_lower)
+    amount0 = np.select(
+        [in_range, below & reg_is_token0, above & ~reg_is_token0],
+        [liquidity * (1 / sqrt_current - 1 / sqrt_upper), range_amount0, range_amount0],
+        0.0,
+    )
+    amount1 = np.select(
+        [in_range, below & ~reg_is_token0, above & reg_is_token0],
+        [liquidity * (sqrt_current - sqrt_lower), range_amount1, range_amount1],
+        0.0,
+    )
+    reg_decimals = np.where(reg_is_token0, token0_decimals, token1_decimals)
+    other_decimals = np.where(reg_is_token0, token1_decimals, token0_decimals)
+    amount0 = amount0 / 10.0 ** reg_decimals
+    amount1 = amount1 / 10.0 ** other_decimals
+    reg_amount = np.where(reg_is_token0, amount0, amount1)
+    other_amount = np.where(reg_is_token0, amount1, amount0)
+    return reg_amount, other_amount
+
+# Columnar version of prepare_dataframe, computed with NumPy array operations.
+# With exact=True token amounts come from the integer TickMath port and match on-chain values;
+# exact=False follows get_token_amounts_from_liquidity so the output equals prepare_dataframe.
+# compact=True returns the compact schema of compact_dataframe, optionally with float32 values.
+def prepare_dataframe_columnar(positions, exact=True, compact=False, float32=False):
+    return prepare_position_columns(position_columns(positions), exact=exact, compact=compact, float32=float32)
+
+def position_columns(positions):
+    """Per-position input arrays of prepare_position_columns, parsed from subgraph positions.
+
+    Pool and token metadata is parsed once per distinct pool state: "pools" holds
+    the _pool_metadata of each and "position_pool" indexes it for every position.
+    """
+    positions = [p for p in positions if float(p["liquidity"]) != 0]
+    pool_index = {}
+    pools = []
+    position_pool = np.empty(len(positions), dtype=np.int64)
+    for i, p in enumerate(positions):
+        key = _pool_key(p)
+        if key not in pool_index:
+            pool_index[key] = len(pools)
+            pools.append(_pool_metadata(p))
+        position_pool[i] = pool_index[key]
+
+    return {
+        "pools": pools,
+        "position_pool": position_pool,
+        "id": [p["id"] for p in positions],
+        "owner": [p["owner"] for p in positions],
+        "liquidity": [p["liquidity"] for p in positions],
+        "tick_lower": np.array([int(p["tickLower"]["tickIdx"]) for p in positions], dtype=np.float64),
+        "tick_upper": np.array([int(p["tickUpper"]["tickIdx"]) for p in positions], dtype=np.float64),
+        "price0_lower": np.array([float(p["tickLower"]["price0"]) for p in positions]),
+        "price0_upper": np.array([float(p["tickUpper"]["price0"]) for p in positions]),
+        "price1_lower": np.array([float(p["tickLower"]["price1"]) for p in positions]),
+        "price1_upper": np.array([float(p["tickUpper"]["price1"]) for p in positions]),
+    }
+
+# Prepare positions from the arrays of position_columns, or of any source with the same
+# layout such as a snapshot file, without going through subgraph-shaped dicts.
+def prepare_position_columns(columns, exact=True, compact=False, float32=False):
+    if len(columns["id"]) == 0:
+        return pd.DataFrame(), None, None
+    pools = columns["pools"]
+    position_pool = columns["position_pool"]
+
+    def pool_column(field, dtype):
+        return np.array([pool[field] for pool in pools], dtype=dtype)[position_pool]
+
+    reg_is_token0 = pool_column("reg_is_token0", bool)
+    other_symbol = pool_column("other_symbol", object)
+    token0_decimals = pool_column("token0_decimals", np.int64)
+    token1_decimals = pool_column("token1_decimals", np.int64)
+    current_tick = pool_column("current_tick", np.float64)
+    current_price = pool_column("current_price", np.float64)
+
+    # Per-position fields as arrays
+    liquidity = np.array(columns["liquidity"], dtype=np.float64)
+    tick_lower = columns["tick_lower"]
+    tick_upper = columns["tick_upper"]
+    price0_lower = columns["price0_lower"]
+    price0_upper = columns["price0_upper"]
+    price1_lower = columns["price1_lower"]
+    price1_upper = columns["price1_upper"]
+
+    if exact:
+        # Exact integer amounts in raw token units, scaled by each token's own decimals
+        amount0, amount1 = get_amounts_for_liquidity_batch(
+            pool_column("sqrt_price_x96", object), tick_lower, tick_upper, columns["liquidity"]
+        )
+        reg_raw = np.where(reg_is_token0, amount0, amount1)
+        other_raw = np.where(reg_is_token0, amount1, amount0)
+        reg_scale = (10 ** np.where(reg_is_token0, token0_decimals, token1_decimals)).astype(object)
+        other_scale = (10 ** np.where(reg_is_token0, token1_decimals, token0_decimals)).astype(object)
+        reg_amount = (reg_raw / reg_scale).astype(np.float64)
+        other_amount = (other_raw / other_scale).astype(np.float64)
+    else:
+        reg_amount, other_amount = _float_token_amounts(
+            liquidity, tick_lower, tick_upper, current_tick, reg_is_token0, token0_decimals, token1_decimals
+        )
+
+    # REG price bounds of each position
+    decimal_shift0 = 10.0 ** (token0_decimals - token1_decimals)
+    decimal_shift1 = 10.0 ** (token1_decimals - token0_decimals)
+    min_reg_price = np.where(reg_is_token0, price0_lower * decimal_shift0, 1 / (price1_upper * decimal_shift1))
+    max_reg_price = np.where(reg_is_token0, price0_upper * decimal_shift0, 1 / (price1_lower * decimal_shift1))
+
+    # REG equivalent and PowerVoting components (4x REG, 2x REG equivalent)
+    positive_price = current_price > 0
+    safe_price = np.where(positive_price, current_price, 1.0)
+    reg_equivalent = np.where(positive_price, other_amount / safe_price, 0.0)
+    power_voting_reg = reg_amount * 4
+    power_voting_equivalent = reg_equivalent * 2
+
+    # Sanity check for abnormally large values (fallback if calculation error)
+    capped = power_voting_reg + power_voting_equivalent > 1e10
+    if capped.any():
+        power_voting_reg = np.where(capped, np.minimum(reg_amount, 1e5) * 4, power_voting_reg)
+        power_voting_equivalent = np.where(capped, np.minimum(reg_equivalent, 1e5) * 2, power_voting_equivalent)
+        capped_ids = [position_id for position_id, is_capped in zip(columns["id"], capped) if is_capped]
+        notify("warning", f"Potential calculation error for positions {', '.join(capped_ids)}. Values capped.", position_ids=capped_ids)
+    total_power_voting = power_voting_reg + power_voting_equivalent
+
+    # Distance from current price (for modeling)
+    position_center_price = (min_reg_price + max_reg_price) / 2
+    price_distance = np.abs(position_center_price - current_price)
+    relative_distance = np.where(positive_price, price_distance / safe_price, 0.0)
+    is_active = (min_reg_price <= current_price) & (current_price <= max_reg_price)
+
+    # Position type based on price range
+    below_price = current_price < min_reg_price
+    above_price = ~below_price & (current_price > max_reg_price)
+    position_type = np.select(
+        [below_price & reg_is_token0, below_price, above_price & reg_is_token0, above_price],
+        ["Below Range (REG only)", "Below Range (" + other_symbol + " only)",
+         "Above Range (" + other_symbol + " only)", "Above Range (REG only)"],
+        "In Range (REG+" + other_symbol + ")",
+    )
+
+    columns = {
+        "Liquidity ID": columns["id"],
+        "Owner": columns["owner"],
+        "Actual REG": reg_amount,
+    }
+    for symbol in pd.unique(other_symbol):
+        columns[f"Actual {symbol}"] = np.where(other_symbol == symbol, other_amount, np.nan)
+    columns.update({
+        "REG Equivalent": reg_equivalent,
+        "Min REG Price": min_reg_price,
+        "Max REG Price": max_reg_price,
+        "Position Center Price": position_center_price,
+        "Price Distance": price_distance,
+        "Relative Distance": relative_distance,
+        "REG is Token0": reg_is_token0,
+        "PowerVoting REG": power_voting_reg,
+        "PowerVoting Equivalent": power_voting_equivalent,
+        "PowerVoting Total": total_power_voting,
+        "Active": is_active if compact else np.where(is_active, ACTIVE_LABELS[1], ACTIVE_LABELS[0]),
+        "Position Type": position_type,
+        "Current REG Price": current_price,
+    })
+
+    df = pd.DataFrame(columns)
+    if compact:
+        df = compact_dataframe(df, float32=float32)
+    return df, pools[position_pool[0]]["current_price"], pools[position_pool[0]]["other_symbol"]
+
+# Apply a sync delta to a prepared DataFrame, re-preparing only the changed positions.
+# A moved pool state changes every row's amounts, so the whole frame is rebuilt locally then.
+def update_prepared_dataframe(df, positions, delta):
+    compact = not df.empty and df["Active"].dtype == bool
+    float32 = not df.empty and df["Actual REG"].dtype == np.float32
+    if delta["full"] or delta["pool_changed"] or df.empty:
+        return prepare_dataframe_columnar(positions, compact=compact, float32=float32)
+
+    stale_ids = {p["id"] for p in delta["changed"]} | delta["removed"]
+    if compact and pd.api.types.is_integer_dtype(df["Liquidity ID"]):
+        stale_ids = {int(position_id) for position_id in stale_ids}
+    stale = df["Liquidity ID"].isin(stale_ids)
+    changed_df, current_price, other_token_symbol = prepare_dataframe_columnar(delta["changed"], compact=compact, float32=float32)
+    if not changed_df.empty:
+        df = pd.concat([df[~stale], changed_df], ignore_index=True)
+        # Re-unify categoricals, which concat turns into objects when categories differ
+        if compact:
+            df = compact_dataframe(df, float32=float32)
+    else:
+        df = df[~stale].reset_index(drop=True)
+
+    if current_price is None and positions:
+        pool = _pool_metadata(positions[0])
+        current_price, other_token_symbol = pool["current_price"], pool["other_symbol"]
+    return df, current_price, other_token_symbol
+
+def active_mask(df):
+    """Boolean Active flag for both the compact (bool) and the labelled schema"""
+    active = df["Active"]
+    if active.dtype == bool:
+        return active.to_numpy()
+    return active.isin([True, ACTIVE_LABELS[1]]).to_numpy()
+
+def compact_dataframe(df, float32=False):
+    """Compact positions schema.
+
+    Active and REG is Token0 become bools, Owner and Position Type categoricals,
+    numeric position ids int64, and pool-level scalars such as the current price
+    are dropped (prepare_dataframe returns them separately). With float32, float
+    columns are stored in single precision. Labels are restored by display_dataframe.
+    """
+    if df.empty:
+        return df
+    compact = df.drop(columns=[column for column in POOL_LEVEL_COLUMNS if column in df.columns])
+    columns = {
+        "Active": active_mask(df),
+        "REG is Token0": df["REG is Token0"].astype(bool),
+        "Owner": df["Owner"].astype("category"),
+        "Position Type": df["Position Type"].astype("category"),
+    }
+    ids = df["Liquidity ID"]
+    if not pd.api.types.is_integer_dtype(ids) and ids.astype(str).str.isdigit().all():
+        columns["Liquidity ID"] = ids.astype(np.int64)
+    if float32:
+        columns.update({
+            column: compact[column].astype(np.float32)
+            for column in compact.columns if compact[column].dtype == np.float64
+        })
+    return compact.assign(**columns)
+
+def display_dataframe(df):
+    """Copy of a positions frame with display labels: Active as emoji labels and ids as strings"""
+    return df.assign(**{
+        "Active": np.where(active_mask(df), ACTIVE_LABELS[1], ACTIVE_LABELS[0]),
+        "Liquidity ID": df["Liquidity ID"].astype(str),
+    })
+
+def memory_report(df):
+    """Bytes used per column and per position; returns (report, total_bytes, bytes_per_position)"""
+    usage = df.memory_usage(deep=True, index=True)
+    report = pd.DataFrame({
+        "Column": usage.index,
+        "Dtype": [str(df[column].dtype) if column in df.columns else "index" for column in usage.index],
+        "Bytes": usage.to_numpy(),
+    })
+    total = int(usage.sum())
+    return report, total, total / max(len(df), 1)
+
+# Check the columnar path against the reference row-by-row implementation
+def compare_with_reference(positions, rtol=1e-9):
+    reference, reference_price, reference_symbol = prepare_dataframe(positions)
+    columnar, columnar_price, columnar_symbol = prepare_dataframe_columnar(positions, exact=False)
+    pd.testing.assert_frame_equal(columnar, reference, check_dtype=False, rtol=rtol)
+    assert columnar_price == reference_price and columnar_symbol == reference_symbol
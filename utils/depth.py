@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+from utils.data_processing import _pool_metadata
+from utils.v3_math import Q96, TICK_BASE
+
+# Price bands reported by depth tables, in percent either side of the current price
+DEPTH_PERCENTS = (1, 2, 5, 10)
+
+def _depth_inputs(positions):
+    # Ticks, liquidity and pool metadata of a pool, from a snapshot's columns or subgraph positions
+    if hasattr(positions, "columns"):
+        columns = positions.columns()
+        pools = columns["pools"]
+        return (columns["tick_lower"].astype(np.int64), columns["tick_upper"].astype(np.int64),
+                columns["liquidity"], pools[0] if pools else None)
+    positions = [p for p in positions if float(p["liquidity"]) != 0]
+    return (
+        np.array([int(p["tickLower"]["tickIdx"]) for p in positions], dtype=np.int64),
+        np.array([int(p["tickUpper"]["tickIdx"]) for p in positions], dtype=np.int64),
+        [p["liquidity"] for p in positions],
+        _pool_metadata(positions[0]) if positions else None,
+    )
+
+class LiquidityDepth:
+    """Active liquidity of a pool per tick range, with token amounts held between any two prices.
+
+    Every position adds its liquidity at tickLower and removes it at tickUpper;
+    the deltas summed per boundary tick and accumulated in tick order give the
+    liquidity active on each range [ticks[i], ticks[i + 1]), in O(n log n) for n
+    positions. Running sums of the token amounts of each range then answer depth
+    queries at any price with a binary search. token0 is summed from the highest
+    boundary down and token1 from the lowest up: near MIN_TICK a range's token0
+    amount dwarfs anything near the current price, and a sum carrying it would
+    lose the difference between two nearby prices to cancellation.
+    """
+
+    def __init__(self, tick_lower, tick_upper, liquidity, pool):
+        self.pool = pool
+        ticks, inverse = np.unique(np.concatenate([tick_lower, tick_upper]), return_inverse=True)
+        # Net deltas summed as Python ints, so ranges where every position has ended are exactly zero
+        values = np.array([int(value) for value in liquidity] + [None], dtype=object)[:-1]
+        deltas = np.zeros(len(ticks), dtype=object)
+        np.add.at(deltas, inverse, np.concatenate([values, -values]))
+        self.ticks = ticks
+        self.liquidity = np.cumsum(deltas).astype(np.float64) if len(ticks) else np.zeros(0)
+
+        # Raw sqrt prices (token1 per token0) of the boundaries, and each range's amounts when fully held
+        self.sqrt_prices = np.sqrt(TICK_BASE ** ticks.astype(np.float64))
+        segment_liquidity = self.liquidity[:-1]
+        amount0 = segment_liquidity * (1 / self.sqrt_prices[:-1] - 1 / self.sqrt_prices[1:])
+        amount1 = segment_liquidity * (self.sqrt_prices[1:] - self.sqrt_prices[:-1])
+        # _suffix0[i] is the token0 of ranges i and above, _prefix1[i] the token1 of ranges below i
+        self._suffix0 = np.concatenate([np.cumsum(amount0[::-1])[::-1], [0.0]])
+        self._prefix1 = np.concatenate([[0.0], np.cumsum(amount1)])
+
+    def __len__(self):
+        return len(self.ticks)
+
+    @property
+    def empty(self):
+        return self.pool is None or len(self.ticks) == 0
+
+    @property
+    def reg_is_token0(self):
+        return self.pool["reg_is_token0"]
+
+    @property
+    def other_token_symbol(self):
+        return self.pool["other_symbol"]
+
+    @property
+    def current_sqrt_price(self):
+        return self.pool["sqrt_price_x96"] / Q96
+
+    @property
+    def _decimal_shift(self):
+        return 10.0 ** (self.pool["token0_decimals"] - self.pool["token1_decimals"])
+
+    def reg_prices(self, sqrt_prices):
+        """REG prices, in the other token, of raw sqrt prices"""
+        raw_price = np.asarray(sqrt_prices, dtype=np.float64) ** 2 * self._decimal_shift
+        with np.errstate(divide="ignore"):
+            return raw_price if self.reg_is_token0 else 1 / raw_price
+
+    @property
+    def current_price(self):
+        return float(self.reg_prices(self.current_sqrt_price))
+
+    def active_liquidity(self, tick=None):
+        """Liquidity active at a tick, the pool's current tick by default"""
+        tick = self.pool["current_tick"] if tick is None else tick
+        index = np.searchsorted(self.ticks, tick, side="right") - 1
+        return float(self.liquidity[index]) if 0 <= index < len(self.ticks) else 0.0
+
+    def _range_at(self, sqrt_prices):
+        # Index of the range holding each sqrt price, -1 below the lowest boundary
+        return np.searchsorted(self.sqrt_prices, np.asarray(sqrt_prices, dtype=np.float64), side="right") - 1
+
+    def _amount0_above(self, sqrt_prices):
+        # Raw token0 held from each sqrt price up to the highest boundary
+        sqrt_prices = np.asarray(sqrt_prices, dtype=np.float64)
+        index = self._range_at(sqrt_prices)
+        inside = index >= 0
+        index = np.clip(index, 0, None)
+        # The range above the highest boundary holds no liquidity, so its successor is itself
+        next_index = np.minimum(index + 1, len(self.sqrt_prices) - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            partial = np.nan_to_num(self.liquidity[index] * (1 / sqrt_prices - 1 / self.sqrt_prices[next_index]))
+        return np.where(inside, self._suffix0[next_index] + partial, self._suffix0[0])
+
+    def _amount1_below(self, sqrt_prices):
+        # Raw token1 held from the lowest boundary up to each sqrt price
+        sqrt_prices = np.asarray(sqrt_prices, dtype=np.float64)
+        index = self._range_at(sqrt_prices)
+        inside = index >= 0
+        index = np.clip(index, 0, None)
+        with np.errstate(invalid="ignore"):
+            partial = np.nan_to_num(self.liquidity[index] * (sqrt_prices - self.sqrt_prices[index]))
+        return np.where(inside, self._prefix1[index] + partial, 0.0)
+
+    def within(self, percents):
+        """Depth within ±percent of the current price, for one percent or an array of them.
+
+        reg_depth is the REG sold into a rise of the REG price up to +percent,
+        other_depth the other token spent on REG down to -percent, and
+        reg_equivalent the latter valued at the current price.
+        """
+        percents = np.asarray(percents, dtype=np.float64)
+        sqrt_current = self.current_sqrt_price
+        # A band of ±x% in REG price is a band in raw price, inverted when REG is token1
+        factor_up = np.sqrt(1 + percents / 100)
+        factor_down = np.sqrt(np.clip(1 - percents / 100, 0.0, None))
+        with np.errstate(divide="ignore"):
+            if self.reg_is_token0:
+                sqrt_low, sqrt_high = sqrt_current * factor_down, sqrt_current * factor_up
+            else:
+                sqrt_low, sqrt_high = sqrt_current / factor_up, sqrt_current / factor_down
+
+        # Both terms of each difference are sums over ranges on the same side of the current price
+        amount0 = (self._amount0_above(sqrt_current) - self._amount0_above(sqrt_high)) / 10.0 ** self.pool["token0_decimals"]
+        amount1 = (self._amount1_below(sqrt_current) - self._amount1_below(sqrt_low)) / 10.0 ** self.pool["token1_decimals"]
+        reg_depth, other_depth = (amount0, amount1) if self.reg_is_token0 else (amount1, amount0)
+        return {
+            "percent": percents,
+            "active_liquidity": self.active_liquidity(),
+            "reg_depth": reg_depth,
+            "other_depth": other_depth,
+            "reg_equivalent": other_depth / self.current_price,
+        }
+
+    def depth_frame(self, percents=DEPTH_PERCENTS):
+        """within() as a table, one row per percent"""
+        if self.empty:
+            return pd.DataFrame(columns=["percent", "active_liquidity", "reg_depth", "other_depth", "reg_equivalent"])
+        return pd.DataFrame(self.within(np.atleast_1d(percents)))
+
+    def segments(self):
+        """Tick ranges with their active liquidity, REG price bounds and the tokens they hold now"""
+        if self.empty:
+            return pd.DataFrame()
+        sqrt_current = self.current_sqrt_price
+        lower, upper = self.sqrt_prices[:-1], self.sqrt_prices[1:]
+        # Above the current price a range holds token0, below it token1; the current range holds both
+        liquidity = self.liquidity[:-1]
+        amount0 = liquidity * np.clip(1 / np.maximum(lower, sqrt_current) - 1 / upper, 0.0, None)
+        amount1 = liquidity * np.clip(np.minimum(upper, sqrt_current) - lower, 0.0, None)
+        amount0 = amount0 / 10.0 ** self.pool["token0_decimals"]
+        amount1 = amount1 / 10.0 ** self.pool["token1_decimals"]
+        prices_lower, prices_upper = self.reg_prices(lower), self.reg_prices(upper)
+        return pd.DataFrame({
+            "tick_lower": self.ticks[:-1],
+            "tick_upper": self.ticks[1:],
+            "min_reg_price": np.minimum(prices_lower, prices_upper),
+            "max_reg_price": np.maximum(prices_lower, prices_upper),
+            "active_liquidity": liquidity,
+            "reg_amount": amount0 if self.reg_is_token0 else amount1,
+            "other_amount": amount1 if self.reg_is_token0 else amount0,
+        })
+
+def depth_profile(positions):
+    """LiquidityDepth of one pool's positions (subgraph dicts or a Snapshot)"""
+    return LiquidityDepth(*_depth_inputs(positions))
+
+def depth_table(profiles, percents=DEPTH_PERCENTS):
+    """Depth of several pools at each percent band: one row per pool and percent"""
+    frames = []
+    for pool_address, profile in profiles.items():
+        if profile.empty:
+            continue
+        frame = profile.depth_frame(percents)
+        frame.insert(0, "pool", pool_address.lower())
+        frame.insert(1, "current_price", profile.current_price)
+        frame.insert(2, "other_token", profile.other_token_symbol)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
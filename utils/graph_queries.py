@@ -1,7 +1,13 @@
 import os
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+import queue
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
+from utils.subgraph_client import MAX_RETRIES, RATE_LIMITER, backoff_delay, get_shared_client
+from utils.profiling import span
 
 # Load environment variables
 load_dotenv()
@@ -15,43 +21,23 @@ SUBGRAPH_URL = (
     "GFvGfWBX47RNnvgwL6SjAAf2mrqrPxF91eA53F4eNegW"
 )
 
-# GraphQL client setup
-def get_client():
-    transport = RequestsHTTPTransport(url=SUBGRAPH_URL)
-    return Client(transport=transport, fetch_schema_from_transport=False)
+# Serve positions from local snapshots and never contact the subgraph
+OFFLINE_MODE = os.getenv("OFFLINE_MODE", "0") == "1"
 
-# Fetch positions function with updated query to get ticks and liquidity
-def query_positions(pool_address):
-    client = get_client()
-    query = gql("""
-    query GetPositions($pool: String!) {
-      positions(
-        first: 1000
-        where: {pool: $pool, liquidity_gt: "0"}
-      ) {
-        id
-        owner
-        liquidity
-        tickLower {
-          tickIdx
-          price1
-          price0
-        }
-        tickUpper {
-          tickIdx
-          price1
-          price0
-        }
-        token0 {
-          symbol
-          decimals
-        }
-        token1 {
-          symbol
-          decimals
-        }
-        pool {
+# Maximum number of rows TheGraph returns for a single query
+PAGE_SIZE = 1000
+# Number of id ranges fetched concurrently by query_positions
+MAX_WORKERS = 4
+# Sorts after every decimal digit, so it bounds the last id range
+ID_UPPER_SENTINEL = ":"
+
+# Queries are kept as plain text: the shared client posts them as-is, so gql is only
+# imported (and a query parsed) by the async multi-pool path
+
+# Pool state fields, embedded in every position and queried on their own for syncs
+POOL_FIELDS = """
           tick
+          sqrtPrice
           liquidity
           token0Price
           token1Price
@@ -63,9 +49,408 @@ def query_positions(pool_address):
             symbol
             decimals
           }
+"""
+
+# Fields fetched for every position. Pool state and token metadata are queried once per
+# fetch and tick prices are derived from the tick indices, so pages carry only these.
+POSITION_FIELDS = """
+        id
+        owner
+        liquidity
+        tickLower {
+          tickIdx
         }
-      }
+        tickUpper {
+          tickIdx
+        }
+"""
+
+# Pool state and tokens, fetched once and shared by every position of the pool
+POOL_STATE_QUERY = """
+query GetPoolState($pool: ID!) {
+  pool(id: $pool) {""" + POOL_FIELDS + """  }
+}
+"""
+
+# Same pool state, read at a past block
+POOL_STATE_AT_BLOCK_QUERY = """
+query GetPoolStateAtBlock($pool: ID!, $block: Int!) {
+  pool(id: $pool, block: {number: $block}) {""" + POOL_FIELDS + """  }
+}
+"""
+
+# One page of positions inside [lower, upper), continuing after cursor
+POSITIONS_PAGE_QUERY = """
+query GetPositionsPage($pool: String!, $first: Int!, $cursor: String!, $lower: String!, $upper: String!) {
+  positions(
+    first: $first
+    orderBy: id
+    orderDirection: asc
+    where: {pool: $pool, liquidity_gt: "0", id_gt: $cursor, id_gte: $lower, id_lt: $upper}
+  ) {""" + POSITION_FIELDS + """  }
+}
+"""
+
+# Same page, read from the subgraph's state at a past block
+POSITIONS_AT_BLOCK_PAGE_QUERY = """
+query GetPositionsPageAtBlock($pool: String!, $first: Int!, $cursor: String!, $lower: String!, $upper: String!, $block: Int!) {
+  positions(
+    block: {number: $block}
+    first: $first
+    orderBy: id
+    orderDirection: asc
+    where: {pool: $pool, liquidity_gt: "0", id_gt: $cursor, id_gte: $lower, id_lt: $upper}
+  ) {""" + POSITION_FIELDS + """  }
+}
+"""
+
+# First transaction at or after a timestamp, used to map timestamps to blocks
+BLOCK_AT_TIMESTAMP_QUERY = """
+query GetBlockAtTimestamp($timestamp: BigInt!) {
+  transactions(first: 1, orderBy: timestamp, orderDirection: asc, where: {timestamp_gte: $timestamp}) {
+    blockNumber
+  }
+}
+"""
+
+# Latest block indexed by the subgraph
+INDEXED_BLOCK_QUERY = """
+query GetIndexedBlock {
+  _meta {
+    block {
+      number
+    }
+  }
+}
+"""
+
+# Positions of a pool changed at or after a block, including ones whose liquidity went to zero.
+# pool(id:) takes an ID! and the positions filter a String!, so the address is passed as both
+POSITION_CHANGES_QUERY = """
+query GetPositionChanges($poolId: ID!, $pool: String!, $first: Int!, $cursor: String!, $since: Int!) {
+  _meta {
+    block {
+      number
     }
-    """)
-    response = client.execute(query, variable_values={"pool": pool_address.lower()})
-    return response["positions"]
+  }
+  pool(id: $poolId) {""" + POOL_FIELDS + """  }
+  positions(
+    first: $first
+    orderBy: id
+    orderDirection: asc
+    where: {pool: $pool, id_gt: $cursor, _change_block: {number_gte: $since}}
+  ) {""" + POSITION_FIELDS + """  }
+}
+"""
+
+# Later pages of the same changes, pinned to the block the first page was read at
+POSITION_CHANGES_AT_BLOCK_QUERY = """
+query GetPositionChangesAtBlock($poolId: ID!, $pool: String!, $first: Int!, $cursor: String!, $since: Int!, $block: Int!) {
+  pool(id: $poolId, block: {number: $block}) {""" + POOL_FIELDS + """  }
+  positions(
+    block: {number: $block}
+    first: $first
+    orderBy: id
+    orderDirection: asc
+    where: {pool: $pool, id_gt: $cursor, _change_block: {number_gte: $since}}
+  ) {""" + POSITION_FIELDS + """  }
+}
+"""
+
+# Pools that hold a token on either side, used to discover every REG pool
+POOLS_WITH_TOKEN_QUERY = """
+query GetPoolsWithToken($symbol: String!, $first: Int!) {
+  asToken0: pools(first: $first, where: {token0_: {symbol: $symbol}}) {
+    id
+  }
+  asToken1: pools(first: $first, where: {token1_: {symbol: $symbol}}) {
+    id
+  }
+}
+"""
+
+# Number of subgraph requests in flight at once for multi-pool fetches
+MAX_CONCURRENT_REQUESTS = 8
+
+def _ensure_online():
+    if OFFLINE_MODE:
+        raise RuntimeError("The subgraph is not available in offline mode; only stored snapshots can be loaded")
+
+# Shared GraphQL client: pooled connections, retries, rate limiting and request coalescing
+def get_client():
+    _ensure_online()
+    return get_shared_client(SUBGRAPH_URL)
+
+def get_async_client():
+    _ensure_online()
+    # Imported here so the synchronous paths do not require gql or aiohttp
+    from gql import Client
+    from gql.transport.aiohttp import AIOHTTPTransport
+    return Client(transport=AIOHTTPTransport(url=SUBGRAPH_URL), fetch_schema_from_transport=False)
+
+def query_indexed_block():
+    """Return the number of the latest block indexed by the subgraph"""
+    response = get_client().execute(INDEXED_BLOCK_QUERY)
+    return int(response["_meta"]["block"]["number"])
+
+def query_block_at_timestamp(timestamp):
+    """Return the first block with a subgraph transaction at or after a unix timestamp"""
+    response = get_client().execute(BLOCK_AT_TIMESTAMP_QUERY, variable_values={"timestamp": str(int(timestamp))})
+    if not response["transactions"]:
+        raise ValueError(f"No indexed transaction at or after timestamp {timestamp}")
+    return int(response["transactions"][0]["blockNumber"])
+
+def query_pool_state(pool_address, block=None, client=None):
+    """Pool state with its token0 and token1 metadata, optionally at a past block; None for an unknown pool"""
+    client = client or get_client()
+    if block is None:
+        response = client.execute(POOL_STATE_QUERY, variable_values={"pool": pool_address.lower()})
+    else:
+        response = client.execute(POOL_STATE_AT_BLOCK_QUERY, variable_values={"pool": pool_address.lower(), "block": int(block)})
+    return response["pool"]
+
+def tick_prices(tick_idx):
+    """price0 and price1 of a tick as the subgraph computes them: 1.0001^tick and its inverse, as text"""
+    price0 = 1.0001 ** int(tick_idx)
+    return repr(price0), repr(1 / price0)
+
+def hydrate_positions(positions, pool_state, ticks=None):
+    """Complete slim positions in place into the shape of a full position query.
+
+    Every position gets the pool state and its tokens, shared rather than copied,
+    and tick dicts with locally derived prices, built once per distinct tick.
+    Pass the same ticks dict across pages of one pool to share ticks between them.
+    """
+    if positions and pool_state is None:
+        raise ValueError("Positions returned for a pool the subgraph does not know")
+    ticks = {} if ticks is None else ticks
+    for p in positions:
+        for side in ("tickLower", "tickUpper"):
+            tick_idx = p[side]["tickIdx"]
+            tick = ticks.get(tick_idx)
+            if tick is None:
+                price0, price1 = tick_prices(tick_idx)
+                tick = ticks[tick_idx] = {"tickIdx": tick_idx, "price1": price1, "price0": price0}
+            p[side] = tick
+        p["token0"] = pool_state["token0"]
+        p["token1"] = pool_state["token1"]
+        p["pool"] = pool_state
+    return positions
+
+def iter_position_pages(pool_address, lower="", upper=ID_UPPER_SENTINEL, page_size=PAGE_SIZE, client=None, block=None, pool_state=None):
+    """Yield pages of positions in the id range [lower, upper) using id_gt cursors, optionally at a past block.
+
+    Pages are hydrated with the pool state, which is queried first unless given.
+    """
+    client = client or get_client()
+    if pool_state is None:
+        pool_state = query_pool_state(pool_address, block, client)
+    ticks = {}
+    query = POSITIONS_PAGE_QUERY if block is None else POSITIONS_AT_BLOCK_PAGE_QUERY
+    cursor = ""
+    while True:
+        variables = {
+            "pool": pool_address.lower(),
+            "first": page_size,
+            "cursor": cursor,
+            "lower": lower,
+            "upper": upper,
+        }
+        if block is not None:
+            variables["block"] = int(block)
+        response = client.execute(query, variable_values=variables)
+        page = hydrate_positions(response["positions"], pool_state, ticks)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]["id"]
+
+def split_id_ranges(num_ranges):
+    """Split the decimal position id space into num_ranges lexicographic ranges.
+
+    TheGraph compares ids as strings, so ranges are bounded by digit prefixes
+    ("1", "2", ..., "10", "11", ...) rather than by numeric values.
+    """
+    if num_ranges <= 1:
+        return [("", ID_UPPER_SENTINEL)]
+
+    # Use the shortest prefix length that offers enough distinct boundaries
+    prefix_length = 1
+    while 9 * 10 ** (prefix_length - 1) < num_ranges:
+        prefix_length += 1
+    first_prefix = 10 ** (prefix_length - 1)
+    prefix_count = 9 * first_prefix
+
+    bounds = [str(first_prefix + (prefix_count * i) // num_ranges) for i in range(1, num_ranges)]
+    lowers = [""] + bounds
+    uppers = bounds + [ID_UPPER_SENTINEL]
+    return list(zip(lowers, uppers))
+
+def _fetch_id_range(pool_address, lower, upper, page_size, block=None, pool_state=None):
+    positions = []
+    for page in iter_position_pages(pool_address, lower, upper, page_size, block=block, pool_state=pool_state):
+        positions.extend(page)
+    return positions
+
+def query_positions_parallel(pool_address, num_ranges=None, max_workers=MAX_WORKERS, page_size=PAGE_SIZE, block=None):
+    """Fetch all positions by paging through several id ranges concurrently"""
+    num_ranges = num_ranges or max_workers
+    ranges = split_id_ranges(num_ranges)
+    pool_state = query_pool_state(pool_address, block)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # Each range runs in a copy of the caller's context so its requests join the caller's profile
+        futures = [
+            executor.submit(contextvars.copy_context().run, _fetch_id_range, pool_address, lower, upper, page_size, block, pool_state)
+            for lower, upper in ranges
+        ]
+        positions = []
+        for future in futures:
+            positions.extend(future.result())
+    return positions
+
+def iter_positions_parallel(pool_address, num_ranges=None, max_workers=MAX_WORKERS, page_size=PAGE_SIZE, block=None):
+    """Yield (range_index, page) as pages arrive from several id ranges fetched concurrently.
+
+    Pages of one range arrive in order, so joining every range's pages in range
+    order gives the same list as query_positions_parallel. Closing the generator
+    early stops each range after its current page.
+    """
+    ranges = split_id_ranges(num_ranges or max_workers)
+    pool_state = query_pool_state(pool_address, block)
+    pages = queue.Queue()
+    stop = threading.Event()
+
+    def fetch(index, lower, upper):
+        try:
+            for page in iter_position_pages(pool_address, lower, upper, page_size, block=block, pool_state=pool_state):
+                if stop.is_set():
+                    break
+                pages.put((index, page))
+        except Exception as e:
+            pages.put((index, e))
+        finally:
+            pages.put((index, None))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for index, (lower, upper) in enumerate(ranges):
+            executor.submit(contextvars.copy_context().run, fetch, index, lower, upper)
+        remaining = len(ranges)
+        try:
+            while remaining:
+                index, item = pages.get()
+                if item is None:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield index, item
+        finally:
+            stop.set()
+
+# Fetch every position of the pool with ticks and liquidity, past the 1000-row cap.
+# With a block number the positions are read as they were at that block.
+# In offline mode they come from the pool's stored snapshot instead.
+def query_positions(pool_address, max_workers=MAX_WORKERS, block=None):
+    if OFFLINE_MODE:
+        from utils.snapshots import load_snapshot
+        return load_snapshot(pool_address, block).positions
+    with span("subgraph", pool=pool_address.lower(), block=block) as record:
+        if max_workers <= 1:
+            positions = _fetch_id_range(pool_address, "", ID_UPPER_SENTINEL, PAGE_SIZE, block)
+        else:
+            positions = query_positions_parallel(pool_address, max_workers=max_workers, block=block)
+        record["rows"] = len(positions)
+    return positions
+
+# Fetch only the positions changed since a block, for incremental syncs
+def query_position_changes(pool_address, since_block, page_size=PAGE_SIZE):
+    """Return (changed_positions, pool_state, block) for positions changed at or after since_block.
+
+    Changed positions include closed ones with zero liquidity so callers can drop them.
+    pool_state and block come from the first page, and later pages are read at
+    that block, so a sync is pinned to one block.
+    """
+    client = get_client()
+    changes = []
+    pool_state = None
+    block = None
+    ticks = {}
+    cursor = ""
+    while True:
+        variables = {
+            "poolId": pool_address.lower(),
+            "pool": pool_address.lower(),
+            "first": page_size,
+            "cursor": cursor,
+            "since": since_block,
+        }
+        if block is None:
+            response = client.execute(POSITION_CHANGES_QUERY, variable_values=variables)
+        else:
+            response = client.execute(POSITION_CHANGES_AT_BLOCK_QUERY, variable_values={**variables, "block": block})
+        if block is None:
+            pool_state = response["pool"]
+            block = int(response["_meta"]["block"]["number"])
+        page = hydrate_positions(response["positions"], pool_state, ticks)
+        changes.extend(page)
+        if len(page) < page_size:
+            return changes, pool_state, block
+        cursor = page[-1]["id"]
+
+def query_pools_with_token(symbol="REG", first=PAGE_SIZE):
+    """Return the addresses of all pools that have the token as token0 or token1"""
+    response = get_client().execute(POOLS_WITH_TOKEN_QUERY, variable_values={"symbol": symbol, "first": first})
+    return sorted({pool["id"] for pool in response["asToken0"] + response["asToken1"]})
+
+@lru_cache(maxsize=None)
+def _gql_document(query):
+    from gql import gql
+    return gql(query)
+
+async def _execute_async(session, semaphore, query, variable_values):
+    # Same rate limit and retry policy as the shared synchronous client
+    from gql.transport.exceptions import TransportServerError
+    document = _gql_document(query)
+    for attempt in range(MAX_RETRIES + 1):
+        async with semaphore:
+            await asyncio.sleep(RATE_LIMITER.reserve())
+            try:
+                return await session.execute(document, variable_values=variable_values)
+            except TransportServerError as e:
+                if attempt == MAX_RETRIES or not (e.code == 429 or (e.code or 0) >= 500):
+                    raise
+        await asyncio.sleep(backoff_delay(attempt))
+
+async def query_positions_async(session, pool_address, semaphore, page_size=PAGE_SIZE):
+    """Page through all positions of a pool on an async gql session, one request per semaphore slot"""
+    response = await _execute_async(session, semaphore, POOL_STATE_QUERY, {"pool": pool_address.lower()})
+    pool_state = response["pool"]
+    ticks = {}
+    positions = []
+    cursor = ""
+    while True:
+        response = await _execute_async(session, semaphore, POSITIONS_PAGE_QUERY, {
+            "pool": pool_address.lower(),
+            "first": page_size,
+            "cursor": cursor,
+            "lower": "",
+            "upper": ID_UPPER_SENTINEL,
+        })
+        page = hydrate_positions(response["positions"], pool_state, ticks)
+        positions.extend(page)
+        if len(page) < page_size:
+            return positions
+        cursor = page[-1]["id"]
+
+async def _query_pools_positions(pool_addresses, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with get_async_client() as session:
+        results = await asyncio.gather(*(
+            query_positions_async(session, pool_address, semaphore) for pool_address in pool_addresses
+        ))
+    return dict(zip(pool_addresses, results))
+
+# Fetch the positions of several pools concurrently; returns {pool_address: positions}
+def query_pools_positions(pool_addresses, max_concurrency=MAX_CONCURRENT_REQUESTS):
+    return asyncio.run(_query_pools_positions(list(pool_addresses), max_concurrency))
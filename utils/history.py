@@ -0,0 +1,120 @@
+import os
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.graph_queries import query_positions, query_block_at_timestamp
+from utils.data_processing import prepare_dataframe_columnar
+from utils.position_cache import CACHE_DIR
+from models.equation_sandbox import EquationTimeoutError
+from models.power_voting import custom_equation_column, equation_hash
+
+# Append-only store: one Parquet file per pool and block, never rewritten once present
+HISTORY_DIR = os.path.join(CACHE_DIR, "history")
+# Number of past blocks fetched at once
+MAX_HISTORY_WORKERS = 4
+
+def _pool_dir(pool_address):
+    return os.path.join(HISTORY_DIR, pool_address.lower())
+
+def _snapshot_path(pool_address, block):
+    return os.path.join(_pool_dir(pool_address), f"block={int(block)}.parquet")
+
+def stored_blocks(pool_address):
+    """Blocks already stored for a pool"""
+    pool_dir = _pool_dir(pool_address)
+    if not os.path.isdir(pool_dir):
+        return []
+    return sorted(
+        int(name[len("block="):-len(".parquet")])
+        for name in os.listdir(pool_dir)
+        if name.startswith("block=") and name.endswith(".parquet")
+    )
+
+def blocks_between(start_block, end_block, count):
+    """Evenly spaced block numbers from start_block to end_block inclusive"""
+    return sorted({int(block) for block in np.linspace(start_block, end_block, max(1, count))})
+
+def blocks_for_timestamps(timestamps, max_workers=MAX_HISTORY_WORKERS):
+    """Map unix timestamps to the first indexed block at or after each of them, in parallel"""
+    timestamps = list(timestamps)
+    if not timestamps:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, query_block_at_timestamp, timestamp) for timestamp in timestamps]
+        return [future.result() for future in futures]
+
+def _vote_column(equation):
+    # Stored vote columns are keyed by equation, so they stay valid when model ids change
+    return f"PowerVoting_{equation_hash(equation)}"
+
+def _store_snapshot(pool_address, block, voting_models):
+    positions = query_positions(pool_address, max_workers=1, block=block)
+    df, current_price, _ = prepare_dataframe_columnar(positions, compact=True)
+    if not df.empty:
+        votes = {}
+        for model_info in voting_models.values():
+            equation = model_info['params']['equation']
+            try:
+                votes[_vote_column(equation)] = custom_equation_column(df, equation)
+            except EquationTimeoutError:
+                # Left out of the file; load_history evaluates missing vote columns again
+                continue
+        df = df.assign(**votes)
+    # An empty snapshot is still stored so the block is not fetched again
+    df.insert(0, "Block", np.full(df.shape[0], int(block), dtype=np.int64))
+
+    # Write then rename, so readers never see a partial file
+    os.makedirs(_pool_dir(pool_address), exist_ok=True)
+    path = _snapshot_path(pool_address, block)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    df.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+    return block
+
+def fetch_history(pool_address, blocks, voting_models, max_workers=MAX_HISTORY_WORKERS):
+    """Snapshot the pool at each block not stored yet, in parallel, then load all requested blocks"""
+    missing = sorted(set(int(block) for block in blocks) - set(stored_blocks(pool_address)))
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # Each block runs in a copy of the caller's context, so its notices reach the caller's collector
+            futures = [
+                executor.submit(contextvars.copy_context().run, _store_snapshot, pool_address, block, voting_models)
+                for block in missing
+            ]
+            for future in futures:
+                future.result()
+    return load_history(pool_address, blocks, voting_models)
+
+def load_history(pool_address, blocks=None, voting_models=None):
+    """Stored snapshots as one DataFrame with a Block column and a PowerVoting_<model_id> column per model.
+
+    Models added after a snapshot was stored are evaluated from its stored position columns.
+    """
+    available = stored_blocks(pool_address)
+    if blocks is not None:
+        wanted = set(int(block) for block in blocks)
+        available = [block for block in available if block in wanted]
+    frames = [pd.read_parquet(_snapshot_path(pool_address, block)) for block in available]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    history = pd.concat(frames, ignore_index=True)
+
+    columns = {}
+    for model_id, model_info in (voting_models or {}).items():
+        equation = model_info['params']['equation']
+        stored_column = _vote_column(equation)
+        if stored_column in history.columns and not history[stored_column].isna().any():
+            columns[f"PowerVoting_{model_id}"] = history[stored_column].to_numpy()
+        else:
+            try:
+                columns[f"PowerVoting_{model_id}"] = custom_equation_column(history, equation)
+            except EquationTimeoutError:
+                columns[f"PowerVoting_{model_id}"] = np.zeros(len(history))
+    return history.assign(**columns)
+
+def owner_vote_history(history, voting_key):
+    """Block x owner table of total votes"""
+    return history.pivot_table(index="Block", columns="Owner", values=voting_key, aggfunc="sum", fill_value=0.0, observed=True)
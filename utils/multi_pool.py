@@ -0,0 +1,56 @@
+import pandas as pd
+from utils.graph_queries import query_pools_positions, query_pools_with_token
+from utils.data_processing import prepare_dataframe_columnar
+from models.model_results import model_results_frame
+
+# Prepare one pool's positions and add a vote column per model
+def analyze_pool(pool_address, positions, voting_models):
+    df, current_price, other_token_symbol = prepare_dataframe_columnar(positions)
+    if df.empty:
+        return df
+    df = pd.concat([df, model_results_frame(df, voting_models)], axis=1)
+    df.insert(0, "Pool", pool_address.lower())
+    df["Other Token"] = other_token_symbol
+    return df
+
+def vote_column_names(voting_models, reserved=()):
+    """Header of each PowerVoting_<model_id> column: the model's name, numbered when it is already taken"""
+    taken = set(reserved)
+    names = {}
+    for model_id, model_info in voting_models.items():
+        name, copy = model_info['name'], 1
+        while name in taken:
+            copy += 1
+            name = f"{model_info['name']} ({copy})"
+        taken.add(name)
+        names[f"PowerVoting_{model_id}"] = name
+    return names
+
+def aggregate_owner_votes(pool_frames, voting_models):
+    """Merge per-pool position frames into one vote table per owner across pools; empty without models"""
+    frames = [df for df in pool_frames.values() if not df.empty]
+    if not frames or not voting_models:
+        return pd.DataFrame()
+    positions = pd.concat(frames, ignore_index=True)
+    vote_columns = [f"PowerVoting_{model_id}" for model_id in voting_models]
+
+    owner_votes = positions.groupby("Owner").agg(
+        Pools=("Pool", "nunique"),
+        Positions=("Liquidity ID", "size"),
+        **{"Actual REG": ("Actual REG", "sum"), "REG Equivalent": ("REG Equivalent", "sum")},
+        **{column: (column, "sum") for column in vote_columns},
+    )
+    return owner_votes.sort_values(vote_columns[0], ascending=False).reset_index()
+
+# Fetch several pools in one concurrent round, analyze each and aggregate votes per owner.
+# Without pool addresses every pool containing REG is discovered first.
+def analyze_pools(pool_addresses, voting_models, max_concurrency=None):
+    if not pool_addresses:
+        pool_addresses = query_pools_with_token("REG")
+    kwargs = {"max_concurrency": max_concurrency} if max_concurrency else {}
+    pool_positions = query_pools_positions(pool_addresses, **kwargs)
+    pool_frames = {
+        pool_address: analyze_pool(pool_address, positions, voting_models)
+        for pool_address, positions in pool_positions.items()
+    }
+    return pool_frames, aggregate_owner_votes(pool_frames, voting_models)
@@ -0,0 +1,29 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Warnings and errors raised by the computation, collected as data instead of UI calls
+logger = logging.getLogger("powervoting")
+_collector = ContextVar("powervoting_notices", default=None)
+
+def notify(level, message, **context):
+    """Record a notice for the active collector, or log it when nothing is collecting"""
+    notice = {"level": level, "message": message}
+    if context:
+        notice["context"] = context
+    collector = _collector.get()
+    if collector is None:
+        logger.log(logging.ERROR if level == "error" else logging.WARNING, message)
+    else:
+        collector.append(notice)
+    return notice
+
+@contextmanager
+def collect_notices():
+    """Collect every notice raised in the block into the yielded list"""
+    notices = []
+    token = _collector.set(notices)
+    try:
+        yield notices
+    finally:
+        _collector.reset(token)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+def gini(totals):
+    """Gini coefficient of per-owner vote totals: 0 when equal, towards 1 when one owner holds everything"""
+    totals = np.sort(totals)
+    grand_total = totals.sum()
+    count = len(totals)
+    if count == 0 or grand_total <= 0:
+        return 0.0
+    return float(2 * np.sum(np.arange(1, count + 1) * totals) / (count * grand_total) - (count + 1) / count)
+
+def _top_share(totals, grand_total, count):
+    # Share of the votes held by the count largest totals, selected without a full sort
+    count = min(count, len(totals))
+    return min(float(np.partition(totals, len(totals) - count)[len(totals) - count:].sum() / grand_total), 1.0)
+
+def _nakamoto(totals, grand_total):
+    # Fewest owners holding a majority: the top k owners are selected with a partition for
+    # k = 1, 2, 4, ... until they hold one, so only up to twice the answer is ever sorted
+    k = 1
+    while True:
+        k = min(k, len(totals))
+        top = np.sort(np.partition(totals, len(totals) - k)[len(totals) - k:])[::-1]
+        cumulative_share = np.cumsum(top) / grand_total
+        if cumulative_share[-1] > 0.5 or k == len(totals):
+            return int(np.searchsorted(cumulative_share, 0.5, side="right") + 1)
+        k *= 2
+
+class OwnerIndex:
+    """Owners of a positions frame as categorical codes with row offsets and per-model vote totals.
+
+    Built once per dataset in O(positions); lookups, search, leaderboards and
+    concentration metrics then work on the owners alone.
+    """
+
+    def __init__(self, df, vote_columns=()):
+        codes, owners = pd.factorize(df["Owner"].to_numpy())
+        self.owners = np.asarray(owners, dtype=object)
+        self.codes = codes
+        self.counts = np.bincount(codes, minlength=len(self.owners))
+        # Rows grouped by owner: order[offsets[i]:offsets[i + 1]] are the rows of owner i
+        self.order = np.argsort(codes, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+        self.positions = {owner: i for i, owner in enumerate(self.owners)}
+        self.totals = {
+            column: np.bincount(codes, weights=df[column].to_numpy(dtype=float), minlength=len(self.owners))
+            for column in vote_columns
+        }
+        self._lowercase = pd.Series(self.owners, dtype=object).str.lower()
+
+    def __len__(self):
+        return len(self.owners)
+
+    def rows(self, owner):
+        """Row positions (for df.iloc) of an owner's positions, without scanning the frame"""
+        i = self.positions.get(owner)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+    def search(self, query="", page=0, page_size=50):
+        """Owners containing query (case-insensitive), most positions first; returns (owners, total matches)"""
+        if query:
+            matches = np.flatnonzero(self._lowercase.str.contains(query.strip().lower(), regex=False).to_numpy())
+        else:
+            matches = np.arange(len(self.owners))
+        matches = matches[np.argsort(-self.counts[matches], kind="stable")]
+        page_matches = matches[page * page_size:(page + 1) * page_size]
+        return list(self.owners[page_matches]), len(matches)
+
+    def leaderboard(self, vote_column, top_n=10):
+        """Top owners by votes for a model, with their share of all votes"""
+        totals = self.totals[vote_column]
+        top_n = min(top_n, len(totals))
+        top = np.argpartition(-totals, top_n - 1)[:top_n] if top_n else np.empty(0, dtype=np.int64)
+        top = top[np.argsort(-totals[top])]
+        grand_total = totals.sum()
+        return pd.DataFrame({
+            "Owner": self.owners[top],
+            "Positions": self.counts[top],
+            "Votes": totals[top],
+            "Share": totals[top] / grand_total if grand_total > 0 else 0.0,
+        })
+
+    def concentration(self, vote_column):
+        """Gini coefficient, Nakamoto coefficient (owners needed for a majority) and top-10 share.
+
+        The Nakamoto coefficient and top-10 share select the largest owners with
+        partitions; only the Gini coefficient sorts every owner.
+        """
+        totals = self.totals[vote_column]
+        grand_total = totals.sum()
+        if len(totals) == 0 or grand_total <= 0:
+            return {"gini": 0.0, "nakamoto": 0, "top10_share": 0.0}
+        return {
+            "gini": gini(totals),
+            "nakamoto": _nakamoto(totals, grand_total),
+            "top10_share": _top_share(totals, grand_total, 10),
+        }
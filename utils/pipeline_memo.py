@@ -0,0 +1,211 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.position_cache import fetch_positions_cached, latest_cached_block, sync_positions
+from utils.data_processing import prepare_dataframe_columnar, prepare_position_columns, update_prepared_dataframe
+from models.model_results import model_results_frame
+from utils.notices import collect_notices
+from utils.owner_index import OwnerIndex
+from utils.depth import LiquidityDepth, depth_profile
+from utils.snapshots import Snapshot, read_snapshot, snapshot_bytes
+from models.power_voting import equation_hash
+from utils.profiling import annotate, span
+
+# Memory budget of the in-process pipeline cache, shared by every Streamlit session
+PIPELINE_CACHE_MAX_BYTES = int(os.getenv("PIPELINE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Store prepared float columns in single precision, halving their footprint
+POSITIONS_FLOAT32 = os.getenv("POSITIONS_FLOAT32", "0") == "1"
+
+# Approximate memory of one raw position dict with its strings, and of the pool and token
+# dicts a position carries when it has its own copy rather than sharing its pool's
+POSITION_BYTES = 512
+POSITION_POOL_COPY_BYTES = 2560
+
+def _estimate_size(value):
+    # Estimated from shapes and row counts, so a put costs nothing like a pass over the payload
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, tuple) or (isinstance(value, list) and value and isinstance(value[0], (pd.DataFrame, np.ndarray))):
+        return sum(_estimate_size(item) for item in value)
+    if isinstance(value, list) and value and isinstance(value[0], dict) and "pool" in value[0]:
+        shared = value[0]["pool"] is value[-1]["pool"]
+        return len(value) * (POSITION_BYTES if shared else POSITION_BYTES + POSITION_POOL_COPY_BYTES)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Snapshot):
+        return value.table.nbytes
+    if isinstance(value, OwnerIndex):
+        return sum(_estimate_size(array) for array in (value.codes, value.order, value.offsets, value.counts, *value.totals.values())) + 100 * len(value)
+    if isinstance(value, LiquidityDepth):
+        return sum(_estimate_size(array) for array in (value.ticks, value.liquidity, value.sqrt_prices, value._suffix0, value._prefix1))
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+class BoundedCache:
+    """Thread-safe LRU cache bounded by the estimated byte size of its values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        annotate(cache_hit=value is not None)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+# Process-wide cache: values are shared between sessions and must be treated as read-only
+PIPELINE_CACHE = BoundedCache(PIPELINE_CACHE_MAX_BYTES)
+
+def positions_fingerprint(positions):
+    """Content hash of raw positions, used to key everything derived from them.
+
+    Each position contributes its id, owner, liquidity and tick indexes; tick prices
+    follow from the indexes. The pool state and tokens, the same for every position
+    of a pool, are hashed once and again only where a position's differ.
+    """
+    parts = []
+    shared = None
+    for p in positions:
+        state = (p["pool"], p["token0"], p["token1"])
+        if shared is None or any(new is not old and new != old for new, old in zip(state, shared)):
+            parts.append(json.dumps(state, sort_keys=True, separators=(",", ":")))
+            shared = state
+        parts.append(f'{p["id"]}|{p["owner"]}|{p["liquidity"]}|{p["tickLower"]["tickIdx"]}|{p["tickUpper"]["tickIdx"]}')
+    return hashlib.blake2b("\n".join(parts).encode(), digest_size=16).hexdigest()
+
+# Fetch stage keyed by pool and block; returns (positions, block, fingerprint, from_cache).
+# While the on-disk entry is fresh its block is known without a network call, so reruns are memory hits.
+def fetch_stage(pool_address, force_refresh=False):
+    with span("fetch", pool=pool_address.lower()) as record:
+        result = _fetch_stage(pool_address, force_refresh)
+        record.update(rows=len(result[0]), block=result[1], from_cache=result[3])
+    return result
+
+def _fetch_stage(pool_address, force_refresh):
+    pool_key = pool_address.lower()
+    block = None if force_refresh else latest_cached_block(pool_address)
+    if block is not None:
+        cached = PIPELINE_CACHE.get(("fetch", pool_key, block))
+        if cached is not None:
+            annotate(cache_hit=True)
+            return cached + (True,)
+
+    positions, block, from_cache = fetch_positions_cached(pool_address, force_refresh=force_refresh)
+    result = PIPELINE_CACHE.put(("fetch", pool_key, block), (positions, block, positions_fingerprint(positions)))
+    return result + (from_cache,)
+
+def _prepare_with_notices(prepare, *args):
+    with collect_notices() as notices:
+        df, current_price, other_token_symbol = prepare(*args)
+    return df, current_price, other_token_symbol, notices
+
+def _prepare_compact(positions):
+    return prepare_dataframe_columnar(positions, compact=True, float32=POSITIONS_FLOAT32)
+
+# Prepare stage keyed by the raw-data fingerprint; returns (df, current_price, other_token_symbol, notices).
+# Frames use the compact schema; labels are applied at display time.
+def prepare_stage(positions, fingerprint):
+    with span("prepare", rows=len(positions)):
+        return PIPELINE_CACHE.get_or_compute(
+            ("prepare", fingerprint),
+            lambda: _prepare_with_notices(_prepare_compact, positions),
+        )
+
+# Snapshot stage keyed by file path and modification, so a replaced file is read again.
+# The table is memory-mapped and its fingerprint is stored in the file, so nothing is hashed here.
+def snapshot_stage(path):
+    stat = os.stat(path)
+    with span("snapshot", payload_bytes=stat.st_size):
+        return PIPELINE_CACHE.get_or_compute(("snapshot", os.path.abspath(path), stat.st_mtime_ns, stat.st_size), lambda: read_snapshot(path))
+
+def _prepare_snapshot(snapshot):
+    return prepare_position_columns(snapshot.columns(), compact=True, float32=POSITIONS_FLOAT32)
+
+# Prepare stage for a snapshot, read from its columns; shares entries with prepare_stage by fingerprint
+def prepare_snapshot_stage(snapshot):
+    with span("prepare", rows=len(snapshot)):
+        return PIPELINE_CACHE.get_or_compute(
+            ("prepare", snapshot.fingerprint),
+            lambda: _prepare_with_notices(_prepare_snapshot, snapshot),
+        )
+
+# Snapshot file contents for downloads, built once per dataset
+def snapshot_bytes_stage(pool_address, block, positions, fingerprint):
+    return PIPELINE_CACHE.get_or_compute(
+        ("snapshot_bytes", fingerprint, int(block)),
+        lambda: snapshot_bytes(pool_address, block, positions, fingerprint),
+    )
+
+# Incremental sync: only changed rows are re-prepared when the previous frame is still cached.
+# Returns (positions, block, fingerprint, delta).
+def sync_stage(pool_address, previous_fingerprint):
+    with span("sync", pool=pool_address.lower()) as record:
+        result = _sync_stage(pool_address, previous_fingerprint)
+        record.update(rows=len(result[0]), block=result[1], changed=len(result[3]["changed"]), removed=len(result[3]["removed"]))
+    return result
+
+def _sync_stage(pool_address, previous_fingerprint):
+    positions, block, delta = sync_positions(pool_address)
+    fingerprint = positions_fingerprint(positions)
+    PIPELINE_CACHE.put(("fetch", pool_address.lower(), block), (positions, block, fingerprint))
+
+    previous = PIPELINE_CACHE.get(("prepare", previous_fingerprint)) if previous_fingerprint else None
+    if previous is not None:
+        df, current_price, other_token_symbol, notices = _prepare_with_notices(update_prepared_dataframe, previous[0], positions, delta)
+        PIPELINE_CACHE.put(("prepare", fingerprint), (df, current_price, other_token_symbol, previous[3] + notices))
+    return positions, block, fingerprint, delta
+
+# Model stage: votes are kept per data fingerprint and equation hash by the model-results layer
+def with_model_columns(df, fingerprint, voting_models):
+    """Return df with a PowerVoting_<model_id> column per model, leaving the cached frame untouched"""
+    return pd.concat([df, model_results_frame(df, voting_models, fingerprint)], axis=1)
+
+# Owner index keyed by data fingerprint and the models' equations
+def owner_index_stage(df, fingerprint, voting_models):
+    vote_columns = tuple(f"PowerVoting_{model_id}" for model_id in voting_models)
+    equations = tuple(equation_hash(model_info['params']['equation']) for model_info in voting_models.values())
+    with span("owner_index", rows=len(df)):
+        return PIPELINE_CACHE.get_or_compute(
+            ("owners", fingerprint, vote_columns, equations),
+            lambda: OwnerIndex(df, vote_columns),
+        )
+
+# Depth profile keyed by data fingerprint: boundary deltas sorted and summed once per dataset
+def depth_stage(positions, fingerprint):
+    with span("depth", rows=len(positions)):
+        return PIPELINE_CACHE.get_or_compute(("depth", fingerprint), lambda: depth_profile(positions))
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+from utils.graph_queries import OFFLINE_MODE, query_positions, query_indexed_block, query_position_changes
+
+# Cache location and limits, configurable through the environment
+CACHE_DIR = os.getenv("POSITION_CACHE_DIR", ".cache")
+CACHE_TTL_SECONDS = float(os.getenv("POSITION_CACHE_TTL", "300"))
+CACHE_MAX_BYTES = int(os.getenv("POSITION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+def _connect(cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(cache_dir, "positions.sqlite"), timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS positions_cache (
+            pool TEXT NOT NULL,
+            block INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            size INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (pool, block)
+        )
+    """)
+    return conn
+
+def load_cached_positions(pool_address, ttl=None, block=None, cache_dir=None):
+    """Return (positions, block) of the newest cached entry for the pool, or None.
+
+    With a block, only that exact block matches and the TTL is ignored: a pool's
+    positions at a given block never change.
+    """
+    ttl = CACHE_TTL_SECONDS if ttl is None else ttl
+    with _connect(cache_dir) as conn:
+        if block is None:
+            row = conn.execute(
+                "SELECT block, payload FROM positions_cache WHERE pool = ? AND fetched_at >= ? "
+                "ORDER BY block DESC LIMIT 1",
+                (pool_address.lower(), time.time() - ttl),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT block, payload FROM positions_cache WHERE pool = ? AND block = ?",
+                (pool_address.lower(), block),
+            ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE positions_cache SET last_access = ? WHERE pool = ? AND block = ?",
+            (time.time(), pool_address.lower(), row[0]),
+        )
+    return json.loads(zlib.decompress(row[1])), row[0]
+
+def latest_cached_block(pool_address, ttl=None, cache_dir=None):
+    """Return the newest block cached for the pool within the TTL without reading its payload"""
+    ttl = CACHE_TTL_SECONDS if ttl is None else ttl
+    with _connect(cache_dir) as conn:
+        row = conn.execute(
+            "SELECT MAX(block) FROM positions_cache WHERE pool = ? AND fetched_at >= ?",
+            (pool_address.lower(), time.time() - ttl),
+        ).fetchone()
+    return row[0]
+
+def store_positions(pool_address, block, positions, max_bytes=None, cache_dir=None, replaces_block=None):
+    """Store the raw positions of a pool at a block, then evict down to max_bytes.
+
+    replaces_block drops the pool's entry at that block, the one a sync started
+    from; entries at other blocks, such as past-block tallies, are kept.
+    """
+    payload = zlib.compress(json.dumps(positions, separators=(",", ":")).encode())
+    now = time.time()
+    with _connect(cache_dir) as conn:
+        if replaces_block is not None:
+            conn.execute("DELETE FROM positions_cache WHERE pool = ? AND block = ?", (pool_address.lower(), replaces_block))
+        conn.execute(
+            "INSERT OR REPLACE INTO positions_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (pool_address.lower(), block, now, now, len(payload), payload),
+        )
+        _evict_lru(conn, CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+def has_cached_positions(pool_address, block, cache_dir=None):
+    """Whether positions of the pool at a block are stored, without reading the payload"""
+    with _connect(cache_dir) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM positions_cache WHERE pool = ? AND block = ?",
+            (pool_address.lower(), block),
+        ).fetchone()
+    return row is not None
+
+def touch_cached_positions(pool_address, block, cache_dir=None):
+    """Mark a cached entry as freshly fetched; returns False when it is not cached"""
+    now = time.time()
+    with _connect(cache_dir) as conn:
+        cursor = conn.execute(
+            "UPDATE positions_cache SET fetched_at = ?, last_access = ? WHERE pool = ? AND block = ?",
+            (now, now, pool_address.lower(), block),
+        )
+        return cursor.rowcount > 0
+
+def _evict_lru(conn, max_bytes):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM positions_cache").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for pool, block, size in conn.execute(
+        "SELECT pool, block, size FROM positions_cache ORDER BY last_access ASC"
+    ).fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM positions_cache WHERE pool = ? AND block = ?", (pool, block))
+        total -= size
+
+def load_latest_positions(pool_address, cache_dir=None):
+    """Return (positions, block) of the newest cached entry for the pool regardless of age, or None"""
+    return load_cached_positions(pool_address, ttl=float("inf"), cache_dir=cache_dir)
+
+def clear_cache(pool_address=None, cache_dir=None):
+    """Drop cached positions for one pool, or the whole cache"""
+    with _connect(cache_dir) as conn:
+        if pool_address:
+            conn.execute("DELETE FROM positions_cache WHERE pool = ?", (pool_address.lower(),))
+        else:
+            conn.execute("DELETE FROM positions_cache")
+
+# Fetch positions through the on-disk cache; returns (positions, block, from_cache)
+def fetch_positions_cached(pool_address, force_refresh=False, ttl=None):
+    # Offline, the newest snapshot of the pool stands in for the latest indexed block
+    if OFFLINE_MODE:
+        from utils.snapshots import load_snapshot
+        snapshot = load_snapshot(pool_address)
+        return snapshot.positions, snapshot.block, True
+
+    if not force_refresh:
+        cached = load_cached_positions(pool_address, ttl=ttl)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+    # An expired entry is still valid if the subgraph has not indexed a new block
+    block = query_indexed_block()
+    if not force_refresh:
+        cached = load_cached_positions(pool_address, block=block)
+        if cached is not None:
+            touch_cached_positions(pool_address, block)
+            return cached[0], block, True
+
+    # Pinned to the block the rows are stored under, so the tag is their exact state
+    positions = query_positions(pool_address, block=block)
+    store_positions(pool_address, block, positions)
+    return positions, block, False
+
+# Block a progressive load should fetch the pool at, or None when fetch_positions_cached
+# would be served from the cache (or from a snapshot offline) and nothing needs streaming
+def progressive_fetch_block(pool_address, force_refresh=False):
+    if OFFLINE_MODE:
+        return None
+    if not force_refresh and latest_cached_block(pool_address) is not None:
+        return None
+    block = query_indexed_block()
+    if not force_refresh and has_cached_positions(pool_address, block):
+        return None
+    return block
+
+# Bring the stored positions of a pool up to date with only the rows changed since its last block.
+# Returns (positions, block, delta) where delta lists the changed rows, the removed ids and
+# whether the pool state moved; delta["full"] is set when there was nothing to sync from.
+def sync_positions(pool_address):
+    stored = load_latest_positions(pool_address)
+    if stored is None:
+        positions, block, _ = fetch_positions_cached(pool_address, force_refresh=True)
+        return positions, block, {"full": True, "changed": positions, "removed": set(), "pool_changed": True}
+
+    stored_positions, stored_block = stored
+    changes, pool_state, block = query_position_changes(pool_address, stored_block)
+
+    by_id = {p["id"]: p for p in stored_positions}
+    changed = [p for p in changes if float(p["liquidity"]) > 0]
+    removed = {p["id"] for p in changes if float(p["liquidity"]) == 0 and p["id"] in by_id}
+    for position_id in removed:
+        del by_id[position_id]
+    for p in changed:
+        by_id[p["id"]] = p
+
+    # Every position embeds the pool state, so a moved tick or price touches all rows
+    pool_changed = bool(stored_positions) and pool_state is not None and stored_positions[0]["pool"] != pool_state
+    positions = list(by_id.values())
+    if pool_state is not None:
+        for p in positions:
+            p["pool"] = pool_state
+
+    store_positions(pool_address, block, positions, replaces_block=stored_block)
+    return positions, block, {"full": False, "changed": changed, "removed": removed, "pool_changed": pool_changed}
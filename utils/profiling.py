@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Profile app runs by default, and the optional JSON-lines file every profiled run appends its spans to
+PROFILE_PIPELINE = os.getenv("PROFILE_PIPELINE", "0") == "1"
+PROFILE_LOG = os.getenv("PROFILE_LOG")
+
+# Stage timings recorded as spans of the active profile. Without one, span() only
+# checks a context variable, so instrumented code costs next to nothing.
+_profile = ContextVar("powervoting_profile", default=None)
+_current_span = ContextVar("powervoting_span", default=None)
+
+class Profile:
+    """Spans of one profiled run, in the order they finished"""
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.spans.append(record)
+
+@contextmanager
+def span(name, **attributes):
+    """Time the block as a span of the active profile; the yielded dict takes extra attributes.
+
+    Attributes may also be added from inside the block, by nested code, with annotate().
+    """
+    profile = _profile.get()
+    if profile is None:
+        yield {}
+        return
+    parent = _current_span.get()
+    record = {
+        "name": name,
+        "depth": parent["depth"] + 1 if parent is not None else 0,
+        "start_ms": (time.perf_counter() - profile.origin) * 1000,
+        **attributes,
+    }
+    token = _current_span.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        _current_span.reset(token)
+        profile.add(record)
+
+def traced(name):
+    """Decorator recording every call of a function as a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profile.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**attributes):
+    """Add attributes to the innermost open span, if any"""
+    record = _current_span.get()
+    if record is not None:
+        record.update(attributes)
+
+@contextmanager
+def profile_run(enabled=True, log_path=None):
+    """Profile the block; yields the Profile, or None when disabled.
+
+    Spans are appended to log_path (default PROFILE_LOG) as JSON lines when the block ends.
+    """
+    if not enabled:
+        yield None
+        return
+    profile = Profile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+        log_path = log_path or PROFILE_LOG
+        if log_path:
+            write_profile(profile, log_path)
+
+def write_profile(profile, path):
+    with profile.lock:
+        lines = [
+            json.dumps({"run": profile.run_id, "timestamp": profile.started_at, **record}, default=str)
+            for record in profile.spans
+        ]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.graph_queries import iter_positions_parallel
+from utils.position_cache import progressive_fetch_block, store_positions
+from utils.pipeline_memo import PIPELINE_CACHE, POSITIONS_FLOAT32, positions_fingerprint
+from utils.data_processing import compact_dataframe, prepare_dataframe_columnar
+from utils.notices import collect_notices
+from models.equation_sandbox import EquationTimeoutError
+from models.power_voting import DEFAULT_EQUATION, custom_equation_column
+from utils.profiling import span
+
+# Render pools fetched from the subgraph page by page by default
+PROGRESSIVE_LOADING = os.getenv("PROGRESSIVE_LOADING", "1") == "1"
+
+class ProgressiveLoad:
+    """A pool fetched page by page, each page prepared and scored as soon as it arrives.
+
+    Iterating the load yields it again after every page, so callers can render
+    the positions loaded so far (preview(), top_owners()). When the last page is
+    in, the result is stored in the disk and pipeline caches under the same keys
+    as a regular fetch and prepare, so the rest of the pipeline finds it there.
+    """
+
+    def __init__(self, pool_address, block, equation=DEFAULT_EQUATION, vote_column="PowerVoting_default"):
+        self.pool_address = pool_address
+        self.block = block
+        self.equation = equation
+        self.vote_column = vote_column
+        # Pages of each id range in arrival order: (positions, prepared frame, votes)
+        self.ranges = {}
+        self.count = 0
+        self.page_count = 0
+        self.current_price = None
+        self.other_token_symbol = None
+        self.notices = []
+        # Why the preview stopped scoring pages, after the equation ran out of time
+        self.score_error = None
+        self.owner_votes = pd.Series(dtype=float)
+        self.positions = None
+        self.fingerprint = None
+
+    def __iter__(self):
+        with span("subgraph", pool=self.pool_address.lower(), block=self.block, progressive=True) as record:
+            for index, page in iter_positions_parallel(self.pool_address, block=self.block):
+                self._add_page(index, page)
+                record["rows"] = self.count
+                yield self
+        self._finish()
+
+    def _add_page(self, index, page):
+        with span("prepare_page", rows=len(page)):
+            with collect_notices() as notices:
+                df, current_price, other_token_symbol = prepare_dataframe_columnar(page, compact=True, float32=POSITIONS_FLOAT32)
+            # Equation errors are reported by the full model evaluation once loading ends
+            votes = np.zeros(len(df))
+            if not df.empty and self.score_error is None:
+                try:
+                    with collect_notices():
+                        votes = custom_equation_column(df, self.equation)
+                except EquationTimeoutError as e:
+                    # Later pages would time out too; the preview shows zeros and the error instead
+                    self.score_error = str(e)
+        self.notices += notices
+        self.ranges.setdefault(index, []).append((page, df, votes))
+        self.count += len(page)
+        self.page_count += 1
+        if current_price is not None:
+            self.current_price, self.other_token_symbol = current_price, other_token_symbol
+        if len(votes):
+            page_totals = pd.Series(votes).groupby(df["Owner"].to_numpy()).sum()
+            self.owner_votes = self.owner_votes.add(page_totals, fill_value=0)
+
+    def _pages(self):
+        # Range order, then page order: the order query_positions_parallel returns
+        return [entry for index in sorted(self.ranges) for entry in self.ranges[index]]
+
+    def preview(self):
+        """Positions loaded so far as one frame, with the scored model's vote column"""
+        pages = [(df, votes) for _, df, votes in self._pages() if not df.empty]
+        if not pages:
+            return pd.DataFrame()
+        df = pd.concat([df for df, _ in pages], ignore_index=True)
+        return df.assign(**{self.vote_column: np.concatenate([votes for _, votes in pages])})
+
+    def top_owners(self, top_n=10):
+        """Owners with the most votes so far under the scored model, with their share"""
+        top = self.owner_votes.nlargest(top_n)
+        total = self.owner_votes.sum()
+        return pd.DataFrame({
+            "Owner": top.index,
+            "Votes": top.to_numpy(),
+            "Share": top.to_numpy() / total if total > 0 else 0.0,
+        })
+
+    def _finish(self):
+        pages = self._pages()
+        self.positions = [position for page, _, _ in pages for position in page]
+        self.fingerprint = positions_fingerprint(self.positions)
+        store_positions(self.pool_address, self.block, self.positions)
+        PIPELINE_CACHE.put(("fetch", self.pool_address.lower(), self.block), (self.positions, self.block, self.fingerprint))
+
+        # Page frames joined and re-compacted are the frame prepare_stage would build
+        frames = [df for _, df, _ in pages if not df.empty]
+        if frames:
+            df = compact_dataframe(pd.concat(frames, ignore_index=True), float32=POSITIONS_FLOAT32)
+        else:
+            df = pd.DataFrame()
+        PIPELINE_CACHE.put(("prepare", self.fingerprint), (df, self.current_price, self.other_token_symbol, self.notices))
+
+# Progressive fetch stage: a ProgressiveLoad when the pool has to be fetched from the
+# subgraph, or None when the cache serves it and fetch_stage is the quicker path
+def progressive_stage(pool_address, force_refresh=False, equation=DEFAULT_EQUATION, vote_column="PowerVoting_default"):
+    block = progressive_fetch_block(pool_address, force_refresh=force_refresh)
+    if block is None:
+        return None
+    return ProgressiveLoad(pool_address, block, equation, vote_column)
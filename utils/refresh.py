@@ -0,0 +1,174 @@
+import os
+import time
+import heapq
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.graph_queries import OFFLINE_MODE
+from utils.notices import notify
+from utils.pipeline_memo import prepare_stage, sync_stage
+
+# Background refresh of watched pools: interval between refreshes of a pool, refreshes
+# running at once, and pools watched from startup (comma-separated addresses)
+REFRESH_INTERVAL_SECONDS = float(os.getenv("REFRESH_INTERVAL_SECONDS", "60"))
+REFRESH_MAX_CONCURRENT = int(os.getenv("REFRESH_MAX_CONCURRENT", "2"))
+WATCHLIST_POOLS = [pool.strip().lower() for pool in os.getenv("WATCHLIST_POOLS", "").split(",") if pool.strip()]
+# Each delay is drawn within ±REFRESH_JITTER of the interval, so pools watched together drift apart
+REFRESH_JITTER = 0.2
+
+class RefreshScheduler:
+    """Keeps the pools of a watch-list fresh from a background thread, outside any Streamlit script.
+
+    A scheduler thread waits for the next pool to come due and hands it to a pool
+    of at most max_concurrent refresh threads. A refresh syncs the positions
+    changed since the pool's last block and warms the pipeline cache, so a page
+    load finds the prepared frame in memory. The last good dataset of each pool
+    stays available, with its age, while the next refresh runs or after one fails.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL_SECONDS, max_concurrent=REFRESH_MAX_CONCURRENT, jitter=REFRESH_JITTER):
+        self.interval = interval
+        self.jitter = jitter
+        self.max_concurrent = max(1, max_concurrent)
+        self.pools = {}
+        # (due, pool) heap; entries whose due time no longer matches the pool's are stale and skipped
+        self.queue = []
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="pool-refresh")
+        self.thread = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def start(self):
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="pool-refresh-scheduler", daemon=True)
+                self.thread.start()
+
+    def _delay(self):
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule(self, pool, delay):
+        due = time.monotonic() + delay
+        self.pools[pool]["due"] = due
+        heapq.heappush(self.queue, (due, pool))
+        self.condition.notify()
+
+    def watch(self, pool_address, dataset=None):
+        """Add a pool to the watch-list, optionally with a dataset (positions, block, fingerprint) already loaded"""
+        pool = pool_address.lower()
+        with self.condition:
+            state = self.pools.get(pool)
+            if state is None:
+                state = self.pools[pool] = {
+                    "positions": None, "block": None, "fingerprint": None, "refreshed_at": None,
+                    "refreshing": False, "error": None, "due": None,
+                }
+                # A pool that comes with its data is not due before a full interval; one without is fetched soon
+                self._schedule(pool, self._delay() if dataset is not None else random.uniform(0, self.jitter * self.interval))
+            # A dataset loaded in the foreground, such as a forced refresh, replaces an older one
+            if dataset is not None and dataset[2] != state["fingerprint"] and (state["block"] is None or dataset[1] >= state["block"]):
+                state["positions"], state["block"], state["fingerprint"] = dataset
+                state["refreshed_at"] = time.time()
+        self.start()
+
+    def unwatch(self, pool_address):
+        with self.condition:
+            self.pools.pop(pool_address.lower(), None)
+
+    def is_watched(self, pool_address):
+        with self.condition:
+            return pool_address.lower() in self.pools
+
+    def refresh_now(self, pool_address):
+        """Move a watched pool to the front of the queue"""
+        pool = pool_address.lower()
+        with self.condition:
+            if pool in self.pools and not self.pools[pool]["refreshing"]:
+                self._schedule(pool, 0)
+
+    def latest(self, pool_address):
+        """Last good dataset of a watched pool as a dict, or None before its first refresh.
+
+        The dict has positions, block, fingerprint, refreshed_at (unix time), and
+        the refreshing flag, error and seconds until the next refresh.
+        """
+        with self.condition:
+            state = self.pools.get(pool_address.lower())
+            if state is None or state["positions"] is None:
+                return None
+            return {**state, "next_refresh_in": max(0.0, state["due"] - time.monotonic()) if state["due"] else None}
+
+    def watched(self):
+        """Status of every watched pool: block, age in seconds, refreshing flag and last error"""
+        now = time.time()
+        with self.condition:
+            return [
+                {
+                    "pool": pool,
+                    "block": state["block"],
+                    "age_s": now - state["refreshed_at"] if state["refreshed_at"] else None,
+                    "refreshing": state["refreshing"],
+                    "error": state["error"],
+                }
+                for pool, state in sorted(self.pools.items())
+            ]
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    while self.queue and (self.queue[0][1] not in self.pools or self.pools[self.queue[0][1]]["due"] != self.queue[0][0]):
+                        heapq.heappop(self.queue)
+                    now = time.monotonic()
+                    if self.queue and self.queue[0][0] <= now:
+                        _, pool = heapq.heappop(self.queue)
+                        state = self.pools[pool]
+                        state["refreshing"], state["due"] = True, None
+                        previous_fingerprint = state["fingerprint"]
+                        break
+                    self.condition.wait(self.queue[0][0] - now if self.queue else None)
+            try:
+                self.executor.submit(self._refresh, pool, previous_fingerprint)
+            except RuntimeError:
+                # The interpreter is shutting down and accepts no new work
+                return
+
+    def _refresh(self, pool, previous_fingerprint):
+        dataset = error = None
+        try:
+            positions, block, fingerprint, _ = sync_stage(pool, previous_fingerprint)
+            # Warm the compact frame; after a sync with the previous frame cached this is a hit
+            prepare_stage(positions, fingerprint)
+            dataset = (positions, block, fingerprint)
+        except Exception as e:
+            error = str(e)
+            notify("warning", f"Background refresh of pool {pool} failed: {e}", pool=pool)
+
+        with self.condition:
+            state = self.pools.get(pool)
+            if state is None:
+                return
+            self.refreshes += 1
+            if dataset is not None:
+                state["positions"], state["block"], state["fingerprint"] = dataset
+                state["refreshed_at"] = time.time()
+            else:
+                self.failures += 1
+            state["refreshing"], state["error"] = False, error
+            self._schedule(pool, self._delay())
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Process-wide refresh scheduler, shared by every session; None in offline mode"""
+    global _scheduler
+    if OFFLINE_MODE:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RefreshScheduler()
+            for pool in WATCHLIST_POOLS:
+                _scheduler.watch(pool)
+        return _scheduler
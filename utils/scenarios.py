@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from models.equation_sandbox import EQUATION_SANDBOX, evaluate_sandboxed
+from models.power_voting import evaluate_equation
+
+# Upper bound on positions x prices cells evaluated at once; bounds scenario memory use
+MAX_CHUNK_CELLS = 2_000_000
+
+def position_arrays(positions):
+    """Pull the per-position inputs of a price scenario out of raw subgraph positions"""
+    positions = [p for p in positions if float(p["liquidity"]) != 0]
+    if not positions:
+        return None
+    reg_is_token0 = np.array([p["token0"]["symbol"] == "REG" for p in positions])
+    token0_decimals = np.array([int(p["token0"]["decimals"]) for p in positions])
+    token1_decimals = np.array([int(p["token1"]["decimals"]) for p in positions])
+    return {
+        "owner": np.array([p["owner"] for p in positions], dtype=object),
+        "liquidity": np.array([float(p["liquidity"]) for p in positions]),
+        "tick_lower": np.array([int(p["tickLower"]["tickIdx"]) for p in positions], dtype=np.float64),
+        "tick_upper": np.array([int(p["tickUpper"]["tickIdx"]) for p in positions], dtype=np.float64),
+        "reg_is_token0": reg_is_token0,
+        # Human price of token0 in token1 is 1.0001^tick * decimal_shift
+        "decimal_shift": 10.0 ** (token0_decimals - token1_decimals),
+        "reg_scale": 10.0 ** np.where(reg_is_token0, token0_decimals, token1_decimals),
+        "other_scale": 10.0 ** np.where(reg_is_token0, token1_decimals, token0_decimals),
+    }
+
+def price_grid(current_price, low=0.5, high=2.0, points=60):
+    """Geometric grid of hypothetical REG prices between low and high times the current price"""
+    return current_price * np.geomspace(low, high, points)
+
+def _reg_price_to_sqrt(reg_prices, arrays):
+    # positions x prices matrix of raw sqrt prices (token1 per token0) for each REG price
+    reg_prices = reg_prices[None, :]
+    shift = arrays["decimal_shift"][:, None]
+    raw_price = np.where(arrays["reg_is_token0"][:, None], reg_prices / shift, 1 / (reg_prices * shift))
+    return np.sqrt(raw_price)
+
+def _chunk_votes(equation, variables):
+    # Each chunk runs in the sandboxed worker, under one evaluation's wall-clock budget, when the sandbox is on
+    if EQUATION_SANDBOX:
+        return evaluate_sandboxed(equation, variables)
+    return evaluate_equation(equation, **variables)
+
+def iter_scenario_chunks(arrays, reg_prices, equations, max_chunk_cells=MAX_CHUNK_CELLS):
+    """Yield (price_slice, reg_amount, reg_equivalent, votes) for chunks of the price axis.
+
+    reg_amount and reg_equivalent are positions x prices matrices for the chunk, and votes
+    maps each key of equations to its positions x prices matrix of model votes.
+    An equation that overruns its budget on a chunk raises EquationTimeoutError.
+    """
+    reg_prices = np.asarray(reg_prices, dtype=np.float64)
+    count = arrays["liquidity"].shape[0]
+    chunk = max(1, max_chunk_cells // max(count, 1))
+
+    liquidity = arrays["liquidity"][:, None]
+    reg_is_token0 = arrays["reg_is_token0"][:, None]
+    sqrt_lower = np.sqrt(1.0001 ** arrays["tick_lower"])[:, None]
+    sqrt_upper = np.sqrt(1.0001 ** arrays["tick_upper"])[:, None]
+
+    # Position REG price bounds do not depend on the scenario price
+    shift = arrays["decimal_shift"][:, None]
+    price_lower = sqrt_lower ** 2 * shift
+    price_upper = sqrt_upper ** 2 * shift
+    min_reg_price = np.where(reg_is_token0, price_lower, 1 / price_upper)
+    max_reg_price = np.where(reg_is_token0, price_upper, 1 / price_lower)
+    center_price = (min_reg_price + max_reg_price) / 2
+
+    for start in range(0, reg_prices.shape[0], chunk):
+        price_slice = slice(start, min(start + chunk, reg_prices.shape[0]))
+        prices = reg_prices[price_slice]
+
+        # Clamping the price into each range covers the below/in/above range cases at once
+        sqrt_price = np.clip(_reg_price_to_sqrt(prices, arrays), sqrt_lower, sqrt_upper)
+        amount0 = liquidity * (1 / sqrt_price - 1 / sqrt_upper)
+        amount1 = liquidity * (sqrt_price - sqrt_lower)
+        reg_amount = np.where(reg_is_token0, amount0, amount1) / arrays["reg_scale"][:, None]
+        other_amount = np.where(reg_is_token0, amount1, amount0) / arrays["other_scale"][:, None]
+        reg_equivalent = other_amount / prices[None, :]
+
+        price_distance = np.abs(center_price - prices[None, :])
+        variables = {
+            "reg_amount": reg_amount,
+            "reg_equivalent": reg_equivalent,
+            "relative_distance": price_distance / prices[None, :],
+            "price_distance": price_distance,
+            "is_active": ((min_reg_price <= prices[None, :]) & (prices[None, :] <= max_reg_price)).astype(np.float64),
+        }
+        votes = {}
+        for key, equation in equations.items():
+            result = np.broadcast_to(_chunk_votes(equation, variables), reg_amount.shape)
+            votes[key] = np.where(np.isfinite(result), result, 0.0)
+        yield price_slice, reg_amount, reg_equivalent, votes
+
+def owner_vote_curves(positions, reg_prices, equations, max_chunk_cells=MAX_CHUNK_CELLS):
+    """Per-owner votes at every hypothetical REG price.
+
+    Returns {key: DataFrame} with one row per owner and one column per price,
+    reduced chunk by chunk so the full positions x prices matrix is never held.
+    """
+    arrays = position_arrays(positions)
+    reg_prices = np.asarray(reg_prices, dtype=np.float64)
+    if arrays is None:
+        return {key: pd.DataFrame(columns=reg_prices) for key in equations}
+
+    # Sort positions by owner so each owner's rows are contiguous for reduceat
+    owner_codes, owners = pd.factorize(arrays["owner"], sort=True)
+    order = np.argsort(owner_codes, kind="stable")
+    arrays = {name: values[order] for name, values in arrays.items()}
+    starts = np.flatnonzero(np.r_[True, np.diff(owner_codes[order]) != 0])
+
+    curves = {key: np.empty((len(owners), reg_prices.shape[0])) for key in equations}
+    for price_slice, _, _, votes in iter_scenario_chunks(arrays, reg_prices, equations, max_chunk_cells):
+        for key, matrix in votes.items():
+            curves[key][:, price_slice] = np.add.reduceat(matrix, starts, axis=0)
+
+    return {key: pd.DataFrame(values, index=pd.Index(owners, name="Owner"), columns=reg_prices) for key, values in curves.items()}
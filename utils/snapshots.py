@@ -0,0 +1,223 @@
+import io
+import os
+import re
+import json
+import uuid
+from collections.abc import Sequence
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Pool snapshots for offline replay: one Arrow IPC file per pool and block
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_SUFFIX = ".arrow"
+# Bumped when the column layout changes; older files are rejected instead of misread
+SNAPSHOT_FORMAT_VERSION = 1
+# Pool addresses name snapshot files, so metadata read from a file must be a plain address
+POOL_ADDRESS_PATTERN = re.compile(r"^0x[0-9a-f]{40}$")
+
+# Per-position columns. Files are written uncompressed so they can be memory-mapped
+# without a decode step; owners are dictionary-encoded and liquidity, a uint128, stays text.
+SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("owner", pa.dictionary(pa.int32(), pa.string())),
+    ("liquidity", pa.string()),
+    ("tick_lower", pa.int32()),
+    ("tick_upper", pa.int32()),
+    ("tick_lower_price0", pa.float64()),
+    ("tick_lower_price1", pa.float64()),
+    ("tick_upper_price0", pa.float64()),
+    ("tick_upper_price1", pa.float64()),
+])
+
+def snapshot_path(pool_address, block, snapshot_dir=None):
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, f"{pool_address.lower()}-{int(block)}{SNAPSHOT_SUFFIX}")
+
+def positions_table(pool_address, block, positions, fingerprint=None):
+    """Arrow table of positions; pool state, tokens and block go into the schema metadata"""
+    if fingerprint is None:
+        # Same content hash as the pipeline cache, so a snapshot reuses a live load's prepared frame
+        from utils.pipeline_memo import positions_fingerprint
+        fingerprint = positions_fingerprint(positions)
+    metadata = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "pool": pool_address.lower(),
+        "block": int(block),
+        "fingerprint": fingerprint,
+        # Every position of a single-pool fetch embeds the same pool state and tokens
+        "pool_state": positions[0]["pool"] if positions else None,
+        "token0": positions[0]["token0"] if positions else None,
+        "token1": positions[0]["token1"] if positions else None,
+    }
+    columns = {
+        "id": [p["id"] for p in positions],
+        "owner": pa.array([p["owner"] for p in positions], pa.string()).dictionary_encode(),
+        "liquidity": [p["liquidity"] for p in positions],
+        "tick_lower": [int(p["tickLower"]["tickIdx"]) for p in positions],
+        "tick_upper": [int(p["tickUpper"]["tickIdx"]) for p in positions],
+        "tick_lower_price0": [float(p["tickLower"]["price0"]) for p in positions],
+        "tick_lower_price1": [float(p["tickLower"]["price1"]) for p in positions],
+        "tick_upper_price0": [float(p["tickUpper"]["price0"]) for p in positions],
+        "tick_upper_price1": [float(p["tickUpper"]["price1"]) for p in positions],
+    }
+    schema = SNAPSHOT_SCHEMA.with_metadata({"powervoting_snapshot": json.dumps(metadata)})
+    return pa.Table.from_pydict(columns, schema=schema)
+
+def save_snapshot(pool_address, block, positions, snapshot_dir=None, fingerprint=None):
+    """Write a snapshot file for the pool at a block; returns its path"""
+    path = snapshot_path(pool_address, block, snapshot_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so readers never map a partial file
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    table = positions_table(pool_address, block, positions, fingerprint)
+    with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp_path, path)
+    return path
+
+def snapshot_bytes(pool_address, block, positions, fingerprint=None):
+    """Snapshot file contents, for downloads"""
+    table = positions_table(pool_address, block, positions, fingerprint)
+    sink = io.BytesIO()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+class Snapshot(Sequence):
+    """Positions of a pool at a block, read from a snapshot file.
+
+    The Arrow table is memory-mapped when read from a path. A snapshot is a
+    sequence of subgraph-shaped positions, but those dicts are only built on
+    first access; columns() feeds prepare_position_columns straight from the table.
+    """
+
+    def __init__(self, table):
+        raw = (table.schema.metadata or {}).get(b"powervoting_snapshot")
+        if raw is None:
+            raise ValueError("Not a PowerVoting snapshot file")
+        metadata = json.loads(raw)
+        if metadata.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {metadata.get('version')}")
+        if not isinstance(metadata.get("pool"), str) or not POOL_ADDRESS_PATTERN.match(metadata["pool"]):
+            raise ValueError(f"Invalid pool address {metadata.get('pool')!r} in snapshot")
+        if not isinstance(metadata.get("block"), int) or isinstance(metadata["block"], bool) or metadata["block"] < 0:
+            raise ValueError(f"Invalid block {metadata.get('block')!r} in snapshot")
+        self.table = table
+        self.pool = metadata["pool"]
+        self.block = metadata["block"]
+        self.fingerprint = metadata["fingerprint"]
+        self.pool_state = metadata["pool_state"]
+        self.token0 = metadata["token0"]
+        self.token1 = metadata["token1"]
+        self._positions = None
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getitem__(self, index):
+        return self.positions[index]
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = self._build_positions()
+        return self._positions
+
+    def columns(self):
+        """Input arrays of prepare_position_columns, read from the table without per-position dicts"""
+        from utils.data_processing import _pool_metadata
+
+        table = self.table
+        if table.num_rows:
+            table = table.filter(pc.not_equal(table.column("liquidity"), "0"))
+        pools = [_pool_metadata({"token0": self.token0, "token1": self.token1, "pool": self.pool_state})] if table.num_rows else []
+        return {
+            "pools": pools,
+            "position_pool": np.zeros(table.num_rows, dtype=np.int64),
+            "id": table.column("id").to_pylist(),
+            # Categorical owners, decoded once per distinct owner rather than per row
+            "owner": table.column("owner").to_pandas().to_numpy(),
+            "liquidity": table.column("liquidity").to_pylist(),
+            "tick_lower": table.column("tick_lower").to_numpy().astype(np.float64),
+            "tick_upper": table.column("tick_upper").to_numpy().astype(np.float64),
+            "price0_lower": table.column("tick_lower_price0").to_numpy(),
+            "price0_upper": table.column("tick_upper_price0").to_numpy(),
+            "price1_lower": table.column("tick_lower_price1").to_numpy(),
+            "price1_upper": table.column("tick_upper_price1").to_numpy(),
+        }
+
+    def _build_positions(self):
+        columns = {name: self.table.column(name).to_pylist() for name in self.table.column_names}
+        # Ticks repeat across positions, so each distinct tick dict is built once and shared
+        ticks = {}
+        def tick(tick_idx, price0, price1):
+            if tick_idx not in ticks:
+                ticks[tick_idx] = {"tickIdx": str(tick_idx), "price1": repr(price1), "price0": repr(price0)}
+            return ticks[tick_idx]
+        return [
+            {
+                "id": position_id,
+                "owner": owner,
+                "liquidity": liquidity,
+                "tickLower": tick(tick_lower, lower_price0, lower_price1),
+                "tickUpper": tick(tick_upper, upper_price0, upper_price1),
+                "token0": self.token0,
+                "token1": self.token1,
+                "pool": self.pool_state,
+            }
+            for position_id, owner, liquidity, tick_lower, tick_upper, lower_price0, lower_price1, upper_price0, upper_price1 in zip(
+                columns["id"], columns["owner"], columns["liquidity"], columns["tick_lower"], columns["tick_upper"],
+                columns["tick_lower_price0"], columns["tick_lower_price1"],
+                columns["tick_upper_price0"], columns["tick_upper_price1"],
+            )
+        ]
+
+def read_snapshot(source):
+    """Read a snapshot from a path (memory-mapped) or from bytes / a binary file object"""
+    if isinstance(source, (str, os.PathLike)):
+        with pa.memory_map(os.fspath(source), "r") as mapped:
+            return Snapshot(pa.ipc.open_file(mapped).read_all())
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        source = source.read()
+    return Snapshot(pa.ipc.open_file(pa.py_buffer(source)).read_all())
+
+def import_snapshot(data, snapshot_dir=None):
+    """Validate uploaded snapshot bytes and store them under the snapshot directory; returns the Snapshot"""
+    snapshot = read_snapshot(data)
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    path = snapshot_path(snapshot.pool, snapshot.block, snapshot_dir)
+    # The file name comes from the upload; never write outside the snapshot directory
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(snapshot_dir):
+        raise ValueError(f"Snapshot path {path} is outside {snapshot_dir}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(bytes(data))
+    os.replace(temp_path, path)
+    return snapshot
+
+def list_snapshots(pool_address=None, snapshot_dir=None):
+    """(pool, block, path) of stored snapshots, optionally for one pool, newest block last"""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if not os.path.isdir(snapshot_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(snapshot_dir):
+        if not name.endswith(SNAPSHOT_SUFFIX):
+            continue
+        pool, _, block = name[:-len(SNAPSHOT_SUFFIX)].rpartition("-")
+        if not block.isdigit() or (pool_address and pool != pool_address.lower()):
+            continue
+        snapshots.append((pool, int(block), os.path.join(snapshot_dir, name)))
+    return sorted(snapshots, key=lambda snapshot: (snapshot[0], snapshot[1]))
+
+def load_snapshot(pool_address, block=None, snapshot_dir=None):
+    """Snapshot of a pool at a block, or its newest one without a block"""
+    snapshots = [s for s in list_snapshots(pool_address, snapshot_dir) if block is None or s[1] == int(block)]
+    if not snapshots:
+        at_block = f" at block {block}" if block is not None else ""
+        raise FileNotFoundError(f"No snapshot of pool {pool_address}{at_block} in {snapshot_dir or SNAPSHOT_DIR}")
+    return read_snapshot(snapshots[-1][2])
@@ -0,0 +1,184 @@
+import os
+import copy
+import json
+import time
+import random
+import threading
+from concurrent.futures import Future
+import requests
+from requests.adapters import HTTPAdapter
+from utils.profiling import annotate, span
+
+# Client limits, configurable through the environment
+MAX_RETRIES = int(os.getenv("SUBGRAPH_MAX_RETRIES", "5"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("SUBGRAPH_RATE_LIMIT", "10"))
+POOL_SIZE = int(os.getenv("SUBGRAPH_POOL_SIZE", "16"))
+REQUEST_TIMEOUT = float(os.getenv("SUBGRAPH_TIMEOUT", "30"))
+# Exponential backoff bounds in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+class SubgraphQueryError(Exception):
+    """The subgraph answered with GraphQL errors"""
+
+    def __init__(self, message, errors=None, data=None):
+        super().__init__(message)
+        self.errors = errors
+        self.data = data
+
+class RateLimiter:
+    """Token bucket shared by every thread and coroutine of the process"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it"""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+# Process-wide rate limiter, also used by the async multi-pool transport
+RATE_LIMITER = RateLimiter(RATE_LIMIT_PER_SECOND)
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def _retry_after(response, attempt):
+    try:
+        return min(BACKOFF_CAP, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return backoff_delay(attempt)
+
+def _query_text(document):
+    if isinstance(document, str):
+        return document
+    # gql 3 returns a DocumentNode from gql(), gql 4 wraps it in a GraphQLRequest
+    from graphql import print_ast
+    return print_ast(getattr(document, "document", document))
+
+class SubgraphClient:
+    """Shared GraphQL client with keep-alive pooling, retries, rate limiting and request coalescing.
+
+    It exposes the same execute(query, variable_values=...) call as a gql Client and
+    accepts either query text or a parsed gql document.
+    Identical requests issued while one is already in flight wait for that request
+    and receive copies of its result instead of going upstream again.
+    """
+
+    def __init__(self, url, max_retries=MAX_RETRIES, rate_limiter=RATE_LIMITER, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        self.url = url
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Ask for compressed responses: position pages are repetitive JSON that gzip shrinks several-fold.
+        # requests decodes gzip and deflate itself, and br too when a brotli package is installed.
+        self.session.headers["Accept-Encoding"] = requests.utils.DEFAULT_ACCEPT_ENCODING
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.upstream_requests = 0
+        self.coalesced_requests = 0
+
+    def execute(self, document, variable_values=None):
+        with span("subgraph_request"):
+            return self._execute(document, variable_values)
+
+    def _execute(self, document, variable_values):
+        payload = {
+            "query": _query_text(document),
+            "variables": variable_values or {},
+        }
+        key = json.dumps(payload, sort_keys=True)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced_requests += 1
+
+        if not leader:
+            annotate(coalesced=True)
+            return copy.deepcopy(future.result())
+
+        try:
+            result = self._post(payload)
+            # The shared result stays pristine: callers hydrate responses in place, so each gets its own copy
+            future.set_result(result)
+            return copy.deepcopy(result)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _post(self, payload):
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            self.rate_limiter.acquire()
+            try:
+                with self._lock:
+                    self.upstream_requests += 1
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            # Gateway throttling and server errors are retried, other HTTP errors are not
+            if response.status_code == 429 or response.status_code >= 500:
+                if last_attempt:
+                    response.raise_for_status()
+                time.sleep(_retry_after(response, attempt))
+                continue
+            response.raise_for_status()
+
+            # Content-Length is the compressed size on the wire when the gateway compressed the body
+            wire_bytes = response.headers.get("Content-Length")
+            annotate(payload_bytes=len(response.content), wire_bytes=int(wire_bytes) if wire_bytes else None, attempts=attempt + 1)
+            body = response.json()
+            if body.get("errors"):
+                raise SubgraphQueryError(str(body["errors"][0]), errors=body["errors"], data=body.get("data"))
+            return body["data"]
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_shared_client(url):
+    """Return the process-wide client for a subgraph URL"""
+    with _clients_lock:
+        if url not in _clients:
+            _clients[url] = SubgraphClient(url)
+        return _clients[url]
+
+def client_stats():
+    """Upstream and coalesced request counts summed over every shared client"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {
+        "upstream_requests": sum(client.upstream_requests for client in clients),
+        "coalesced_requests": sum(client.coalesced_requests for client in clients),
+    }
@@ -1,4 +1,6 @@
 import math
+from functools import lru_cache
+import numpy as np
 
 # Constants for calculations
 Q96 = 2**96
@@ -55,3 +57,111 @@ def get_token_amounts_from_liquidity(liquidity, sqrt_price_current, sqrt_price_l
         return amount0, amount1  # (REG, USDC)
     else:
         return amount1, amount0  # (REG, USDC)
+
+# --- Exact integer TickMath and SqrtPriceMath (ports of the Uniswap V3 core libraries) ---
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MAX_UINT256 = 2**256 - 1
+
+# Q128 multipliers for each bit of |tick|, from TickMath.getSqrtRatioAtTick
+_TICK_BIT_RATIOS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+@lru_cache(maxsize=65536)
+def get_sqrt_ratio_at_tick(tick):
+    """Exact sqrt(1.0001^tick) * 2^96 as a uint160, identical to TickMath.getSqrtRatioAtTick"""
+    tick = int(tick)
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"Tick {tick} is outside [{MIN_TICK}, {MAX_TICK}]")
+
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 0x100000000000000000000000000000000
+    for bit, multiplier in _TICK_BIT_RATIOS:
+        if abs_tick & bit:
+            ratio = (ratio * multiplier) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+
+    # Q128.128 to Q64.96, rounding up
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+def _div_rounding_up(numerator, denominator):
+    return -(-numerator // denominator)
+
+def get_amount0_delta(sqrt_ratio_a_x96, sqrt_ratio_b_x96, liquidity, round_up=False):
+    """Exact amount of token0 between two sqrt prices, as SqrtPriceMath.getAmount0Delta"""
+    if sqrt_ratio_a_x96 > sqrt_ratio_b_x96:
+        sqrt_ratio_a_x96, sqrt_ratio_b_x96 = sqrt_ratio_b_x96, sqrt_ratio_a_x96
+    numerator1 = int(liquidity) << 96
+    numerator2 = sqrt_ratio_b_x96 - sqrt_ratio_a_x96
+    if round_up:
+        return _div_rounding_up(_div_rounding_up(numerator1 * numerator2, sqrt_ratio_b_x96), sqrt_ratio_a_x96)
+    return numerator1 * numerator2 // sqrt_ratio_b_x96 // sqrt_ratio_a_x96
+
+def get_amount1_delta(sqrt_ratio_a_x96, sqrt_ratio_b_x96, liquidity, round_up=False):
+    """Exact amount of token1 between two sqrt prices, as SqrtPriceMath.getAmount1Delta"""
+    if sqrt_ratio_a_x96 > sqrt_ratio_b_x96:
+        sqrt_ratio_a_x96, sqrt_ratio_b_x96 = sqrt_ratio_b_x96, sqrt_ratio_a_x96
+    if round_up:
+        return _div_rounding_up(int(liquidity) * (sqrt_ratio_b_x96 - sqrt_ratio_a_x96), Q96)
+    return int(liquidity) * (sqrt_ratio_b_x96 - sqrt_ratio_a_x96) // Q96
+
+def get_amounts_for_liquidity(sqrt_price_x96, tick_lower, tick_upper, liquidity):
+    """Exact (amount0, amount1) in raw token units held by a position at the current sqrt price"""
+    sqrt_lower = get_sqrt_ratio_at_tick(tick_lower)
+    sqrt_upper = get_sqrt_ratio_at_tick(tick_upper)
+    if sqrt_price_x96 <= sqrt_lower:
+        return get_amount0_delta(sqrt_lower, sqrt_upper, liquidity), 0
+    if sqrt_price_x96 < sqrt_upper:
+        return (get_amount0_delta(sqrt_price_x96, sqrt_upper, liquidity),
+                get_amount1_delta(sqrt_lower, sqrt_price_x96, liquidity))
+    return 0, get_amount1_delta(sqrt_lower, sqrt_upper, liquidity)
+
+def sqrt_ratio_table(ticks):
+    """Exact sqrt ratios for an array of ticks as a NumPy object array of Python ints.
+
+    Positions share a few hundred tick boundaries, so each distinct tick is
+    computed once (and memoized across calls) and broadcast back.
+    """
+    unique_ticks, inverse = np.unique(np.asarray(ticks, dtype=np.int64), return_inverse=True)
+    table = np.array([get_sqrt_ratio_at_tick(int(tick)) for tick in unique_ticks] + [None], dtype=object)[:-1]
+    return table[inverse]
+
+def get_amounts_for_liquidity_batch(sqrt_price_x96, ticks_lower, ticks_upper, liquidities):
+    """Batched get_amounts_for_liquidity over arrays of positions; exact, rounding down like a burn.
+
+    sqrt_price_x96 may be a scalar or an array (one per position, e.g. for several pools).
+    Returns (amount0, amount1) as object arrays of Python ints in raw token units.
+    """
+    sqrt_lower = sqrt_ratio_table(ticks_lower)
+    sqrt_upper = sqrt_ratio_table(ticks_upper)
+    liquidity = np.array([int(value) for value in liquidities] + [None], dtype=object)[:-1]
+    sqrt_price = np.empty(len(liquidity), dtype=object)
+    sqrt_price[:] = [int(value) for value in np.broadcast_to(np.asarray(sqrt_price_x96, dtype=object), (len(liquidity),))]
+
+    # Clamp the current price into each range: below uses the lower bound, above the upper
+    sqrt_current = np.where(sqrt_price < sqrt_lower, sqrt_lower, np.where(sqrt_price > sqrt_upper, sqrt_upper, sqrt_price))
+    numerator1 = liquidity * Q96
+    amount0 = numerator1 * (sqrt_upper - sqrt_current) // sqrt_upper // sqrt_current
+    amount1 = liquidity * (sqrt_current - sqrt_lower) // Q96
+    return amount0, amount1
@@ -1,47 +1,95 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from models.power_voting import custom_equation_model
+from models.power_voting import evaluate_equation
+from utils.data_processing import ACTIVE_LABELS, active_mask
+from utils.profiling import annotate, traced
 
+# Above this many positions bars are drawn as a single WebGL trace instead of one trace per position
+LARGE_DATA_THRESHOLD = 500
+# Above this many positions bars are aggregated into price bins (level of detail)
+LOD_THRESHOLD = 5000
+LOD_BINS = 200
+# Number of positions (or bins) labelled with their vote count
+TOP_N_ANNOTATIONS = 20
+
+# Hover text is formatted by Plotly in the browser from customdata, not built per row in Python
+POSITION_HOVER_TEMPLATE = (
+    "Position #%{customdata[0]}<br>"
+    "Actual REG: %{customdata[1]:.2f} (PowerVoting: %{customdata[2]:.2f})<br>"
+    "REG Equivalent: %{customdata[3]:.2f} (PowerVoting: %{customdata[4]:.2f})<br>"
+    "Total PowerVoting: %{customdata[5]:.2f} votes<br>"
+    "Price Range: %{customdata[6]:.6f} - %{customdata[7]:.6f}<br>"
+    "Status: %{customdata[8]}<br>"
+    "Type: %{customdata[9]}<extra></extra>"
+)
+BIN_HOVER_TEMPLATE = (
+    "Price Range: %{customdata[0]:.6f} - %{customdata[1]:.6f}<br>"
+    "Positions: %{customdata[2]}<br>"
+    "Actual REG: %{customdata[3]:.2f}<br>"
+    "Total PowerVoting: %{customdata[4]:.2f} votes<extra></extra>"
+)
+
+@traced("multiplier_curve")
 def calculate_multiplier_curve(equation, price_range, current_price):
     """Calculate multiplier values across a price range based on equation"""
     prices = np.linspace(price_range[0], price_range[1], 100)
-    multipliers = []
-    
-    for price in prices:
-        # Calculate relative distance for this price point
-        rel_distance = abs(price - current_price) / current_price if current_price > 0 else 0
-        # Calculate multiplier (use 1.0 as base reg_amount)
-        try:
-            multiplier = custom_equation_model(
-                1.0,
-                equation,
-                reg_equivalent=0.5,  # Add reasonable reg_equivalent for visualisation
-                relative_distance=rel_distance,
-                price_distance=abs(price - current_price),
-                is_active=(price_range[0] <= current_price <= price_range[1])
-            )
-            multipliers.append(multiplier)
-        except:
-            multipliers.append(0)  # Handle any errors in calculation
-            
+    price_distance = np.abs(prices - current_price)
+    rel_distance = price_distance / current_price if current_price > 0 else np.zeros_like(prices)
+
+    # Evaluate the whole curve in one pass (use 1.0 as base reg_amount)
+    try:
+        multipliers = evaluate_equation(
+            equation,
+            reg_amount=1.0,
+            reg_equivalent=0.5,  # Add reasonable reg_equivalent for visualisation
+            relative_distance=rel_distance,
+            price_distance=price_distance,
+            is_active=1.0 if price_range[0] <= current_price <= price_range[1] else 0.0
+        )
+        multipliers = np.broadcast_to(multipliers, prices.shape)
+        multipliers = np.where(np.isfinite(multipliers), multipliers, 0.0)
+    except Exception:
+        multipliers = np.zeros_like(prices)  # Handle any errors in calculation
+
     return prices, multipliers
 
-def plot_owner_positions(df_owner, current_price, other_token_symbol, model_name="Default", voting_key="PowerVoting Total", equation=None):
-    df_owner = df_owner.copy()
-    df_owner.loc[:, "Position Label"] = df_owner["Liquidity ID"].apply(lambda x: f'Position #{x[:6]}')
-    df_owner.loc[:, "Tooltip"] = df_owner.apply(
-        lambda row: f"Position #{row['Liquidity ID'][:6]}<br>" +
-                   f"Actual REG: {row['Actual REG']:.2f} (PowerVoting: {row['PowerVoting REG']:.2f})<br>" +
-                   f"REG Equivalent: {row['REG Equivalent']:.2f} (PowerVoting: {row['PowerVoting Equivalent']:.2f})<br>" +
-                   f"Total PowerVoting: {row[voting_key]:.2f} votes<br>" +
-                   f"Price Range: {row['Min REG Price']:.6f} - {row['Max REG Price']:.6f}<br>" +
-                   f"Status: {row['Active']}<br>" +
-                   f"Type: {row['Position Type']}",
-        axis=1
-    )
+def _position_customdata(df_owner, voting_key):
+    return np.column_stack([
+        df_owner["Liquidity ID"].astype(str).str[:6].to_numpy(),
+        df_owner["Actual REG"].to_numpy(),
+        df_owner["PowerVoting REG"].to_numpy(),
+        df_owner["REG Equivalent"].to_numpy(),
+        df_owner["PowerVoting Equivalent"].to_numpy(),
+        df_owner[voting_key].to_numpy(),
+        df_owner["Min REG Price"].to_numpy(),
+        df_owner["Max REG Price"].to_numpy(),
+        np.where(active_mask(df_owner), ACTIVE_LABELS[1], ACTIVE_LABELS[0]),
+        df_owner["Position Type"].astype(str).to_numpy(),
+    ]).astype(object)
+
+def _vote_annotations(x, y, votes, top_n=TOP_N_ANNOTATIONS):
+    """Vote labels for the top_n largest entries only"""
+    top = np.argsort(votes)[::-1][:top_n]
+    return [
+        dict(
+            x=x[i],
+            y=y[i],
+            text=f"{votes[i]:.0f} votes",
+            showarrow=False,
+            font=dict(size=10, color="white"),
+            bgcolor="rgba(0,0,0,0.5)",
+            bordercolor="white",
+            borderwidth=1,
+            borderpad=3
+        )
+        for i in top
+    ]
 
-    # Create base figure with position bars
+def _position_bars(df_owner, other_token_symbol, model_name, voting_key):
+    # One colored bar trace per position: fine for a handful of positions
+    df_owner = df_owner.copy()
+    df_owner.loc[:, "Position Label"] = "Position #" + df_owner["Liquidity ID"].astype(str).str[:6]
     fig = px.bar(
         df_owner,
         base="Min REG Price",
@@ -53,28 +101,85 @@ def plot_owner_positions(df_owner, current_price, other_token_symbol, model_name
             "y": "Actual REG per Position",
             "x": f"REG Price Range ({other_token_symbol} per REG)"
         },
-        custom_data=["Tooltip"],
         title=f"{model_name} PowerVoting Model: REG Price Range vs Actual REG"
     )
-    
-    # Update hover template to include PowerVoting information
-    fig.update_traces(
-        hovertemplate="%{customdata[0]}<extra></extra>"
+    customdata = _position_customdata(df_owner, voting_key)
+    for trace in fig.data:
+        rows = (df_owner["Position Label"] == trace.name).to_numpy()
+        trace.customdata = customdata[rows]
+    fig.update_traces(hovertemplate=POSITION_HOVER_TEMPLATE)
+    return fig
+
+def _position_segments_webgl(df_owner, model_name, voting_key):
+    # All positions in one WebGL trace: a horizontal segment per position, separated by gaps
+    count = df_owner.shape[0]
+    x = np.empty(count * 3)
+    x[0::3] = df_owner["Min REG Price"].to_numpy()
+    x[1::3] = df_owner["Max REG Price"].to_numpy()
+    x[2::3] = np.nan
+    y = np.repeat(df_owner["Actual REG"].to_numpy(), 3)
+    y[2::3] = np.nan
+    customdata = np.repeat(_position_customdata(df_owner, voting_key), 3, axis=0)
+
+    fig = go.Figure(go.Scattergl(
+        x=x,
+        y=y,
+        mode="lines",
+        line=dict(width=6),
+        name="Positions",
+        customdata=customdata,
+        hovertemplate=POSITION_HOVER_TEMPLATE
+    ))
+    fig.update_layout(
+        title=f"{model_name} PowerVoting Model: REG Price Range vs Actual REG ({count} positions)",
+        yaxis_title="Actual REG per Position"
     )
+    return fig
 
-    # Add text labels with PowerVoting information
-    for i, row in df_owner.iterrows():
-        fig.add_annotation(
-            x=row["Min REG Price"] + (row["Max REG Price"] - row["Min REG Price"])/2,
-            y=row["Actual REG"],
-            text=f"{row[voting_key]:.0f} votes",
-            showarrow=False,
-            font=dict(size=10, color="white"),
-            bgcolor="rgba(0,0,0,0.5)",
-            bordercolor="white",
-            borderwidth=1,
-            borderpad=3
+def _binned_positions(df_owner, model_name, voting_key, bins=LOD_BINS):
+    # Level of detail: positions aggregated into bins of their center price
+    centers = df_owner["Position Center Price"].to_numpy()
+    edges = np.histogram_bin_edges(centers, bins=bins)
+    index = np.clip(np.searchsorted(edges, centers, side="right") - 1, 0, len(edges) - 2)
+    counts = np.bincount(index, minlength=len(edges) - 1)
+    reg = np.bincount(index, weights=df_owner["Actual REG"].to_numpy(), minlength=len(edges) - 1)
+    votes = np.bincount(index, weights=df_owner[voting_key].to_numpy(), minlength=len(edges) - 1)
+    occupied = counts > 0
+
+    fig = go.Figure(go.Bar(
+        base=edges[:-1][occupied],
+        x=np.diff(edges)[occupied],
+        y=reg[occupied],
+        orientation="h",
+        name="Price bins",
+        customdata=np.column_stack([edges[:-1], edges[1:], counts, reg, votes])[occupied],
+        hovertemplate=BIN_HOVER_TEMPLATE
+    ))
+    fig.update_layout(
+        title=f"{model_name} PowerVoting Model: Actual REG by Price Bin ({df_owner.shape[0]} positions)",
+        yaxis_title="Actual REG per Price Bin"
+    )
+    annotations = _vote_annotations((edges[:-1] + edges[1:])[occupied] / 2, reg[occupied], votes[occupied])
+    return fig, annotations
+
+@traced("figure")
+def plot_owner_positions(df_owner, current_price, other_token_symbol, model_name="Default", voting_key="PowerVoting Total", equation=None):
+    annotate(rows=len(df_owner))
+    count = df_owner.shape[0]
+    if count > LOD_THRESHOLD:
+        fig, annotations = _binned_positions(df_owner, model_name, voting_key)
+    else:
+        if count > LARGE_DATA_THRESHOLD:
+            fig = _position_segments_webgl(df_owner, model_name, voting_key)
+        else:
+            fig = _position_bars(df_owner, other_token_symbol, model_name, voting_key)
+        # Add text labels with PowerVoting information for the largest positions
+        annotations = _vote_annotations(
+            df_owner["Position Center Price"].to_numpy(),
+            df_owner["Actual REG"].to_numpy(),
+            df_owner[voting_key].to_numpy()
         )
+    fig.update_layout(annotations=annotations)
     
     # Add multiplier curve for each position if equation is provided
     if equation and df_owner.shape[0] > 0:
@@ -135,4 +240,122 @@ def plot_owner_positions(df_owner, current_price, other_token_symbol, model_name
             x=1
         )
     )
+    annotate(traces=len(fig.data))
+    return fig
+
+def plot_owner_vote_totals(owner_votes, voting_key, model_name="Default", top_n=20):
+    """Bar chart of the owners with the most votes for a model"""
+    top_owners = owner_votes.nlargest(top_n, voting_key)
+    fig = px.bar(
+        top_owners,
+        x="Owner",
+        y=voting_key,
+        hover_data=["Pools", "Positions", "Actual REG", "REG Equivalent"],
+        labels={voting_key: "PowerVoting"},
+        title=f"{model_name} PowerVoting Model: Top {top_n} Owners Across Pools"
+    )
+    fig.update_layout(xaxis={'categoryorder': 'total descending'})
+    return fig
+
+def plot_vote_share_scenarios(owner_curves, current_price, other_token_symbol, model_name="Default", top_n=10, highlight_owner=None):
+    """Line chart of owner vote share against hypothetical REG prices"""
+    totals = owner_curves.sum(axis=0).to_numpy()
+    shares = owner_curves.to_numpy() / np.where(totals > 0, totals, 1.0)
+    prices = owner_curves.columns.to_numpy(dtype=float)
+
+    # The largest owners at the current price, plus the selected owner when there is one
+    current_index = np.argmin(np.abs(prices - current_price))
+    shown = list(np.argsort(shares[:, current_index])[::-1][:top_n])
+    if highlight_owner in owner_curves.index:
+        highlight_index = owner_curves.index.get_loc(highlight_owner)
+        if highlight_index not in shown:
+            shown.append(highlight_index)
+
+    fig = go.Figure()
+    for i in shown:
+        owner = owner_curves.index[i]
+        fig.add_trace(go.Scatter(
+            x=prices,
+            y=shares[i] * 100,
+            mode="lines",
+            name=f"{owner[:6]}…{owner[-4:]}",
+            line=dict(width=4 if owner == highlight_owner else 2),
+            hovertemplate=f"{owner}<br>" + "Price: %{x:.6f}<br>Vote share: %{y:.2f}%<extra></extra>"
+        ))
+    fig.add_vline(x=current_price, line_dash="dash", line_color="red", annotation_text="Current")
+    fig.update_layout(
+        title=f"{model_name} PowerVoting Model: Owner Vote Share vs REG Price",
+        xaxis_title=f"REG Price ({other_token_symbol} per REG)",
+        yaxis_title="Vote share (%)"
+    )
+    return fig
+
+@traced("depth_figure")
+def plot_liquidity_depth(profile, low=0.2, high=5.0):
+    """Step chart of active liquidity against REG price, between low and high times the current price"""
+    current_price = profile.current_price
+    segments = profile.segments()
+    segments = segments[(segments["max_reg_price"] > current_price * low) & (segments["min_reg_price"] < current_price * high)]
+    segments = segments.sort_values("min_reg_price")
+    # Each range is drawn from its lower price; the last point closes the final step
+    x = np.append(np.clip(segments["min_reg_price"].to_numpy(), current_price * low, None),
+                  min(segments["max_reg_price"].max(), current_price * high) if len(segments) else current_price)
+    y = np.append(segments["active_liquidity"].to_numpy(), 0.0)
+    customdata = np.vstack([segments[["reg_amount", "other_amount", "max_reg_price"]].to_numpy(), np.zeros((1, 3))])
+
+    fig = go.Figure(go.Scatter(
+        x=x,
+        y=y,
+        mode="lines",
+        line_shape="hv",
+        fill="tozeroy",
+        name="Active liquidity",
+        customdata=customdata,
+        hovertemplate=(
+            "Price: %{x:.6f} - %{customdata[2]:.6f}<br>"
+            "Active liquidity: %{y:.4g}<br>"
+            "REG held: %{customdata[0]:.2f}<br>"
+            f"{profile.other_token_symbol} held: " + "%{customdata[1]:.2f}<extra></extra>"
+        ),
+    ))
+    fig.add_vline(x=current_price, line_dash="dash", line_color="red", annotation_text="Current")
+    fig.update_layout(
+        title="Liquidity Depth",
+        xaxis_title=f"REG Price ({profile.other_token_symbol} per REG)",
+        yaxis_title="Active liquidity",
+        xaxis_type="log",
+        showlegend=False,
+    )
+    return fig
+
+def plot_owner_vote_history(owner_votes, model_name="Default", top_n=10):
+    """Time series of votes per owner across snapshot blocks (Block x Owner table)"""
+    top_owners = owner_votes.sum(axis=0).nlargest(top_n).index
+    fig = go.Figure()
+    for owner in top_owners:
+        fig.add_trace(go.Scatter(
+            x=owner_votes.index,
+            y=owner_votes[owner],
+            mode="lines+markers",
+            name=f"{owner[:6]}…{owner[-4:]}",
+            hovertemplate=f"{owner}<br>" + "Block: %{x}<br>Votes: %{y:.2f}<extra></extra>"
+        ))
+    fig.update_layout(
+        title=f"{model_name} PowerVoting Model: Votes per Owner over Time",
+        xaxis_title="Block",
+        yaxis_title="PowerVoting"
+    )
+    return fig
+
+def plot_sweep_heatmap(sweep, x, y, stat, stat_label=None):
+    """Heatmap of one summary statistic over two swept coefficients"""
+    grid = sweep.pivot_table(index=y, columns=x, values=stat, aggfunc="mean")
+    fig = px.imshow(
+        grid,
+        origin="lower",
+        aspect="auto",
+        color_continuous_scale="Viridis",
+        labels={"x": x, "y": y, "color": stat_label or stat},
+    )
+    fig.update_layout(title=f"{stat_label or stat} by {x} and {y}")
     return fig